@@ -1,81 +1,112 @@
 """
 A cellular automata
 """
-from collections import namedtuple, Counter
-from random import random, choice
-
-from pica.cells import Cells
-
-
-Change = namedtuple('Change', ('x', 'y', 'state'))
+from pica.boundaries import EDGE
+from pica.engines import Change, SerialEngine  # noqa: F401
+from pica.optimizer import Report, optimize as optimize_rules
+from pica.randomness import RANDOMIZE
 
 
 class Automata:
     """
     A cellular automata.
+
+    engine: the pica.engines.Engine used to step the automata (defaults to
+        a SerialEngine).
+    optimize: whether to simplify the rules before running them (see
+        pica.optimizer.optimize).
+    boundary: the pica.boundaries.Boundary of the grid (defaults to
+        pica.boundaries.EDGE, where everything outside is None).
     """
-    def __init__(self, width, height, initial_state, *rules):
-        self._cells = Cells(width, height, initial_state)
+    def __init__(
+            self, width, height, initial_state, *rules, engine=None,
+            optimize=True, boundary=EDGE):
+        if engine is None:
+            engine = SerialEngine()
+
+        if optimize:
+            optimized, self._optimization = optimize_rules(rules)
+        else:
+            optimized, self._optimization = rules, Report()
+
+        engine.prepare(optimized)
+
+        self._engine = engine
+        self._cells = engine.cells(width, height, initial_state, boundary)
         self._rules = rules
+        self._randomized = 0
 
     @property
     def cells(self):
         return self._cells
 
+    @property
+    def engine(self):
+        return self._engine
+
+    @property
+    def optimization(self):
+        """
+        A pica.optimizer.Report of what was removed from the rules.
+        """
+        return self._optimization
+
     def randomize(self, states):
         """
-        randomize the automata.
+        randomize the automata. The draws come from the engine's random
+        stream, so a seeded engine randomizes the same way every time.
 
-        states: an iterable of possible states.
+        states: a sequence of possible states.
         """
         if not states:
             raise ValueError(states)
 
+        draws = self._engine.random.draws(
+            self._randomized, self._cells.width, self._cells.height,
+            channel=RANDOMIZE
+        ).tolist()
+
+        self._randomized += 1
+
         for x in range(self._cells.width):
             for y in range(self._cells.height):
-                self._cells.update(x, y, choice(states))
+                self._cells.update(
+                    x, y, states[int(draws[y][x] * len(states))]
+                )
 
     def step(self):
         """
         Take a step in the simulation. Returns a set of Changes.
         """
-        changes = set()
-
-        for x in range(self._cells.width):
-            for y in range(self._cells.height):
-                possibilities = Counter()
-                forbidden = set()
-
-                for rule in self._rules:
-                    rule.reset()
+        return self._engine.step(self._cells)
 
-                    result = rule(self._cells, x, y)
-
-                    if result:
-                        if result.difference is None:
-                            forbidden.add(result.state)
-                        else:
-                            possibilities[result.state] += result.difference
-
-                for state in forbidden:
-                    del possibilities[state]  # works even if state not a key
-
-                total = sum(possibilities.values())
-
-                if total:  # at least one possibility
-                    value = total * random()
+    def run(self, steps, observe_every=None, observe=None):
+        """
+        Take a number of steps as fast as possible, without building the
+        changes of each step. Engines that can advance several steps at
+        once (see pica.engines.Engine.advance) do so between
+        observations.
+
+        steps: the number of steps to take.
+        observe_every: the number of steps between observations
+            (optional).
+        observe: a function called with the automata and the number of
+            steps taken so far, every observe_every steps (optional).
+        """
+        if steps < 0:
+            raise ValueError(steps)
 
-                    tally = 0
-                    for state, probability in possibilities.items():
-                        tally += probability
+        if observe_every is not None and observe_every < 1:
+            raise ValueError(observe_every)
 
-                        if value < tally:
-                            if self._cells.cell(x, y) != state:  # new state
-                                changes.add(Change(x, y, state))
+        stride = observe_every or steps
+        taken = 0
 
-                            break
+        while taken < steps:
+            count = min(stride, steps - taken)
 
-        for change in changes:
-            self._cells.update(change.x, change.y, change.state)
+            self._engine.advance(self._cells, count)
+            taken += count
 
-        return changes
+            if observe is not None and count == observe_every:
+                observe(self, taken)
@@ -0,0 +1,573 @@
+"""
+Bit-packed cells, and bit-parallel stepping for two-state rules.
+"""
+from collections import namedtuple
+from functools import partial
+
+import numpy
+
+from pica.boundaries import EDGE
+from pica.cells import Deferring, StateTable
+from pica.changes import Changes
+from pica.tables import TableEngine
+
+WORD = 64
+
+ONES = numpy.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+class TotalisticRule(namedtuple(
+        'TotalisticRule',
+        ('off', 'on', 'offsets', 'birth', 'survival', 'outside'))):
+    """
+    A deterministic two-state rule where the next state of a cell depends
+    only on whether it is on and how many of its neighbors are (like the
+    game of life).
+
+    off: the state of cells that are off.
+    on: the state of cells that are on.
+    offsets: the (x, y) offsets of the neighbors that are counted.
+    birth: the counts of on neighbors that turn an off cell on.
+    survival: the counts of on neighbors that keep an on cell on.
+    outside: whether positions outside the grid (None) count as on, or
+        None if they behave like neither state.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_table(cls, table):
+        """
+        Find the totalistic rule a TransitionTable encodes. Returns None if
+        the table isn't deterministic, has more than two states, or the
+        next state depends on more than the number of on neighbors.
+
+        table: the pica.tables.TransitionTable.
+        """
+        symbols = table.symbols
+
+        if not table.deterministic or len(symbols) != 3:
+            return None
+
+        # decode every index into the symbol at each position, with 2 as
+        # None (the last symbol)
+        index = numpy.arange(len(table))
+        digits = [
+            (index // len(symbols) ** position) % len(symbols)
+            for position in range(len(table.positions))
+        ]
+
+        chosen = table.next_symbols(index, None)
+        chosen = numpy.where(chosen < 0, digits[0], chosen)
+
+        neighbors = digits[1:]
+        missing = sum(digit == 2 for digit in neighbors)
+
+        # None behaving like off is the most useful, as it needs no fill
+        for outside in (False, True, None):
+            for on in (0, 1):
+                found = counts(digits[0], neighbors, missing, chosen, on,
+                               outside)
+
+                if found is not None:
+                    birth, survival = found
+
+                    return cls(
+                        symbols[1 - on], symbols[on], table.positions[1:],
+                        birth, survival, outside
+                    )
+
+        return None
+
+
+def counts(cell, neighbors, missing, chosen, on, outside):
+    """
+    The birth and survival counts of a table if it's totalistic with a
+    symbol as on (or None if it isn't).
+
+    cell: the symbol of the cell for each index.
+    neighbors: the symbol of each neighbor for each index.
+    missing: the number of neighbors that are None for each index.
+    chosen: the next symbol for each index.
+    on: the symbol that is on.
+    outside: whether None counts as on (or None to ignore indices with a
+        None neighbor).
+    """
+    total = sum(neighbor == on for neighbor in neighbors)
+
+    considered = cell != 2
+    if outside is None:
+        considered &= missing == 0
+    elif outside:
+        total = total + missing
+
+    birth = set()
+    survival = set()
+
+    for state, found in ((1 - on, birth), (on, survival)):
+        for count in range(len(neighbors) + 1):
+            mask = considered & (cell == state) & (total == count)
+            results = set(chosen[mask].tolist())
+
+            if len(results) > 1:
+                return None
+
+            if results == {on}:
+                found.add(count)
+
+    return frozenset(birth), frozenset(survival)
+
+
+class BitCells(Deferring):
+    """
+    A collection of two-state cells packed 64 to a machine word. Each row
+    is an array of unsigned 64 bit words, with cell x in bit x % 64 of
+    word x // 64; bits past the width of the grid are kept clear.
+
+    states: the (off, on) states.
+    boundary: the pica.boundaries.Boundary of the grid (defaults to
+        pica.boundaries.EDGE, where everything outside is None).
+    """
+    __slots__ = (
+        '_width', '_height', '_version', '_states', '_words', '_boundary',
+    )
+
+    def __init__(self, width, height, initial_state, states, boundary=EDGE):
+        self._width = width
+        self._height = height
+        self._version = 0
+        self._boundary = boundary
+        self._states = StateTable(states)
+        self._pending = None
+
+        if len(self._states) != 2:
+            raise ValueError(states)
+
+        self._words = numpy.zeros(
+            (height, -(-width // WORD)), dtype=numpy.uint64
+        )
+
+        if self.bit(initial_state):
+            self._words[:] = ONES
+            self._words[:, -1:] &= mask(width)
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def height(self):
+        return self._height
+
+    @property
+    def version(self):
+        """
+        A counter that goes up every time a cell is updated.
+        """
+        return self._version
+
+    @property
+    def boundary(self):
+        """
+        The pica.boundaries.Boundary of the grid.
+        """
+        return self._boundary
+
+    @property
+    def states(self):
+        """
+        The table of states, where off has code 0 and on has code 1.
+        """
+        return self._states
+
+    @property
+    def words(self):
+        """
+        The (height, words per row) array of packed cells.
+        """
+        return self._words
+
+    @property
+    def bits(self):
+        """
+        The cells unpacked into a (height, width) array of 0s and 1s.
+        """
+        return unpack(self._words)[:, :self._width]
+
+    def bit(self, state):
+        """
+        The bit for a state.
+
+        state: the off or on state.
+        """
+        code = self._states.find(state)
+
+        if code is None:
+            raise ValueError(state)
+
+        return code
+
+    def cell(self, x, y):
+        """
+        Get the value of the cell (or what the boundary says is there if
+        that cell is not in range)
+
+        x: the x position of the cell.
+        y: the y position of the cell.
+        """
+        if not (0 <= y < self._height and 0 <= x < self._width):
+            position = self._boundary.locate(x, y, self._width, self._height)
+
+            if position is None:
+                return self._boundary.state
+
+            x, y = position
+
+        return self._states.state(
+            (self._words.item(y, x // WORD) >> (x % WORD)) & 1
+        )
+
+    def row(self, y):
+        """
+        A generator for enumerating over a row of the cells.
+
+        y: the y position of the cell.
+        """
+        if y < 0 or y >= self._height:
+            raise ValueError(y)
+
+        for bit in unpack(self._words[y:y + 1])[0, :self._width].tolist():
+            yield self._states.state(bit)
+
+    def update(self, x, y, state):
+        """
+        Update a cell. The state must be off or on.
+
+        x: the x position of the cell.
+        y: the y position of the cell.
+        state: The state to set the cell to.
+        """
+        if x < 0 or x >= self._width:
+            raise ValueError(x)
+
+        if y < 0 or y >= self._height:
+            raise ValueError(y)
+
+        flag = numpy.uint64(1 << (x % WORD))
+
+        self.settle()
+
+        if self.bit(state):
+            self._words[y, x // WORD] |= flag
+        else:
+            self._words[y, x // WORD] &= ~flag
+
+        self._version += 1
+
+    def apply(self, changes):
+        """
+        Update every cell in a collection of changes at once. The changes
+        are assumed to be in range, and to only hold the off and on
+        states.
+
+        changes: the pica.changes.Changes to apply.
+        """
+        xs, ys, codes = changes.arrays()
+
+        if changes.table is not self._states:
+            lookup = [self.bit(state) for state in changes.table]
+            codes = numpy.array(lookup, dtype=numpy.uint8)[codes]
+
+        flags = numpy.left_shift(
+            numpy.uint64(1), (xs % WORD).astype(numpy.uint64)
+        )
+        on = codes.astype(bool)
+
+        self.settle()
+
+        numpy.bitwise_and.at(
+            self._words, (ys[~on], xs[~on] // WORD), ~flags[~on]
+        )
+        numpy.bitwise_or.at(self._words, (ys[on], xs[on] // WORD), flags[on])
+
+        self._version += len(changes)
+
+    def swap(self, words):
+        """
+        Replace every cell at once with an array holding the next
+        generation, without copying it. Returns the previous array.
+
+        words: the (height, words per row) array of packed cells.
+        """
+        if words.shape != self._words.shape:
+            raise ValueError(words.shape)
+
+        previous = self._words
+        self._words = words
+        self._version += 1
+
+        return previous
+
+
+def mask(width):
+    """
+    The word that keeps only the bits of the last word of a row that are
+    inside the grid.
+
+    width: the width of the grid.
+    """
+    return numpy.uint64((1 << ((width - 1) % WORD + 1)) - 1)
+
+
+def unpack(words):
+    """
+    Unpack rows of words into a (rows, 64 * words per row) array of bits.
+
+    words: the array of words.
+    """
+    return numpy.unpackbits(
+        numpy.ascontiguousarray(words, dtype='<u8').view(numpy.uint8),
+        axis=-1, bitorder='little'
+    )
+
+
+def diff(before, after, table):
+    """
+    The x positions, y positions and new bits of the cells that differ
+    between two generations of packed cells, and their table. Only the
+    words that differ are unpacked.
+
+    before: the earlier array of words.
+    after: the later array of words.
+    table: the pica.cells.StateTable of the cells.
+    """
+    changed = before ^ after
+    rows, columns = numpy.nonzero(changed)
+
+    found, bits = numpy.nonzero(unpack(changed[rows, columns][:, None]))
+
+    ys = rows[found]
+    xs = columns[found] * WORD + bits
+
+    codes = unpack(after[ys, columns[found]][:, None])[
+        numpy.arange(len(xs)), bits
+    ]
+
+    return xs, ys, codes, table
+
+
+class BitEngine(TableEngine):
+    """
+    Step two-state rules on bit-packed cells, 64 cells at a time.
+
+    If the rules tabulate to a TotalisticRule, cells are BitCells and each
+    neighbor's bit-plane (the whole grid shifted by the neighbor's offset)
+    is added into a bit-sliced counter with bitwise half adders, so every
+    word of the grid counts 64 neighborhoods at once. The counters are
+    then compared against the birth and survival counts.
+
+    Otherwise (or if the initial state or boundary can't be expressed in
+    bits), the cells are ArrayCells and the engine steps like a
+    TableEngine.
+
+    max_entries: the largest table to build.
+    seed: the seed for random draws (optional).
+    """
+    def __init__(self, max_entries=1 << 20, seed=None):
+        super().__init__(max_entries, seed)
+
+        self._totalistic = None
+
+    @property
+    def totalistic(self):
+        """
+        The TotalisticRule of the rules (or None if they don't have one).
+        """
+        return self._totalistic
+
+    def prepare(self, rules):
+        super().prepare(rules)
+
+        self._totalistic = None
+
+        if (
+                self._table is not None and
+                self._rules.neighborhood.radius < WORD):
+            self._totalistic = TotalisticRule.from_table(self._table)
+
+    def cells(self, width, height, initial_state, boundary=EDGE):
+        rule = self._totalistic
+
+        if (
+                rule is not None and
+                initial_state in (rule.off, rule.on) and
+                fill(rule, boundary) is not False):
+            return BitCells(
+                width, height, initial_state, (rule.off, rule.on), boundary
+            )
+
+        return super().cells(width, height, initial_state, boundary)
+
+    def step(self, cells):
+        """
+        Take a step in the simulation. Returns a set of Changes.
+        """
+        if not isinstance(cells, BitCells):
+            return super().step(cells)
+
+        words = self.next_words(cells)
+        previous = cells.swap(words)
+
+        self._steps += 1
+
+        changes = Changes.lazy(partial(diff, previous, words, cells.states))
+        cells.defer(changes)
+
+        return changes
+
+    def next_words(self, cells):
+        """
+        Calculate the next generation of packed cells.
+
+        cells: the BitCells to evaluate.
+        """
+        rule = self._totalistic
+        words = cells.words
+
+        if rule.off != cells.states.state(0):
+            raise ValueError(cells.states.state(0))
+
+        outside = fill(rule, cells.boundary)
+        if outside is False:
+            raise ValueError(cells.boundary)
+
+        counters = []
+        for added, (x, y) in enumerate(rule.offsets, 1):
+            carry = plane(words, x, y, cells.width, cells.boundary, outside)
+
+            for index, counter in enumerate(counters):
+                counters[index] = counter ^ carry
+                carry = counter & carry
+
+            # the counter only needs another bit once the count can reach
+            # the next power of two
+            if added == 1 << len(counters):
+                counters.append(carry)
+
+        result = numpy.zeros_like(words)
+        for count in rule.birth:
+            result |= ~words & equal(counters, count, words)
+
+        for count in rule.survival:
+            result |= words & equal(counters, count, words)
+
+        result[:, -1] &= mask(cells.width)
+
+        return result
+
+
+def fill(rule, boundary):
+    """
+    The bit positions outside the grid hold (or None if the boundary maps
+    them to cells, or False if they can't be held in a bit).
+
+    rule: the TotalisticRule.
+    boundary: the pica.boundaries.Boundary of the grid.
+    """
+    if boundary.index(-1, 1) is not None:
+        return None
+
+    if boundary.state is None:
+        return False if rule.outside is None else int(rule.outside)
+
+    if boundary.state == rule.on:
+        return 1
+
+    if boundary.state == rule.off:
+        return 0
+
+    return False
+
+
+def plane(words, x, y, width, boundary, outside):
+    """
+    Shift packed cells so that every cell holds the bit of the cell at an
+    offset from it.
+
+    words: the array of words.
+    x: the x offset.
+    y: the y offset.
+    width: the width of the grid.
+    boundary: the pica.boundaries.Boundary of the grid.
+    outside: the bit positions outside the grid hold (or None if the
+        boundary maps them to cells).
+    """
+    height = words.shape[0]
+    blank = ONES if outside else numpy.uint64(0)
+
+    if y:
+        rows = numpy.arange(height) + y
+
+        if outside is None:
+            words = words[boundary.index(rows, height)]
+        else:
+            inside = (rows >= 0) & (rows < height)
+
+            shifted = numpy.full_like(words, blank)
+            shifted[inside] = words[rows[inside]]
+            words = shifted
+
+    if not x:
+        return words
+
+    # cell i reads cell i + x, so bits move down for positive offsets,
+    # carrying in from the next word
+    shifted = numpy.empty_like(words)
+    spill = numpy.zeros_like(words)
+
+    if x > 0:
+        numpy.right_shift(words, numpy.uint64(x), out=shifted)
+        spill[:, :-1] = words[:, 1:] << numpy.uint64(WORD - x)
+        columns = range(max(width - x, 0), width)
+    else:
+        numpy.left_shift(words, numpy.uint64(-x), out=shifted)
+        spill[:, 1:] = words[:, :-1] >> numpy.uint64(WORD + x)
+        columns = range(0, min(-x, width))
+
+    shifted |= spill
+
+    for column in columns:
+        if outside is None:
+            source = boundary.index(column + x, width)
+            bits = (words[:, source // WORD] >> numpy.uint64(source % WORD))
+            bits &= numpy.uint64(1)
+        else:
+            bits = numpy.uint64(outside)
+
+        word = column // WORD
+        flag = numpy.uint64(column % WORD)
+
+        shifted[:, word] &= ~(numpy.uint64(1) << flag)
+        shifted[:, word] |= bits << flag
+
+    return shifted
+
+
+def equal(counters, count, words):
+    """
+    The bits where a bit-sliced counter equals a count.
+
+    counters: the bit-planes of the counter, least significant first.
+    count: the count to compare against.
+    words: an array of words shaped like the planes.
+    """
+    if count >> len(counters):
+        return numpy.zeros_like(words)
+
+    result = numpy.full_like(words, ONES)
+    for index, counter in enumerate(counters):
+        if (count >> index) & 1:
+            result &= counter
+        else:
+            result &= ~counter
+
+    return result
@@ -0,0 +1,122 @@
+"""
+What the cells of a cellular automata see beyond the edges of the grid.
+"""
+from abc import ABCMeta, abstractmethod
+
+import numpy
+
+
+class Boundary(metaclass=ABCMeta):
+    """
+    How positions outside a grid are read.
+    """
+    __slots__ = ()
+
+    @property
+    def state(self):
+        """
+        The state of positions that don't map to a cell.
+        """
+        return None
+
+    @abstractmethod
+    def index(self, position, size):
+        """
+        The index of the cell a position along an axis reads (or None if
+        it reads the boundary's state). Positions may be an array.
+
+        position: the position (which may be outside the axis).
+        size: the length of the axis.
+        """
+
+    def locate(self, x, y, width, height):
+        """
+        The (x, y) position of the cell a position reads (or None if it
+        reads the boundary's state).
+
+        x: the x position.
+        y: the y position.
+        width: the width of the grid.
+        height: the height of the grid.
+        """
+        if not 0 <= x < width:
+            x = self.index(x, width)
+
+            if x is None:
+                return None
+
+        if not 0 <= y < height:
+            y = self.index(y, height)
+
+            if y is None:
+                return None
+
+        return x, y
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.state == other.state
+
+    def __hash__(self):
+        return hash((type(self), self.state))
+
+    def __repr__(self):
+        return '{}()'.format(type(self).__name__)
+
+
+class Constant(Boundary):
+    """
+    Every position outside the grid is in the same state.
+
+    state: the state outside the grid (defaults to None).
+    """
+    __slots__ = ('_state',)
+
+    def __init__(self, state=None):
+        self._state = state
+
+    @property
+    def state(self):
+        return self._state
+
+    def index(self, position, size):
+        return None
+
+    def __repr__(self):
+        return 'Constant({!r})'.format(self._state)
+
+
+class Wrap(Boundary):
+    """
+    The grid is a torus: positions off one edge read the cells at the
+    opposite edge.
+    """
+    __slots__ = ()
+
+    def index(self, position, size):
+        return position % size
+
+
+class Reflect(Boundary):
+    """
+    The grid is mirrored at its edges: the position one past an edge
+    reads the cell on the edge, the next reads the one inside it, and so
+    on.
+    """
+    __slots__ = ()
+
+    def index(self, position, size):
+        position = position % (2 * size)
+
+        if isinstance(position, numpy.ndarray):
+            return numpy.minimum(position, 2 * size - 1 - position)
+
+        return min(position, 2 * size - 1 - position)
+
+
+EDGE = Constant()
+
+BOUNDARIES = {
+    'edge': EDGE,
+    'wrap': Wrap(),
+    'reflect': Reflect(),
+}
@@ -1,20 +1,76 @@
 """
 The cells within a cellular automata
 """
+from weakref import ref
 
+import numpy
 
-class Cells:
+from pica.boundaries import EDGE
+
+
+class Deferring:
     """
-    A collection of cells in a cellular automata
+    A base for cells whose Changes an engine finds lazily, by comparing
+    grids that the cells will later write over. The last such Changes are
+    remembered (weakly) so they can be found before that happens.
     """
-    def __init__(self, width, height, initial_state):
+    __slots__ = ('_pending',)
+
+    def defer(self, changes):
+        """
+        Remember Changes that will be found lazily from the cells, so they
+        can be found before any cell is written again.
+
+        changes: the pica.changes.Changes.
+        """
+        self._pending = ref(changes)
+
+    def settle(self):
+        """
+        Find the last deferred Changes, if anything still holds them.
+        Called before any cell is written.
+        """
+        changes = self._pending and self._pending()
+
+        if changes is not None:
+            changes.resolve()
+
+        self._pending = None
+
+
+class Cells(Deferring):
+    """
+    A collection of cells in a cellular automata.
+
+    The rows are stored with a ghost border of cells around them, which
+    hold what the boundary says is outside the grid. The border is
+    refreshed (see refresh) rather than kept up to date, so that engines
+    can read neighbors straight from the rows without checking bounds.
+
+    boundary: the pica.boundaries.Boundary of the grid (defaults to
+        pica.boundaries.EDGE, where everything outside is None).
+    border: the width of the ghost border.
+    """
+    __slots__ = (
+        '_width', '_height', '_version', '_cells', '_boundary', '_border',
+        '_refreshed',
+    )
+
+    def __init__(self, width, height, initial_state, boundary=EDGE, border=0):
         self._width = width
         self._height = height
+        self._version = 0
+        self._boundary = boundary
+        self._border = border
+        self._refreshed = None
+        self._pending = None
 
         self._cells = []
 
-        for _ in range(height):
-            self._cells.append([initial_state for _ in range(width)])
+        for _ in range(height + 2 * border):
+            self._cells.append(
+                [initial_state for _ in range(width + 2 * border)]
+            )
 
     @property
     def width(self):
@@ -24,15 +80,52 @@ class Cells:
     def height(self):
         return self._height
 
+    @property
+    def version(self):
+        """
+        A counter that goes up every time a cell is updated.
+        """
+        return self._version
+
+    @property
+    def boundary(self):
+        """
+        The pica.boundaries.Boundary of the grid.
+        """
+        return self._boundary
+
+    @property
+    def border(self):
+        """
+        The width of the ghost border around the rows.
+        """
+        return self._border
+
+    @property
+    def rows(self):
+        """
+        The rows of the cells, including the ghost border. The cell at
+        (x, y) is at rows[y + border][x + border].
+        """
+        return self._cells
+
     def cell(self, x, y):
         """
-        Get the value of the cell (or None if that cell is not in range)
+        Get the value of the cell (or what the boundary says is there if
+        that cell is not in range)
 
         x: the x position of the cell.
         y: the y position of the cell.
         """
-        if 0 <= y < self._height and 0 <= x < self._width:
-            return self._cells[y][x]
+        if not (0 <= y < self._height and 0 <= x < self._width):
+            position = self._boundary.locate(x, y, self._width, self._height)
+
+            if position is None:
+                return self._boundary.state
+
+            x, y = position
+
+        return self._cells[y + self._border][x + self._border]
 
     def row(self, y):
         """
@@ -43,7 +136,9 @@ class Cells:
         if y < 0 or y >= self._height:
             raise ValueError(y)
 
-        for cell in self._cells[y]:
+        border = self._border
+
+        for cell in self._cells[y + border][border:border + self._width]:
             yield cell
 
     def update(self, x, y, state):
@@ -60,4 +155,366 @@ class Cells:
         if y < 0 or y >= self._height:
             raise ValueError(y)
 
-        self._cells[y][x] = state
+        self.settle()
+
+        self._cells[y + self._border][x + self._border] = state
+        self._version += 1
+
+    def apply(self, changes):
+        """
+        Update every cell in a collection of changes at once. The changes
+        are assumed to be in range.
+
+        changes: the pica.changes.Changes to apply.
+        """
+        self.settle()
+
+        cells = self._cells
+        border = self._border
+
+        if border:
+            for x, y, state in zip(changes.xs, changes.ys, changes.states):
+                cells[y + border][x + border] = state
+        else:
+            for x, y, state in zip(changes.xs, changes.ys, changes.states):
+                cells[y][x] = state
+
+        self._version += len(changes)
+
+    def refresh(self):
+        """
+        Fill the ghost border from the boundary, if any cell has been
+        updated since it was last filled.
+        """
+        if self._refreshed == self._version:
+            return
+
+        border = self._border
+        width = self._width
+        height = self._height
+        boundary = self._boundary
+        rows = self._cells
+
+        if border:
+            columns = [
+                (x, boundary.index(x, width))
+                for x in outside(width, border)
+            ]
+
+            for row in rows[border:border + height]:
+                for x, source in columns:
+                    if source is None:
+                        row[x + border] = boundary.state
+                    else:
+                        row[x + border] = row[source + border]
+
+            for y in outside(height, border):
+                source = boundary.index(y, height)
+
+                if source is None:
+                    rows[y + border][:] = [boundary.state] * len(rows[y])
+                else:
+                    rows[y + border][:] = rows[source + border]
+
+        self._refreshed = self._version
+
+
+class BufferedCells(Cells):
+    """
+    Cells with a second (back) grid. An engine reads the current
+    generation from the rows, writes the next state of every cell into
+    the back grid, then swaps the two, so no changes need to be replayed.
+    After a swap the back grid holds the previous generation until the
+    next step overwrites it.
+
+    boundary: the pica.boundaries.Boundary of the grid.
+    border: the width of the ghost border around both grids.
+    """
+    __slots__ = ('_back',)
+
+    def __init__(self, width, height, initial_state, boundary=EDGE, border=0):
+        super().__init__(width, height, initial_state, boundary, border)
+
+        self._back = [list(row) for row in self._cells]
+
+    @property
+    def back(self):
+        """
+        The rows of the back grid, laid out like rows. Every cell (but not
+        the ghost border) must be written before swapping.
+        """
+        return self._back
+
+    def swap(self):
+        """
+        Make the back grid the current generation.
+        """
+        self._cells, self._back = self._back, self._cells
+        self._version += 1
+
+
+def outside(size, border):
+    """
+    The positions within a border of either end of an axis, but outside
+    it.
+
+    size: the length of the axis.
+    border: the width of the border.
+    """
+    return list(range(-border, 0)) + list(range(size, size + border))
+
+
+class StateTable:
+    """
+    Interns states, assigning each distinct state a small integer code.
+    Codes are handed out in the order states are first seen.
+    """
+    __slots__ = ('_states', '_codes')
+
+    def __init__(self, states=()):
+        self._states = []
+        self._codes = {}
+
+        for state in states:
+            self.code(state)
+
+    @property
+    def dtype(self):
+        """
+        The smallest unsigned integer type that can hold every code.
+        """
+        if len(self._states) <= 1 << 8:
+            return numpy.uint8
+        elif len(self._states) <= 1 << 16:
+            return numpy.uint16
+
+        return numpy.uint32
+
+    def code(self, state):
+        """
+        Get the code for a state, interning the state if it hasn't been
+        seen before.
+
+        state: the state to get the code of.
+        """
+        try:
+            return self._codes[state]
+        except KeyError:
+            code = len(self._states)
+
+            self._states.append(state)
+            self._codes[state] = code
+
+            return code
+
+    def find(self, state):
+        """
+        Get the code for a state (or None if the state hasn't been
+        interned).
+
+        state: the state to get the code of.
+        """
+        return self._codes.get(state)
+
+    def state(self, code):
+        """
+        Get the state for a code.
+
+        code: the code of the state.
+        """
+        return self._states[code]
+
+    def __contains__(self, state):
+        return state in self._codes
+
+    def __iter__(self):
+        return iter(self._states)
+
+    def __len__(self):
+        return len(self._states)
+
+
+class ArrayCells(Deferring):
+    """
+    A collection of cells stored as a contiguous array of state codes.
+
+    Each distinct state is interned into a StateTable, so the grid costs a
+    byte per cell for up to 256 states (two bytes for up to 65536).
+
+    states: states to intern up front, in code order (optional).
+    boundary: the pica.boundaries.Boundary of the grid (defaults to
+        pica.boundaries.EDGE, where everything outside is None).
+    """
+    __slots__ = (
+        '_width', '_height', '_version', '_states', '_codes', '_boundary',
+    )
+
+    def __init__(
+            self, width, height, initial_state, states=(), boundary=EDGE):
+        self._width = width
+        self._height = height
+        self._version = 0
+        self._boundary = boundary
+        self._pending = None
+
+        self._states = StateTable(states)
+        code = self._states.code(initial_state)
+
+        self._codes = numpy.full(
+            (height, width), code, dtype=self._states.dtype
+        )
+
+    @classmethod
+    def from_codes(cls, codes, states, boundary=EDGE):
+        """
+        Create cells around an existing array of state codes, without
+        copying it.
+
+        codes: the (height, width) array of state codes.
+        states: the states the codes refer to, in code order.
+        boundary: the pica.boundaries.Boundary of the grid.
+        """
+        cells = cls.__new__(cls)
+
+        cells._height, cells._width = codes.shape
+        cells._version = 0
+        cells._boundary = boundary
+        cells._states = StateTable(states)
+        cells._codes = codes
+        cells._pending = None
+
+        return cells
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def height(self):
+        return self._height
+
+    @property
+    def version(self):
+        """
+        A counter that goes up every time a cell is updated (through
+        update; writing to codes directly doesn't count).
+        """
+        return self._version
+
+    @property
+    def boundary(self):
+        """
+        The pica.boundaries.Boundary of the grid.
+        """
+        return self._boundary
+
+    @property
+    def states(self):
+        """
+        The table of states the codes refer to.
+        """
+        return self._states
+
+    @property
+    def codes(self):
+        """
+        The (height, width) array of state codes.
+        """
+        return self._codes
+
+    def cell(self, x, y):
+        """
+        Get the value of the cell (or what the boundary says is there if
+        that cell is not in range)
+
+        x: the x position of the cell.
+        y: the y position of the cell.
+        """
+        if not (0 <= y < self._height and 0 <= x < self._width):
+            position = self._boundary.locate(x, y, self._width, self._height)
+
+            if position is None:
+                return self._boundary.state
+
+            x, y = position
+
+        return self._states.state(self._codes.item(y, x))
+
+    def row(self, y):
+        """
+        A generator for enumerating over a row of the cells.
+
+        y: the y position of the cell.
+        """
+        if y < 0 or y >= self._height:
+            raise ValueError(y)
+
+        for code in self._codes[y].tolist():
+            yield self._states.state(code)
+
+    def update(self, x, y, state):
+        """
+        Update a cell.
+
+        x: the x position of the cell.
+        y: the y position of the cell.
+        state: The state to set the cell to.
+        """
+        if x < 0 or x >= self._width:
+            raise ValueError(x)
+
+        if y < 0 or y >= self._height:
+            raise ValueError(y)
+
+        self.settle()
+
+        self._codes[y, x] = self.code(state)
+        self._version += 1
+
+    def apply(self, changes):
+        """
+        Update every cell in a collection of changes with a single
+        scatter. The changes are assumed to be in range.
+
+        changes: the pica.changes.Changes to apply.
+        """
+        xs, ys, codes = changes.arrays()
+
+        if changes.table is not self._states:
+            lookup = [self.code(state) for state in changes.table]
+            codes = numpy.array(lookup, dtype=self._codes.dtype)[codes]
+
+        self.settle()
+
+        self._codes[ys, xs] = codes
+        self._version += len(changes)
+
+    def swap(self, codes):
+        """
+        Replace every cell at once with an array holding the next
+        generation, without copying it. Returns the previous array.
+
+        codes: the (height, width) array of state codes.
+        """
+        if codes.shape != self._codes.shape:
+            raise ValueError(codes.shape)
+
+        previous = self._codes
+        self._codes = codes
+        self._version += 1
+
+        return previous
+
+    def code(self, state):
+        """
+        Get the code for a state, interning the state (and widening the
+        grid if needed) if it hasn't been seen before.
+
+        state: the state to get the code of.
+        """
+        code = self._states.code(state)
+
+        if self._codes.dtype != self._states.dtype:
+            self._codes = self._codes.astype(self._states.dtype)
+
+        return code
@@ -0,0 +1,248 @@
+"""
+The changes made by a step of a cellular automata.
+"""
+from array import array
+from collections import namedtuple
+from collections.abc import Set
+
+import numpy
+
+from pica.cells import StateTable
+
+Change = namedtuple('Change', ('x', 'y', 'state'))
+
+
+class Changes(Set):
+    """
+    The changes made by a step, stored as parallel sequences of
+    coordinates and states (or state codes) rather than as a set of
+    tuples. It behaves as a set of Changes, but Change tuples are only
+    built as they are iterated over.
+
+    xs: the x position of each changed cell.
+    ys: the y position of each changed cell.
+    states: the new state of each changed cell.
+    """
+    __slots__ = (
+        '_xs', '_ys', '_states', '_codes', '_table', '_index', '_diff',
+        '__weakref__',
+    )
+
+    def __init__(self, xs=(), ys=(), states=()):
+        self._xs = xs
+        self._ys = ys
+        self._states = states
+        self._codes = None
+        self._table = None
+        self._index = None
+        self._diff = None
+
+    @classmethod
+    def from_codes(cls, xs, ys, codes, table):
+        """
+        Changes from arrays of coordinates and state codes. The states are
+        only looked up when they are asked for.
+
+        xs: an array of the x position of each changed cell.
+        ys: an array of the y position of each changed cell.
+        codes: an array of the new state code of each changed cell.
+        table: the pica.cells.StateTable the codes refer to.
+        """
+        changes = cls(xs, ys, None)
+        changes._codes = codes
+        changes._table = table
+
+        return changes
+
+    @classmethod
+    def diff(cls, before, after, table=None, border=0):
+        """
+        The changes between two generations of a grid, which are only
+        found when they are first needed (or resolve is called).
+
+        before: the earlier grid.
+        after: the later grid.
+        table: the pica.cells.StateTable the grids' codes refer to, if
+            they are arrays of codes. Otherwise, they are sequences of
+            rows of states.
+        border: the width of the ghost border around rows of states,
+            which is left out.
+        """
+        changes = cls()
+        changes._diff = (before, after, table, border)
+
+        return changes
+
+    @classmethod
+    def lazy(cls, find):
+        """
+        Changes that are only found (by calling find) when they are first
+        needed (or resolve is called).
+
+        find: a function returning arrays of the x positions, y positions
+            and new state codes of the changed cells, and the
+            pica.cells.StateTable the codes refer to.
+        """
+        changes = cls()
+        changes._diff = find
+
+        return changes
+
+    def resolve(self):
+        """
+        Find the changes, if they were built from a diff that hasn't been
+        looked at yet. This must be done before either grid is changed.
+        """
+        if self._diff is None:
+            return
+
+        if callable(self._diff):
+            find = self._diff
+            self._diff = None
+
+            self._xs, self._ys, self._codes, self._table = find()
+            self._states = None
+
+            return
+
+        before, after, table, border = self._diff
+        self._diff = None
+
+        if table is None:
+            xs = array('l')
+            ys = array('l')
+            states = []
+
+            if border:
+                inside = slice(border, -border)
+
+                before = [row[inside] for row in before[inside]]
+                after = [row[inside] for row in after[inside]]
+
+            for y, (old, new) in enumerate(zip(before, after)):
+                if old != new:
+                    for x, (previous, state) in enumerate(zip(old, new)):
+                        if previous != state:
+                            xs.append(x)
+                            ys.append(y)
+                            states.append(state)
+
+            self._xs = xs
+            self._ys = ys
+            self._states = states
+        else:
+            ys, xs = numpy.nonzero(before != after)
+
+            self._xs = xs
+            self._ys = ys
+            self._states = None
+            self._codes = after[ys, xs]
+            self._table = table
+
+    @classmethod
+    def _from_iterable(cls, iterable):
+        # set operations produce ordinary sets
+        return set(iterable)
+
+    @property
+    def xs(self):
+        self.resolve()
+
+        return self._xs
+
+    @property
+    def ys(self):
+        self.resolve()
+
+        return self._ys
+
+    @property
+    def states(self):
+        """
+        The new state of each changed cell.
+        """
+        self.resolve()
+
+        if self._states is None:
+            state = self._table.state
+            self._states = [state(code) for code in column(self._codes)]
+
+        return self._states
+
+    @property
+    def table(self):
+        """
+        The pica.cells.StateTable the codes from arrays refer to.
+        """
+        self.arrays()
+
+        return self._table
+
+    def arrays(self):
+        """
+        The changes as a tuple of numpy arrays of x positions, y positions
+        and state codes (see table). The coordinates are views of the
+        changes' buffers rather than copies.
+        """
+        self.resolve()
+
+        if self._codes is None:
+            self._table = StateTable()
+            self._codes = numpy.array(
+                [self._table.code(state) for state in self._states],
+                dtype=self._table.dtype
+            )
+
+        return (
+            numpy.asarray(self._xs, dtype=numpy.intp),
+            numpy.asarray(self._ys, dtype=numpy.intp),
+            self._codes,
+        )
+
+    def __len__(self):
+        self.resolve()
+
+        return len(self._xs)
+
+    def __iter__(self):
+        for x, y, state in stream(self):
+            yield Change(x, y, state)
+
+    def __contains__(self, change):
+        if self._index is None:
+            self._index = {(x, y): state for x, y, state in stream(self)}
+
+        try:
+            x, y, state = change
+        except (TypeError, ValueError):
+            return False
+
+        return (x, y) in self._index and self._index[(x, y)] == state
+
+    def __repr__(self):
+        return '{}({!r})'.format(type(self).__name__, set(self))
+
+
+def stream(changes):
+    """
+    Iterate over the (x, y, state) of each change, without building
+    Change tuples if the changes are Changes.
+
+    changes: the Changes (or any iterable of Change tuples).
+    """
+    if isinstance(changes, Changes):
+        return zip(column(changes.xs), column(changes.ys), changes.states)
+
+    return iter(changes)
+
+
+def column(values):
+    """
+    A sequence of Python values from a list, array.array or numpy array.
+
+    values: the sequence.
+    """
+    if isinstance(values, numpy.ndarray):
+        return values.tolist()
+
+    return values
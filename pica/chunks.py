@@ -0,0 +1,564 @@
+"""
+Sparse, chunked cells for huge grids that are mostly in one state.
+"""
+from array import array
+
+import numpy
+
+from pica.boundaries import EDGE
+from pica.changes import Changes
+from pica.engines import SerialEngine, affected, readers
+from pica.rules import UnorderedDistribution
+
+
+class ChunkedCells:
+    """
+    A collection of cells split into square chunks. A chunk whose cells
+    are all in the same state is stored as just that state, and is only
+    expanded into rows when one of its cells is updated to something
+    else. Chunks that become uniform again are collapsed when changes are
+    applied. Memory use follows the area that isn't uniform.
+
+    boundary: the pica.boundaries.Boundary of the grid.
+    size: the width and height of each chunk.
+    """
+    __slots__ = (
+        '_width', '_height', '_version', '_boundary', '_size',
+        '_background', '_uniform', '_dense',
+    )
+
+    def __init__(self, width, height, initial_state, boundary=EDGE, size=64):
+        if size < 1:
+            raise ValueError(size)
+
+        self._width = width
+        self._height = height
+        self._version = 0
+        self._boundary = boundary
+        self._size = size
+
+        # chunks in neither dictionary are in the background state
+        self._background = initial_state
+        self._uniform = {}
+        self._dense = {}
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def height(self):
+        return self._height
+
+    @property
+    def version(self):
+        """
+        A counter that goes up every time a cell is updated.
+        """
+        return self._version
+
+    @property
+    def boundary(self):
+        """
+        The pica.boundaries.Boundary of the grid.
+        """
+        return self._boundary
+
+    @property
+    def size(self):
+        """
+        The width and height of each chunk.
+        """
+        return self._size
+
+    @property
+    def chunks(self):
+        """
+        The number of chunks across and down the grid.
+        """
+        return -(-self._width // self._size), -(-self._height // self._size)
+
+    @property
+    def dense(self):
+        """
+        The number of chunks that have been expanded into rows.
+        """
+        return len(self._dense)
+
+    def chunk(self, x, y):
+        """
+        The rows of an expanded chunk (or None if the chunk is uniform).
+
+        x: the column of the chunk.
+        y: the row of the chunk.
+        """
+        return self._dense.get((x, y))
+
+    def uniform(self, x, y):
+        """
+        The state of every cell of a uniform chunk.
+
+        x: the column of the chunk.
+        y: the row of the chunk.
+        """
+        return self._uniform.get((x, y), self._background)
+
+    def cell(self, x, y):
+        """
+        Get the value of the cell (or what the boundary says is there if
+        that cell is not in range)
+
+        x: the x position of the cell.
+        y: the y position of the cell.
+        """
+        if not (0 <= y < self._height and 0 <= x < self._width):
+            position = self._boundary.locate(x, y, self._width, self._height)
+
+            if position is None:
+                return self._boundary.state
+
+            x, y = position
+
+        size = self._size
+        key = (x // size, y // size)
+
+        rows = self._dense.get(key)
+        if rows is not None:
+            return rows[y % size][x % size]
+
+        return self._uniform.get(key, self._background)
+
+    def row(self, y):
+        """
+        A generator for enumerating over a row of the cells.
+
+        y: the y position of the cell.
+        """
+        if y < 0 or y >= self._height:
+            raise ValueError(y)
+
+        for cell in self.segment(y, 0, self._width):
+            yield cell
+
+    def segment(self, y, start, stop):
+        """
+        A list of the states of part of a row. Positions outside the grid
+        are read through the boundary.
+
+        y: the y position of the row.
+        start: the x position of the first cell.
+        stop: the x position after the last cell.
+        """
+        if not (0 <= y < self._height and 0 <= start and stop <= self._width):
+            return [self.cell(x, y) for x in range(start, stop)]
+
+        size = self._size
+        cells = []
+
+        x = start
+        while x < stop:
+            key = (x // size, y // size)
+            end = min((key[0] + 1) * size, stop)
+
+            rows = self._dense.get(key)
+            if rows is not None:
+                cells.extend(rows[y % size][x % size:x % size + end - x])
+            else:
+                cells.extend(
+                    [self._uniform.get(key, self._background)] * (end - x)
+                )
+
+            x = end
+
+        return cells
+
+    def window(self, left, top, right, bottom, border):
+        """
+        The rows of a rectangle of cells with a ghost border around it,
+        laid out like pica.cells.Cells.rows, to read neighborhoods from.
+
+        left: the x position of the left of the rectangle.
+        top: the y position of the top of the rectangle.
+        right: the x position after the right of the rectangle.
+        bottom: the y position after the bottom of the rectangle.
+        border: the width of the ghost border.
+        """
+        return [
+            self.segment(y, left - border, right + border)
+            for y in range(top - border, bottom + border)
+        ]
+
+    def update(self, x, y, state):
+        """
+        Update a cell.
+
+        x: the x position of the cell.
+        y: the y position of the cell.
+        state: The state to set the cell to.
+        """
+        if x < 0 or x >= self._width:
+            raise ValueError(x)
+
+        if y < 0 or y >= self._height:
+            raise ValueError(y)
+
+        self._set(x, y, state)
+        self._version += 1
+
+    def apply(self, changes):
+        """
+        Update every cell in a collection of changes at once, collapsing
+        any chunk that is left uniform. The changes are assumed to be in
+        range.
+
+        changes: the pica.changes.Changes to apply.
+        """
+        size = self._size
+        touched = set()
+
+        for x, y, state in zip(changes.xs, changes.ys, changes.states):
+            if self._set(x, y, state):
+                touched.add((x // size, y // size))
+
+        for key in touched:
+            self._collapse(key)
+
+        self._version += len(changes)
+
+    def compact(self):
+        """
+        Collapse every expanded chunk whose cells are all in the same
+        state.
+        """
+        for key in list(self._dense):
+            self._collapse(key)
+
+    def _set(self, x, y, state):
+        """
+        Set a cell, expanding its chunk if it is uniform in a different
+        state. Returns whether the chunk is expanded.
+        """
+        size = self._size
+        key = (x // size, y // size)
+
+        rows = self._dense.get(key)
+
+        if rows is None:
+            current = self._uniform.get(key, self._background)
+
+            if current == state:
+                return False
+
+            rows = [[current] * size for _ in range(size)]
+
+            self._dense[key] = rows
+            self._uniform.pop(key, None)
+
+        rows[y % size][x % size] = state
+
+        return True
+
+    def _collapse(self, key):
+        """
+        Store a chunk as a single state if its cells are all the same.
+        Only the part of the chunk inside the grid is looked at.
+        """
+        rows = self._dense.get(key)
+
+        if rows is None:
+            return
+
+        size = self._size
+        width = min(self._width - key[0] * size, size)
+        height = min(self._height - key[1] * size, size)
+
+        state = rows[0][0]
+        for row in rows[:height]:
+            if width < size:
+                row = row[:width]
+
+            if row.count(state) != width:
+                return
+
+        del self._dense[key]
+
+        if state != self._background:
+            self._uniform[key] = state
+
+
+class ChunkedEngine(SerialEngine):
+    """
+    A SerialEngine for ChunkedCells, which steps a chunk at a time.
+
+    The cells of a uniform chunk that only read cells in the same state
+    all have the same neighborhood, so their distribution is only worked
+    out once: if it leaves them certain to stay in their state they are
+    skipped, and otherwise their next states are chosen from their draws
+    all at once. The rest of the cells are evaluated one at a time,
+    reading neighborhoods from a window of their chunk and its
+    surroundings.
+
+    Like a FrontierEngine, chunks where every cell was certain to stay in
+    its state (with pure rules) aren't evaluated again until a cell they
+    read changes, so steps take time in proportion to the area that is
+    changing. Updating cells other than through this engine's steps
+    causes the next step to evaluate every chunk.
+
+    The draws are the same as a SerialEngine's, so both take the same
+    steps given the same seed.
+
+    size: the width and height of the chunks of the cells it creates.
+    cache_size: the most distributions to remember (None for no limit).
+    seed: the seed for random draws (optional).
+    """
+    def __init__(self, size=64, cache_size=4096, seed=None):
+        super().__init__(cache_size, seed)
+
+        self._size = size
+        self._version = None
+        self._active = set()
+
+    def cells(self, width, height, initial_state, boundary=EDGE):
+        return ChunkedCells(width, height, initial_state, boundary, self._size)
+
+    def prepare(self, rules):
+        super().prepare(rules)
+
+        self._version = None
+        self._reach = readers(self._rules.neighborhood)
+
+    def step(self, cells):
+        """
+        Take a step in the simulation. Returns the Changes.
+        """
+        if not isinstance(cells, ChunkedCells):
+            return super().step(cells)
+
+        if cells.version != self._version:
+            columns, rows = cells.chunks
+            active = {
+                (column, row) for column in range(columns)
+                for row in range(rows)
+            }
+        else:
+            active = self._active
+
+        xs = array('l')
+        ys = array('l')
+        states = []
+
+        unsettled = set()
+
+        for key in sorted(active):
+            if not self._step_chunk(cells, key, xs, ys, states):
+                unsettled.add(key)
+
+        self._steps += 1
+
+        changes = Changes(xs, ys, states)
+
+        cells.apply(changes)
+
+        self._version = cells.version
+        self._active = unsettled | self._affected(cells, changes)
+
+        return changes
+
+    def _step_chunk(self, cells, key, xs, ys, states):
+        """
+        Step the cells of a chunk, adding their changes to the lists.
+        Returns whether every cell was certain to stay in its state.
+        """
+        size = cells.size
+        column, row = key
+
+        bounds = (
+            column * size, row * size,
+            min((column + 1) * size, cells.width),
+            min((row + 1) * size, cells.height),
+        )
+
+        inner = self._interior(cells, key, bounds)
+
+        if inner is None:
+            return self._step_cells(cells, bounds, xs, ys, states)
+
+        settled = self._step_uniform(
+            cells, cells.uniform(column, row), inner, xs, ys, states
+        )
+
+        if inner != bounds:
+            settled &= self._step_cells(cells, bounds, xs, ys, states, inner)
+
+        return settled
+
+    def _interior(self, cells, key, bounds):
+        """
+        The bounds of the cells of a uniform chunk that only read cells in
+        its state (or None if there are none, the chunk isn't uniform, or
+        its rules aren't pure).
+        """
+        column, row = key
+
+        if cells.chunk(column, row) is not None:
+            return None
+
+        state = cells.uniform(column, row)
+
+        if self._rules.outcomes(state) is not None and not self._rules.pure(
+                state):
+            return None
+
+        radius = self._rules.neighborhood.radius
+        left, top, right, bottom = bounds
+
+        def uniform(x, y, stop_x, stop_y):
+            return self._uniform(cells, state, x, y, stop_x, stop_y)
+
+        # a side whose surroundings differ gives up a border of cells
+        if not uniform(left - radius, top - radius, left, bottom + radius):
+            left += radius
+
+        if not uniform(right, top - radius, right + radius, bottom + radius):
+            right -= radius
+
+        if not uniform(left - radius, top - radius, right + radius, top):
+            top += radius
+
+        if not uniform(left - radius, bottom, right + radius, bottom + radius):
+            bottom -= radius
+
+        if left >= right or top >= bottom:
+            return None
+
+        return left, top, right, bottom
+
+    def _uniform(self, cells, state, left, top, right, bottom):
+        """
+        Whether a rectangle of cells is inside the grid and only covers
+        chunks that are uniform in a state.
+        """
+        if left >= right or top >= bottom:
+            return True
+
+        if left < 0 or top < 0 or right > cells.width or bottom > cells.height:
+            return False
+
+        size = cells.size
+
+        for column in range(left // size, (right - 1) // size + 1):
+            for row in range(top // size, (bottom - 1) // size + 1):
+                if cells.chunk(column, row) is not None:
+                    return False
+
+                if cells.uniform(column, row) != state:
+                    return False
+
+        return True
+
+    def _step_uniform(self, cells, state, bounds, xs, ys, states):
+        """
+        Step a rectangle of cells in one state that only read cells in
+        that state, adding the changes to the lists. Returns whether the
+        cells were certain to stay in their state.
+        """
+        if self._rules.outcomes(state) is None:
+            return True
+
+        neighborhood = (state,) * len(self._rules.neighborhood.offsets)
+        possible = self._distribution(state, neighborhood)
+
+        if not possible.total or possible.settles(state):
+            return True
+
+        if isinstance(possible, UnorderedDistribution):
+            return self._step_cells(cells, bounds, xs, ys, states)
+
+        left, top, right, bottom = bounds
+        draws = self._random.draws(
+            self._steps, right - left, bottom - top, left, top
+        )
+
+        # the same search as Distribution.choose
+        chosen = numpy.searchsorted(
+            possible.tally, possible.total * draws, side='right'
+        )
+
+        for index, next_state in enumerate(possible.states):
+            if next_state == state:
+                continue
+
+            changed_ys, changed_xs = numpy.nonzero(chosen == index)
+
+            xs.extend((changed_xs + left).tolist())
+            ys.extend((changed_ys + top).tolist())
+            states.extend([next_state] * len(changed_xs))
+
+        return False
+
+    def _step_cells(self, cells, bounds, xs, ys, states, skip=None):
+        """
+        Step a rectangle of cells one at a time, adding the changes to the
+        lists. Returns whether every cell was certain to stay in its
+        state.
+
+        skip: the bounds of cells within the rectangle to leave out.
+        """
+        left, top, right, bottom = bounds
+        radius = self._rules.neighborhood.radius
+
+        window = cells.window(left, top, right, bottom, radius)
+        gather = self._rules.padded_gather(radius)
+
+        outcomes = self._rules.outcomes
+        pure = self._rules.pure
+        distribution = self.distribution
+        draws = self._random.draws(
+            self._steps, right - left, bottom - top, left, top
+        ).tolist()
+
+        settled = True
+
+        for y in range(top, bottom):
+            current_row = window[y - top + radius]
+            draw_row = draws[y - top]
+
+            columns = range(left, right)
+            if skip is not None and skip[1] <= y < skip[3]:
+                columns = [
+                    x for x in columns if not skip[0] <= x < skip[2]
+                ]
+
+            for x in columns:
+                current = current_row[x - left + radius]
+
+                if outcomes(current) is None:
+                    continue
+
+                possible = distribution(
+                    cells, x, y, current, gather(window, x - left, y - top)
+                )
+
+                if not (pure(current) and possible.settles(current)):
+                    settled = False
+
+                if possible.total:  # at least one possibility
+                    state = possible.choose(draw_row[x - left])
+
+                    if state is not None and current != state:  # new state
+                        xs.append(x)
+                        ys.append(y)
+                        states.append(state)
+
+        return settled
+
+    def _affected(self, cells, changes):
+        """
+        The chunks with cells that read any of the changed cells.
+        """
+        size = cells.size
+
+        return {
+            (x // size, y // size)
+            for x, y in affected(cells, changes.xs, changes.ys, self._reach)
+        }
@@ -2,23 +2,50 @@
 """
 The command-line interface for pica.
 """
-from argparse import ArgumentParser
+from argparse import ArgumentParser, SUPPRESS
 import curses
+import json
+import sys
 
 from pica.automata import Automata
+from pica.bits import BitEngine
+from pica.boundaries import BOUNDARIES, EDGE
+from pica.chunks import ChunkedEngine
 from pica.conditions import Equals, Not, And, Or, If, InRange
-from pica.graphics import State, simulate
+from pica.engines import SerialEngine, FrontierEngine, ArrayEngine
+from pica.events import EventEngine
+from pica.graphics import State, label, simulate
+from pica.hashlife import HashEngine
+from pica.parallel import ParallelEngine, SharedMemory
 from pica.rules import Requirement, Rule
+from pica.tables import TableEngine
 
 WIDTH = 8
 HEIGHT = 8
 
 STEP_LENGTH = 0.25
 
+ENGINES = {
+    'serial': SerialEngine,
+    'frontier': FrontierEngine,
+    'array': ArrayEngine,
+    'table': TableEngine,
+    'events': EventEngine,
+    'chunked': ChunkedEngine,
+    'bits': BitEngine,
+    'hashlife': HashEngine,
+}
 
-def conway(width, height):
+# shared memory needs python 3.8
+if SharedMemory is not None:
+    ENGINES['parallel'] = ParallelEngine
+
+
+def conway(width, height, engine=None, boundary=EDGE):
     """
     A conway's game of life simulation
+
+    boundary: the pica.boundaries.Boundary of the grid.
     """
     alive = State('alive', '  ', 15)
     dead = State('dead', '  ', 0)
@@ -40,13 +67,26 @@ def conway(width, height):
         Rule(dead, alive, Equals(0, 0, dead), 1),
     ]
 
-    automata = Automata(width, height, dead, *rules)
+    automata = Automata(
+        width, height, dead, *rules, engine=engine, boundary=boundary
+    )
     automata.randomize((dead, alive))
 
     return automata
 
 
-def city(width, height):
+def city(
+        width, height, engine=None, spontaneous_road=0.001,
+        continued_road=0.05, boundary=EDGE):
+    """
+    A simulation of a city growing out of a field
+
+    spontaneous_road: the weight of a road appearing (or disappearing) on
+        its own.
+    continued_road: the weight of a road extending from a neighboring
+        road.
+    boundary: the pica.boundaries.Boundary of the grid.
+    """
     field = State('field', '  ', 2)
     tree = State('tree', '🌲 ', 2)
 
@@ -60,9 +100,6 @@ def city(width, height):
     states = (field, tree, vertical_road, horizontal_road, crossroad, house)
     roads = (vertical_road, horizontal_road, crossroad)
 
-    spontaneous_road = 0.001
-    continued_road = 0.05
-
     rules = (
         ###
         # field
@@ -382,29 +419,169 @@ def city(width, height):
         ),
     )
 
-    automata = Automata(width, height, field, *rules)
+    automata = Automata(
+        width, height, field, *rules, engine=engine, boundary=boundary
+    )
 
     return automata
 
 
-def main():
+def snapshot(automata, step):
     """
-    Run pica from the command line.
+    A JSON-serializable snapshot of the cells of an automata. Each cell is
+    the index of its state's name in the snapshot's list of states.
+
+    automata: the Automata.
+    step: the number of steps the automata has taken.
+    """
+    cells = automata.cells
+
+    states = {}
+    rows = []
+    for y in range(cells.height):
+        rows.append([
+            states.setdefault(state, len(states)) for state in cells.row(y)
+        ])
+
+    return {
+        'step': step,
+        'width': cells.width,
+        'height': cells.height,
+        'states': [label(state) for state in states],
+        'rows': rows,
+    }
+
+
+def batch(automata, steps, observe_every, output):
+    """
+    Run an automata without a terminal, writing snapshots to a file as
+    JSON lines: one every observe_every steps (if given), and one of the
+    final state. Returns the number of snapshots written.
+
+    automata: the Automata to run.
+    steps: the number of steps to take.
+    observe_every: the number of steps between snapshots (or None).
+    output: a writable text file.
+    """
+    written = []
+
+    def observe(automata, step):
+        output.write(json.dumps(snapshot(automata, step), sort_keys=True))
+        output.write('\n')
+        output.flush()
+
+        written.append(step)
+
+    automata.run(steps, observe_every, observe)
+
+    if not written or written[-1] != steps:
+        observe(automata, steps)
+
+    return len(written)
+
+
+def common_options(parser, suppress=False):
+    """
+    Add the options every command shares to a parser.
+
+    parser: the ArgumentParser to add the options to.
+    suppress: leave options that aren't given out of the parsed arguments,
+        rather than setting them to their defaults (optional).
+    """
+    def default(value):
+        return SUPPRESS if suppress else value
+
+    parser.add_argument('--width', default=default(8), type=int)
+    parser.add_argument('--height', default=default(8), type=int)
+    parser.add_argument(
+        '--engine', default=default('serial'), choices=sorted(ENGINES)
+    )
+    parser.add_argument('--seed', default=default(None), type=int)
+    parser.add_argument(
+        '--boundary', default=default('edge'), choices=sorted(BOUNDARIES)
+    )
+
+
+def parser():
     """
+    The parser for pica's command line. Simulations are shown in the
+    terminal with conway or city, or run with run to write snapshots
+    instead. The common options can be given before or after the command.
+    """
+    common = ArgumentParser(add_help=False)
+    common_options(common, suppress=True)
+
     parser = ArgumentParser(description='cellular automata')
-    parser.add_argument('--width', default=8, type=int)
-    parser.add_argument('--height', default=8, type=int)
-    parser.add_argument('--time', default=STEP_LENGTH, type=float)
-    parser.add_argument('simulation', choices=('conway', 'city'))
+    common_options(parser)
+
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    for simulation in ('conway', 'city'):
+        show = commands.add_parser(
+            simulation, parents=[common],
+            help='show a {} simulation in the terminal'.format(simulation)
+        )
+        show.add_argument('--time', default=STEP_LENGTH, type=float)
+
+    run = commands.add_parser(
+        'run', parents=[common],
+        help='run a simulation, writing snapshots as JSON lines'
+    )
+    run.add_argument('simulation', choices=('conway', 'city'))
+    run.add_argument(
+        '--steps', default=100, type=int,
+        help='the number of steps to take'
+    )
+    run.add_argument(
+        '--observe-every', type=int,
+        help='the number of steps between snapshots'
+    )
+    run.add_argument(
+        '--output', default='-',
+        help='the file to write snapshots to'
+    )
+
+    return parser
 
-    args = parser.parse_args()
 
-    if args.simulation == 'conway':
-        automata = conway(args.width, args.height)
+def main(argv=None):
+    """
+    Run pica from the command line.
+
+    argv: the arguments to parse (defaults to sys.argv).
+    """
+    arguments = parser()
+    args = arguments.parse_args(argv)
+
+    if args.command == 'run':
+        if args.steps < 0:
+            arguments.error('--steps must not be negative')
+        if args.observe_every is not None and args.observe_every < 1:
+            arguments.error('--observe-every must be at least 1')
+
+    engine = ENGINES[args.engine](seed=args.seed)
+    boundary = BOUNDARIES[args.boundary]
+
+    if args.command == 'run':
+        simulation = args.simulation
     else:
-        automata = city(args.width, args.height)
+        simulation = args.command
 
-    curses.wrapper(simulate, automata, args.time, 2)
+    if simulation == 'conway':
+        automata = conway(args.width, args.height, engine, boundary)
+    else:
+        automata = city(
+            args.width, args.height, engine, boundary=boundary
+        )
+
+    if args.command != 'run':
+        curses.wrapper(simulate, automata, args.time, 2)
+    elif args.output == '-':
+        batch(automata, args.steps, args.observe_every, sys.stdout)
+    else:
+        with open(args.output, 'w') as output:
+            batch(automata, args.steps, args.observe_every, output)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,375 @@
+"""
+Compile condition trees into flat Python functions.
+"""
+from collections import Counter
+
+from pica.conditions import CONTEXT, CompoundCondition
+
+
+class Compiler:
+    """
+    Builds the source of a single function that evaluates a condition
+    tree, with offsets and states baked in as constants. Compiled functions
+    take (cells, x, y, n), where n is the cell's gathered neighborhood if
+    the compiler has one.
+
+    shared: a dictionary from the id of a condition to the Shared function
+        to call instead of inlining it (optional).
+    neighborhood: the Neighborhood to read neighbors from (optional). If
+        not given, neighbors are read from the cells.
+    """
+    def __init__(self, shared=None, neighborhood=None):
+        self._constants = {}
+        self._shared = shared or {}
+        self._neighborhood = neighborhood
+        self._opaque = False
+        self._references = []
+        self._definitions = []
+
+    @property
+    def pure(self):
+        """
+        Whether the compiled code only depends on the gathered
+        neighborhood (and the shared functions it calls). Code that calls
+        back into conditions or rules may read anything.
+        """
+        return not self._opaque
+
+    @property
+    def references(self):
+        """
+        The Shared functions the compiled code calls.
+        """
+        return tuple(self._references)
+
+    def constant(self, value):
+        """
+        Bind a value into the compiled function, returning the name it can
+        be referred to by.
+
+        value: the value to bind.
+        """
+        name = 'c{}'.format(len(self._constants))
+        self._constants[name] = value
+
+        return name
+
+    def call(self, value):
+        """
+        The source for calling a condition or rule with (cells, x, y). The
+        compiled code will no longer be pure.
+
+        value: the condition or rule to call.
+        """
+        self._opaque = True
+
+        return '{}(cells, x, y)'.format(self.constant(value))
+
+    def define(self, statements):
+        """
+        Add a helper function taking (cells, x, y, n) to the compiled code,
+        for conditions that can't be written as a single expression.
+        Returns the source for calling it.
+
+        statements: the lines of the body of the function.
+        """
+        name = 'f{}'.format(len(self._definitions))
+
+        self._definitions.append('def {}(cells, x, y, n):\n{}'.format(
+            name, ''.join('    {}\n'.format(line) for line in statements)
+        ))
+
+        return '{}(cells, x, y, n)'.format(name)
+
+    def read(self, x, y):
+        """
+        The source for reading the state of a neighboring cell.
+
+        x: the x offset of the neighbor.
+        y: the y offset of the neighbor.
+        """
+        if self._neighborhood is not None:
+            return 'n[{}]'.format(self._neighborhood.index(x, y))
+
+        return 'cells.cell({}, {})'.format(offset('x', x), offset('y', y))
+
+    def source(self, condition):
+        """
+        The source of an expression evaluating a condition.
+
+        condition: the condition to compile.
+        """
+        shared = self._shared.get(id(condition))
+
+        if shared is not None:
+            self._references.append(shared)
+
+            return '{}(cells, x, y, n)'.format(self.constant(shared))
+
+        return condition.source(self)
+
+    def function(self, condition):
+        """
+        Compile a condition into a function taking (cells, x, y, n).
+
+        condition: the condition to compile.
+        """
+        return self.build(condition.source(self), repr(condition))
+
+    def build(self, expression, name):
+        """
+        Compile an expression into a function taking (cells, x, y, n).
+
+        expression: the source of the expression to return.
+        name: a name for the function, for tracebacks.
+        """
+        source = ''.join(self._definitions)
+        source += 'def function(cells, x, y, n=None):\n    return {}\n'.format(
+            expression
+        )
+
+        namespace = dict(self._constants)
+        exec(compile(source, '<{}>'.format(name), 'exec'), namespace)
+
+        return namespace['function']
+
+
+class Neighborhood:
+    """
+    The offsets of the neighbors that a collection of compiled conditions
+    read. Each offset is given an index into a tuple of neighbor states,
+    which is gathered once per cell.
+    """
+    def __init__(self):
+        self._indices = {}
+        self._offsets = []
+
+    @property
+    def offsets(self):
+        """
+        A tuple of the (x, y) offsets read, in index order.
+        """
+        return tuple(self._offsets)
+
+    @property
+    def radius(self):
+        """
+        The furthest any offset reaches along either axis.
+        """
+        return max(
+            (max(abs(x), abs(y)) for x, y in self._offsets), default=0
+        )
+
+    def index(self, x, y):
+        """
+        Get the index of an offset, adding it if it hasn't been read yet.
+
+        x: the x offset of the neighbor.
+        y: the y offset of the neighbor.
+        """
+        if (x, y) not in self._indices:
+            self._indices[(x, y)] = len(self._offsets)
+            self._offsets.append((x, y))
+
+        return self._indices[(x, y)]
+
+    def gatherer(self):
+        """
+        Compile a function taking (cells, x, y) that returns a tuple of the
+        states of a cell's neighbors at each offset.
+        """
+        reads = ''.join(
+            'cell({}, {}), '.format(offset('x', x), offset('y', y))
+            for x, y in self._offsets
+        )
+
+        source = (
+            'def gather(cells, x, y):\n'
+            '    cell = cells.cell\n'
+            '    return ({})\n'
+        ).format(reads)
+
+        namespace = {}
+        exec(compile(source, '<neighborhood>', 'exec'), namespace)
+
+        return namespace['gather']
+
+    def padded_gatherer(self, border):
+        """
+        Compile a function taking (rows, x, y) that returns the same tuple
+        as a gatherer, reading straight from the rows of pica.cells.Cells
+        with a ghost border at least as wide as the radius. There are no
+        bounds checks.
+
+        border: the width of the ghost border.
+        """
+        if border < self.radius:
+            raise ValueError(border)
+
+        rows = {}
+        for _, y in self._offsets:
+            rows.setdefault(y, 'row{}'.format(len(rows)))
+
+        lookups = ''.join(
+            '    {} = rows[{}]\n'.format(name, offset('y', y + border))
+            for y, name in rows.items()
+        )
+        reads = ''.join(
+            '{}[{}], '.format(rows[y], offset('x', x + border))
+            for x, y in self._offsets
+        )
+
+        source = (
+            'def gather(rows, x, y):\n'
+            '{}'
+            '    return ({})\n'
+        ).format(lookups, reads)
+
+        namespace = {}
+        exec(compile(source, '<neighborhood>', 'exec'), namespace)
+
+        return namespace['gather']
+
+
+class Shared:
+    """
+    A compiled condition that is referred to from more than one place. It
+    is evaluated at most once per generation of the CONTEXT.
+    """
+    def __init__(self):
+        self.function = None
+        self.compiler = None
+        self._generation = None
+        self._cached = None
+
+    def __call__(self, cells, x, y, n=None):
+        generation = CONTEXT.generation
+
+        if self._generation != generation:
+            self._cached = self.function(cells, x, y, n)
+            self._generation = generation
+
+        return self._cached
+
+
+def compile_condition(condition):
+    """
+    Compile a condition into a function taking (cells, x, y) that
+    evaluates the whole condition tree with no caching.
+
+    condition: the condition to compile.
+    """
+    return Compiler().function(condition)
+
+
+def offset(name, value):
+    """
+    The source for a coordinate plus a constant offset.
+
+    name: the name of the coordinate.
+    value: the offset.
+    """
+    if value > 0:
+        return '{} + {}'.format(name, value)
+    elif value < 0:
+        return '{} - {}'.format(name, -value)
+
+    return name
+
+
+def shared_conditions(conditions):
+    """
+    Find the compound conditions that are referred to more than once
+    within a collection of condition trees.
+
+    conditions: an iterable of conditions.
+    """
+    references = Counter()
+    nodes = {}
+
+    pending = list(conditions)
+    while pending:
+        condition = pending.pop()
+
+        references[id(condition)] += 1
+
+        if id(condition) not in nodes:
+            nodes[id(condition)] = condition
+
+            if isinstance(condition, CompoundCondition):
+                pending.extend(condition.conditions)
+
+    return [
+        nodes[key] for key, count in references.items()
+        if count > 1 and isinstance(nodes[key], CompoundCondition)
+    ]
+
+
+def pure(compiler, seen=None):
+    """
+    Whether the code built by a compiler, and every Shared function it
+    calls, only depends on the gathered neighborhood.
+
+    compiler: the Compiler that built the code.
+    """
+    if seen is None:
+        seen = set()
+
+    if not compiler.pure:
+        return False
+
+    for shared in compiler.references:
+        if id(shared) not in seen:
+            seen.add(id(shared))
+
+            if not pure(shared.compiler, seen):
+                return False
+
+    return True
+
+
+def compile_rules(groups, neighborhood):
+    """
+    Compile groups of rules into functions taking (cells, x, y, n) that
+    return a tuple of the result of each rule in the group (or None for
+    rules that don't produce one). Compound conditions that more than one
+    rule (or condition) refers to are shared, so that they are evaluated
+    at most once per cell.
+
+    Returns a (function, pure) pair for each group, where pure is whether
+    the function's results only depend on the neighborhood.
+
+    The rules are assumed to apply to the cell: their from_states aren't
+    checked.
+
+    groups: a list of sequences of rules.
+    neighborhood: the Neighborhood the functions read neighbors from.
+    """
+    shared = {
+        id(condition): (condition, Shared())
+        for condition in shared_conditions(
+            rule.condition for group in groups for rule in group
+        )
+    }
+
+    functions = {key: function for key, (_, function) in shared.items()}
+
+    for condition, function in shared.values():
+        function.compiler = Compiler(functions, neighborhood)
+        function.function = function.compiler.function(condition)
+
+    compiled = []
+
+    for group in groups:
+        compiler = Compiler(functions, neighborhood)
+
+        function = compiler.build(
+            '({})'.format(''.join(
+                '{}, '.format(rule.source(compiler)) for rule in group
+            )),
+            'rules'
+        )
+
+        compiled.append((function, pure(compiler)))
+
+    return compiled
@@ -4,13 +4,39 @@ Conditions for evaluating cellular automata.
 from abc import ABCMeta, abstractmethod, abstractproperty
 
 
+class Context:
+    """
+    The context conditions are evaluated in. A cached result is only valid
+    for the generation it was evaluated in, so advancing the context (once
+    per cell) invalidates every cached result at once.
+    """
+    def __init__(self):
+        self.generation = 0
+
+    def advance(self):
+        """
+        Start a new generation, invalidating all cached results.
+        """
+        self.generation += 1
+
+
+CONTEXT = Context()
+
+
 class Condition(metaclass=ABCMeta):
     """
     A condition to be matched. Once run, it will return the same result
-    with no further evaluation being done until the condition is reset.
+    with no further evaluation being done until the condition is reset or
+    the CONTEXT is advanced.
+
+    Conditions that can be evaluated for every cell of a pica.engines.Grid
+    at once also define mask(grid), returning a boolean array.
     """
+    __slots__ = ('_cached', '_generation')
+
     def __init__(self):
         self._cached = None
+        self._generation = None
 
     @abstractmethod
     def evaluate(self, cells, x, y):
@@ -18,12 +44,25 @@ class Condition(metaclass=ABCMeta):
         Actually make the evaluation
         """
 
+    def source(self, compiler):
+        """
+        The source of an expression evaluating the condition, for use by a
+        pica.compiler.Compiler. By default, the compiled code calls the
+        condition itself.
+
+        compiler: the compiler building the function.
+        """
+        return compiler.call(self)
+
     def __call__(self, cells, x, y):
         """
         Evaluate the condition using the cached value if possible
         """
-        if self._cached is None:
+        generation = CONTEXT.generation
+
+        if self._generation != generation:
             self._cached = self.evaluate(cells, x, y)
+            self._generation = generation
 
         return self._cached
 
@@ -31,13 +70,15 @@ class Condition(metaclass=ABCMeta):
         """
         Reset the condition.
         """
-        self._cached = None
+        self._generation = None
 
 
 class CompoundCondition(Condition):
     """
     A condition that operates on other conditions.
     """
+    __slots__ = ()
+
     @abstractproperty
     def conditions(self):
         """
@@ -54,11 +95,47 @@ class CompoundCondition(Condition):
             condition.reset()
 
 
+class Constant(Condition):
+    """
+    A condition that always evaluates to the same value.
+    """
+    __slots__ = ('_value',)
+
+    def __init__(self, value):
+        super().__init__()
+
+        self._value = value
+
+    @property
+    def value(self):
+        return self._value
+
+    def evaluate(self, cells, x, y):
+        """
+        Evaluate the condition.
+        """
+        return self._value
+
+    def mask(self, grid):
+        """
+        Evaluate the condition for every cell.
+        """
+        return grid.constant(bool(self._value))
+
+    def source(self, compiler):
+        """
+        The source for evaluating the condition.
+        """
+        return 'True' if self._value else 'False'
+
+
 class Equals(Condition):
     """
     A condition that evaluates as True if the cell is in an iterable of
     states.
     """
+    __slots__ = ('_x', '_y', '_states')
+
     def __init__(self, x, y, *states):
         super().__init__()
 
@@ -66,17 +143,53 @@ class Equals(Condition):
         self._y = y
         self._states = states
 
+    @property
+    def x(self):
+        return self._x
+
+    @property
+    def y(self):
+        return self._y
+
+    @property
+    def states(self):
+        return self._states
+
     def evaluate(self, cells, x, y):
         """
         Evaluate the condition.
         """
         return cells.cell(x + self._x, y + self._y) in self._states
 
+    def mask(self, grid):
+        """
+        Evaluate the condition for every cell.
+        """
+        return grid.matches(self._x, self._y, self._states)
+
+    def source(self, compiler):
+        """
+        The source for evaluating the condition.
+        """
+        if not self._states:
+            return 'False'
+
+        read = compiler.read(self._x, self._y)
+
+        if len(self._states) == 1:
+            return '({} == {})'.format(
+                read, compiler.constant(self._states[0])
+            )
+
+        return '({} in {})'.format(read, compiler.constant(self._states))
+
 
 class Not(CompoundCondition):
     """
     Inverts a condition
     """
+    __slots__ = ('_condition',)
+
     def __init__(self, condition):
         super().__init__()
 
@@ -92,11 +205,25 @@ class Not(CompoundCondition):
         """
         return not self._condition(cells, x, y)
 
+    def mask(self, grid):
+        """
+        Evaluate the condition for every cell.
+        """
+        return ~self._condition.mask(grid)
+
+    def source(self, compiler):
+        """
+        The source for evaluating the condition.
+        """
+        return '(not {})'.format(compiler.source(self._condition))
+
 
 class And(CompoundCondition):
     """
     Returns True if all subconditions match
     """
+    __slots__ = ('_conditions',)
+
     def __init__(self, *conditions):
         super().__init__()
 
@@ -112,11 +239,35 @@ class And(CompoundCondition):
         """
         return all(condition(cells, x, y) for condition in self._conditions)
 
+    def mask(self, grid):
+        """
+        Evaluate the condition for every cell.
+        """
+        mask = grid.constant(True)
+
+        for condition in self._conditions:
+            mask = mask & condition.mask(grid)
+
+        return mask
+
+    def source(self, compiler):
+        """
+        The source for evaluating the condition.
+        """
+        if not self._conditions:
+            return 'True'
+
+        return '({})'.format(' and '.join(
+            compiler.source(condition) for condition in self._conditions
+        ))
+
 
 class Or(CompoundCondition):
     """
     Returns True if any subconditions match
     """
+    __slots__ = ('_conditions',)
+
     def __init__(self, *conditions):
         super().__init__()
 
@@ -132,11 +283,35 @@ class Or(CompoundCondition):
         """
         return any(condition(cells, x, y) for condition in self._conditions)
 
+    def mask(self, grid):
+        """
+        Evaluate the condition for every cell.
+        """
+        mask = grid.constant(False)
+
+        for condition in self._conditions:
+            mask = mask | condition.mask(grid)
+
+        return mask
+
+    def source(self, compiler):
+        """
+        The source for evaluating the condition.
+        """
+        if not self._conditions:
+            return 'False'
+
+        return '({})'.format(' or '.join(
+            compiler.source(condition) for condition in self._conditions
+        ))
+
 
 class InRange(CompoundCondition):
     """
     Returns true if lower <= #matching <= upper.
     """
+    __slots__ = ('_lower', '_upper', '_conditions')
+
     def __init__(self, *conditions, lower=0, upper=None):
         super().__init__()
 
@@ -147,6 +322,14 @@ class InRange(CompoundCondition):
         self._upper = upper
         self._conditions = conditions
 
+    @property
+    def lower(self):
+        return self._lower
+
+    @property
+    def upper(self):
+        return self._upper
+
     @property
     def conditions(self):
         return self._conditions
@@ -169,11 +352,59 @@ class InRange(CompoundCondition):
 
         return True
 
+    def mask(self, grid):
+        """
+        Evaluate the condition for every cell.
+        """
+        count = 0
+
+        for condition in self._conditions:
+            count = count + condition.mask(grid)
+
+        return (
+            grid.constant(True) & (self._lower <= count) &
+            (count <= self._upper)
+        )
+
+    def source(self, compiler):
+        """
+        The source for evaluating the condition. Like evaluate, it stops
+        once more than upper subconditions have matched.
+        """
+        if len(self._conditions) <= max(self._upper, 0):
+            count = ' + '.join(
+                '(1 if {} else 0)'.format(compiler.source(condition))
+                for condition in self._conditions
+            ) or '0'
+
+            return '({} <= {} <= {})'.format(self._lower, count, self._upper)
+
+        statements = ['count = 0']
+
+        for index, condition in enumerate(self._conditions):
+            statements.append('if {}:'.format(compiler.source(condition)))
+            statements.append('    count += 1')
+
+            # only from here on can the count have passed upper
+            if index >= self._upper:
+                statements.append('    if count > {}:'.format(self._upper))
+                statements.append('        return False')
+
+        statements.append(
+            'return {} <= count <= {}'.format(self._lower, self._upper)
+        )
+
+        return compiler.define(statements)
+
 
 class If(CompoundCondition):
     """
     If condition then condition else condition
     """
+    __slots__ = (
+        '_if_condition', '_true_condition', '_false_condition', '_conditions'
+    )
+
     def __init__(self, if_condition, true_condition, false_condition=None):
         super().__init__()
 
@@ -186,6 +417,18 @@ class If(CompoundCondition):
         else:
             self._conditions = (if_condition, true_condition)
 
+    @property
+    def if_condition(self):
+        return self._if_condition
+
+    @property
+    def true_condition(self):
+        return self._true_condition
+
+    @property
+    def false_condition(self):
+        return self._false_condition
+
     @property
     def conditions(self):
         return self._conditions
@@ -200,3 +443,30 @@ class If(CompoundCondition):
             return self._false_condition(cells, x, y)
         else:
             return False
+
+    def mask(self, grid):
+        """
+        Evaluate the condition for every cell.
+        """
+        if_mask = self._if_condition.mask(grid)
+        mask = if_mask & self._true_condition.mask(grid)
+
+        if self._false_condition:
+            mask = mask | (~if_mask & self._false_condition.mask(grid))
+
+        return mask
+
+    def source(self, compiler):
+        """
+        The source for evaluating the condition.
+        """
+        if self._false_condition:
+            false_source = compiler.source(self._false_condition)
+        else:
+            false_source = 'False'
+
+        return '({} if {} else {})'.format(
+            compiler.source(self._true_condition),
+            compiler.source(self._if_condition),
+            false_source
+        )
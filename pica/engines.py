@@ -0,0 +1,768 @@
+"""
+Engines for stepping a cellular automata.
+"""
+from abc import ABCMeta, abstractmethod
+from array import array
+from functools import lru_cache
+from itertools import chain
+
+import numpy
+
+from pica.boundaries import EDGE
+from pica.cells import Cells, ArrayCells, BufferedCells, outside
+from pica.changes import Change, Changes  # noqa: F401
+from pica.conditions import CONTEXT, CompoundCondition
+from pica.randomness import Stream
+from pica.rules import AbstractRule, Distribution, RuleSet  # noqa: F401
+
+
+class Engine(metaclass=ABCMeta):
+    """
+    A strategy for stepping a cellular automata.
+
+    Each cell's draw for each step comes from a pica.randomness.Stream
+    keyed by the step number and the cell's position, and every engine
+    turns a draw into a next state the same way (see Distribution), so
+    engines given the same seed take the same steps.
+
+    seed: the seed for random draws (optional).
+    """
+    def __init__(self, seed=None):
+        self._rules = RuleSet(())
+        self._random = Stream(seed)
+        self._steps = 0
+
+    @property
+    def rules(self):
+        """
+        The RuleSet the engine runs.
+        """
+        return self._rules
+
+    @property
+    def random(self):
+        """
+        The pica.randomness.Stream draws come from.
+        """
+        return self._random
+
+    @property
+    def steps(self):
+        """
+        The number of steps taken (and so the step number of the next
+        step's draws).
+        """
+        return self._steps
+
+    def cells(self, width, height, initial_state, boundary=EDGE):
+        """
+        Create the cells the engine will step, with a ghost border as wide
+        as the rules reach.
+
+        width: the width of the automata.
+        height: the height of the automata.
+        initial_state: the state every cell starts in.
+        boundary: the pica.boundaries.Boundary of the grid.
+        """
+        return Cells(
+            width, height, initial_state, boundary,
+            self._rules.neighborhood.radius
+        )
+
+    def prepare(self, rules):
+        """
+        Prepare the engine to run a collection of rules.
+
+        rules: an iterable of rules.
+        """
+        self._rules = RuleSet(rules)
+
+    @abstractmethod
+    def step(self, cells):
+        """
+        Take a step in the simulation, updating the cells. Returns a set
+        of Changes.
+
+        cells: the cells to step.
+        """
+
+    def advance(self, cells, generations):
+        """
+        Take a number of steps without looking at their changes, which
+        engines that find changes lazily never build.
+
+        cells: the cells to step.
+        generations: the number of steps.
+        """
+        for _ in range(generations):
+            self.step(cells)
+
+
+class SerialEngine(Engine):
+    """
+    Evaluate the rules for every cell, one cell at a time. Only the rules
+    that apply to a cell's state are looked at, and each neighbor they
+    refer to is read once per cell.
+
+    The distribution of next states for a cell only depends on its state
+    and the neighbors its rules read, so distributions are memoized in a
+    least-recently-used cache keyed by that signature. Cells whose rules
+    can't be memoized that way still share the RuleSet's distributions
+    for the rules that fired.
+
+    Its cells are BufferedCells: the next state of every cell is written
+    into the back grid and the grids are swapped at the end of the step,
+    so the Changes are only found (by diffing the generations) if they
+    are looked at. Other cells have their changes written into buffers
+    that are reused from step to step and applied.
+
+    cache_size: the most distributions to remember (None for no limit).
+    seed: the seed for random draws (optional).
+    """
+    def __init__(self, cache_size=4096, seed=None):
+        super().__init__(seed)
+
+        self._cache_size = cache_size
+        self._distribution = lru_cache(cache_size)(self._evaluate)
+
+        self._xs = array('l')
+        self._ys = array('l')
+        self._next = []
+
+    def prepare(self, rules):
+        super().prepare(rules)
+
+        self._distribution = lru_cache(self._cache_size)(self._evaluate)
+
+    def cache_info(self):
+        """
+        The hits, misses, maxsize and currsize of the distribution cache.
+        """
+        return self._distribution.cache_info()
+
+    def cells(self, width, height, initial_state, boundary=EDGE):
+        return BufferedCells(
+            width, height, initial_state, boundary,
+            self._rules.neighborhood.radius
+        )
+
+    def step(self, cells):
+        """
+        Take a step in the simulation. Returns the Changes.
+        """
+        if isinstance(cells, BufferedCells):
+            return self._swap(cells)
+
+        self._reserve(cells.width * cells.height)
+
+        xs = self._xs
+        ys = self._ys
+        states = self._next
+        count = 0
+
+        cell = cells.cell
+        outcomes = self._rules.outcomes
+        gather, source = self._reader(cells)
+        distribution = self.distribution
+        draws = self._random.draws(
+            self._steps, cells.width, cells.height
+        ).tolist()
+
+        for x in range(cells.width):
+            for y in range(cells.height):
+                current = cell(x, y)
+
+                if outcomes(current) is None:
+                    continue
+
+                possible = distribution(
+                    cells, x, y, current, gather(source, x, y)
+                )
+
+                if possible.total:  # at least one possibility
+                    state = possible.choose(draws[y][x])
+
+                    if state is not None and current != state:  # new state
+                        xs[count] = x
+                        ys[count] = y
+                        states[count] = state
+                        count += 1
+
+        self._steps += 1
+
+        return self._apply(cells, count)
+
+    def _swap(self, cells):
+        """
+        Step BufferedCells by writing every cell's next state into the
+        back grid and swapping.
+        """
+        cells.settle()  # the back grid holds the last step's generation
+
+        outcomes = self._rules.outcomes
+        gather, source = self._reader(cells)
+        distribution = self.distribution
+        draws = self._random.draws(
+            self._steps, cells.width, cells.height
+        ).tolist()
+
+        border = cells.border
+        width = cells.width
+
+        for y in range(cells.height):
+            current_row = cells.rows[y + border]
+            next_row = cells.back[y + border]
+
+            for x in range(width):
+                current = current_row[x + border]
+                state = current
+
+                if outcomes(current) is not None:
+                    possible = distribution(
+                        cells, x, y, current, gather(source, x, y)
+                    )
+
+                    if possible.total:  # at least one possibility
+                        chosen = possible.choose(draws[y][x])
+
+                        if chosen is not None:
+                            state = chosen
+
+                next_row[x + border] = state
+
+        cells.swap()
+
+        self._steps += 1
+
+        changes = Changes.diff(cells.back, cells.rows, border=border)
+        cells.defer(changes)
+
+        return changes
+
+    def _reader(self, cells):
+        """
+        The function that gathers a cell's neighborhood and what to pass
+        it: the rows of Cells with a ghost border as wide as the rules
+        reach (refreshed first), or else the cells themselves.
+        """
+        if (
+                isinstance(cells, Cells) and
+                cells.border >= self._rules.neighborhood.radius):
+            cells.refresh()
+
+            return self._rules.padded_gather(cells.border), cells.rows
+
+        return self._rules.gather, cells
+
+    def distribution(self, cells, x, y, state, neighborhood):
+        """
+        The Distribution of next states for a cell, from the cache if its
+        rules are pure.
+
+        cells: the cells being stepped.
+        x: the x position of the cell.
+        y: the y position of the cell.
+        state: the state of the cell. It must have applicable rules.
+        neighborhood: the gathered neighborhood of the cell.
+        """
+        if self._rules.pure(state):
+            return self._distribution(state, neighborhood)
+
+        CONTEXT.advance()
+
+        return self._rules.distribution(
+            state, self._rules.outcomes(state)(cells, x, y, neighborhood)
+        )
+
+    def _evaluate(self, state, neighborhood):
+        """
+        Evaluate the distribution for a cell with pure rules.
+        """
+        CONTEXT.advance()
+
+        return self._rules.distribution(
+            state, self._rules.outcomes(state)(None, None, None, neighborhood)
+        )
+
+    def _reserve(self, size):
+        """
+        Make sure the change buffers can hold a change for every cell.
+        """
+        if len(self._next) < size:
+            self._xs = array('l', bytes(self._xs.itemsize * size))
+            self._ys = array('l', bytes(self._ys.itemsize * size))
+            self._next = [None] * size
+
+    def _apply(self, cells, count):
+        """
+        Apply the first count changes in the buffers to the cells,
+        returning them as Changes.
+        """
+        changes = Changes(
+            self._xs[:count], self._ys[:count], self._next[:count]
+        )
+
+        cells.apply(changes)
+
+        return changes
+
+
+class FrontierEngine(SerialEngine):
+    """
+    A SerialEngine that only evaluates the cells that could change.
+
+    A cell whose neighborhood didn't change in the last step has the same
+    distribution it had then, so if it was certain to stay in its state
+    it can be skipped. Cells with rules that may change on their own (or
+    rules that can't be analysed) are evaluated every step.
+
+    Updating cells other than through this engine's steps causes the next
+    step to evaluate every cell. Only the cells that could change are
+    written, so its cells aren't buffered.
+
+    cache_size: the most distributions to remember (None for no limit).
+    seed: the seed for random draws (optional).
+    """
+    def __init__(self, cache_size=4096, seed=None):
+        super().__init__(cache_size, seed)
+
+        self._version = None
+        self._unsettled = set()
+        self._changes = Changes()
+        self._evaluated = 0
+
+    def cells(self, width, height, initial_state, boundary=EDGE):
+        return Engine.cells(self, width, height, initial_state, boundary)
+
+    @property
+    def evaluated(self):
+        """
+        The number of cells evaluated in the last step.
+        """
+        return self._evaluated
+
+    def prepare(self, rules):
+        super().prepare(rules)
+
+        self._version = None
+        self._reach = readers(self._rules.neighborhood)
+
+    def step(self, cells):
+        """
+        Take a step in the simulation. Returns a set of Changes.
+        """
+        width = cells.width
+        height = cells.height
+
+        if cells.version != self._version:
+            candidates = (
+                (x, y) for x in range(width) for y in range(height)
+            )
+        else:
+            candidates = sorted(self._unsettled | affected(
+                cells, self._changes.xs, self._changes.ys, self._reach
+            ))
+
+        self._reserve(width * height)
+
+        xs = self._xs
+        ys = self._ys
+        states = self._next
+        count = 0
+
+        unsettled = set()
+        evaluated = 0
+
+        gather, source = self._reader(cells)
+        pending = []
+
+        for x, y in candidates:
+            current = cells.cell(x, y)
+
+            if self._rules.outcomes(current) is None:
+                continue
+
+            evaluated += 1
+
+            distribution = self.distribution(
+                cells, x, y, current, gather(source, x, y)
+            )
+
+            if not (
+                self._rules.pure(current) and distribution.settles(current)
+            ):
+                unsettled.add((x, y))
+
+            if distribution.total:  # at least one possibility
+                pending.append((x, y, current, distribution))
+
+        if pending:
+            draws = self._random.sample(
+                self._steps,
+                [x for x, _, _, _ in pending],
+                [y for _, y, _, _ in pending]
+            ).tolist()
+
+            for (x, y, current, distribution), draw in zip(pending, draws):
+                state = distribution.choose(draw)
+
+                if state is not None and current != state:  # new state
+                    xs[count] = x
+                    ys[count] = y
+                    states[count] = state
+                    count += 1
+
+        changes = self._apply(cells, count)
+
+        self._steps += 1
+
+        self._version = cells.version
+        self._unsettled = unsettled
+        self._changes = changes
+        self._evaluated = evaluated
+
+        return changes
+
+
+class ArrayEngine(Engine):
+    """
+    Evaluate every rule for the whole grid at once. Conditions are
+    translated into boolean masks over shifted views of an array of state
+    codes, rule weights are accumulated per state, and the next state of
+    every cell is sampled in one pass. The next generation replaces the
+    cells' array by swapping, and the Changes are only found (by diffing
+    the generations) if they are looked at.
+
+    Cells in a state with a rule that can't be evaluated as an array (see
+    maskable) are evaluated one at a time instead, like a SerialEngine
+    would.
+
+    seed: the seed for random draws (optional).
+    """
+    def __init__(self, seed=None):
+        super().__init__(seed)
+
+        self._unmasked = frozenset()
+
+    def prepare(self, rules):
+        super().prepare(rules)
+
+        self._unmasked = frozenset(
+            state for state in self._rules.states
+            if not all(map(maskable, self._rules.applicable(state)))
+        )
+
+    def cells(self, width, height, initial_state, boundary=EDGE):
+        return ArrayCells(width, height, initial_state, boundary=boundary)
+
+    def step(self, cells):
+        """
+        Take a step in the simulation. Returns a set of Changes.
+        """
+        codes = self.next_codes(
+            cells, self._random.draws(self._steps, cells.width, cells.height)
+        )
+
+        previous = cells.swap(codes)
+
+        self._steps += 1
+
+        changes = Changes.diff(previous, codes, cells.states)
+        cells.defer(changes)
+
+        return changes
+
+    def next_codes(self, cells, draws):
+        """
+        Calculate the next state code of every cell.
+
+        cells: the ArrayCells to evaluate.
+        draws: an array of uniform [0, 1) draws, one per cell.
+        """
+        grid = Grid(cells.codes, cells.states, cells.boundary)
+        chosen = numpy.full(grid.shape, -1, dtype=numpy.int64)
+
+        # each state's candidates are weighed and summed in the same order
+        # as a Distribution's, so a draw picks the same next state
+        for state in self._rules.states:
+            if state in self._unmasked:
+                self._evaluate_cells(cells, state, draws, chosen)
+                continue
+
+            order = []
+            weights = {}
+            fired = {}
+            forbidden = {}
+
+            for rule in self._rules.applicable(state):
+                result, mask = rule.mask(grid)
+                code = cells.code(result.state)
+
+                if code not in fired:
+                    order.append(code)
+                    weights[code] = numpy.zeros(grid.shape)
+                    fired[code] = grid.constant(False)
+                    forbidden[code] = grid.constant(False)
+
+                if result.difference is None:
+                    forbidden[code] = forbidden[code] | mask
+                else:
+                    weights[code] = weights[code] + numpy.where(
+                        mask, result.difference, 0.0
+                    )
+                    fired[code] = fired[code] | mask
+
+            total = numpy.zeros(grid.shape)
+            possible = {}
+            for code in order:
+                possible[code] = fired[code] & ~forbidden[code]
+                weights[code] = numpy.where(
+                    possible[code], weights[code], 0.0
+                )
+                total += weights[code]
+
+            value = total * draws
+
+            tally = numpy.zeros(grid.shape)
+            for code in order:
+                tally += weights[code]
+                chosen[possible[code] & (chosen < 0) & (value < tally)] = code
+
+            chosen[grid.is_state(state) & (total == 0)] = -1
+
+        return numpy.where(chosen < 0, cells.codes, chosen).astype(
+            cells.codes.dtype
+        )
+
+    def _evaluate_cells(self, cells, state, draws, chosen):
+        """
+        Choose the next state code of each cell in a state one cell at a
+        time, for rules that can't be evaluated as arrays.
+        """
+        code = cells.states.find(state)
+
+        if code is None:
+            return
+
+        outcomes = self._rules.outcomes(state)
+        gather = self._rules.gather
+        views = {}
+
+        # any leading axes (an Ensemble's replicas) index separate grids
+        for index in map(tuple, numpy.argwhere(cells.codes == code)):
+            grid = index[:-2]
+            y, x = (int(position) for position in index[-2:])
+
+            if grid not in views:
+                views[grid] = ArrayCells.from_codes(
+                    cells.codes[grid], cells.states, cells.boundary
+                )
+
+            view = views[grid]
+
+            CONTEXT.advance()
+
+            possible = self._rules.distribution(
+                state, outcomes(view, x, y, gather(view, x, y))
+            )
+
+            if possible.total:  # at least one possibility
+                next_state = possible.choose(draws[index])
+
+                if next_state is not None:
+                    chosen[index] = cells.code(next_state)
+
+
+def readers(neighborhood):
+    """
+    The offsets from a cell to the cells that read it through a
+    neighborhood: itself, and the opposite of every offset read. A change
+    to a cell affects all of them.
+
+    neighborhood: the pica.compiler.Neighborhood the rules read.
+    """
+    return frozenset(
+        {(0, 0)} | {(-x, -y) for x, y in neighborhood.offsets}
+    )
+
+
+def affected(cells, xs, ys, reach):
+    """
+    The set of (x, y) positions of the cells that read any of a collection
+    of cells, directly or through the boundary.
+
+    cells: the cells of the grid.
+    xs: the x positions of the cells that are read.
+    ys: the y positions of the cells that are read.
+    reach: the offsets from a cell to the cells that read it (see
+        readers).
+    """
+    width = cells.width
+    height = cells.height
+
+    radius = max(map(abs, chain.from_iterable(reach)), default=0)
+    columns = images(cells.boundary, width, radius)
+    rows = images(cells.boundary, height, radius)
+
+    found = set()
+
+    for x, y in zip(xs, ys):
+        image_xs = columns[x]
+        image_ys = rows[y]
+
+        # cells away from the edges are only read from inside the grid
+        if (
+                len(image_xs) == 1 and len(image_ys) == 1 and
+                radius <= x < width - radius and
+                radius <= y < height - radius):
+            found.update([(x + dx, y + dy) for dx, dy in reach])
+            continue
+
+        for image_x in image_xs:
+            for image_y in image_ys:
+                for dx, dy in reach:
+                    if (
+                            0 <= image_x + dx < width and
+                            0 <= image_y + dy < height):
+                        found.add((image_x + dx, image_y + dy))
+
+    return found
+
+
+@lru_cache(64)
+def images(boundary, size, radius):
+    """
+    A dictionary from each position along an axis of a grid to the
+    positions within a radius of the axis that read it: itself, and any
+    outside the grid that the boundary maps to it. The dictionaries are
+    memoized, so they must not be changed.
+
+    boundary: the pica.boundaries.Boundary of the grid.
+    size: the length of the axis.
+    radius: how far outside the axis to look.
+    """
+    found = {position: [position] for position in range(size)}
+
+    for position in outside(size, radius):
+        index = boundary.index(position, size)
+
+        if index is not None:
+            found[index].append(position)
+
+    return found
+
+
+def maskable(item):
+    """
+    Whether a rule or condition can be evaluated for a whole Grid at once:
+    it has a mask method, as do the conditions it is built from.
+
+    item: the rule or condition.
+    """
+    if not hasattr(item, 'mask'):
+        return False
+
+    if isinstance(item, AbstractRule):
+        return maskable(item.condition)
+
+    if isinstance(item, CompoundCondition):
+        return all(map(maskable, item.conditions))
+
+    return True
+
+
+class Grid:
+    """
+    A view of an array of state codes, used to evaluate conditions over
+    every cell at once. Conditions ask for boolean masks through it.
+    """
+    def __init__(self, codes, states, boundary=EDGE):
+        self._codes = codes
+        self._states = states
+        self._boundary = boundary
+        self._matches = {}
+
+    @property
+    def shape(self):
+        return self._codes.shape
+
+    def constant(self, value):
+        """
+        A mask with the same value for every cell.
+
+        value: the value of every cell in the mask.
+        """
+        return numpy.full(self._codes.shape, value, dtype=bool)
+
+    def is_state(self, state):
+        """
+        A mask of the cells that are in a state.
+
+        state: the state to match.
+        """
+        return self.matches(0, 0, (state,))
+
+    def matches(self, x, y, states):
+        """
+        A mask of the cells whose neighbor at an offset is in one of a
+        collection of states. Neighbors outside the grid are read through
+        the boundary.
+
+        x: the x offset of the neighbor.
+        y: the y offset of the neighbor.
+        states: a tuple of states to match.
+        """
+        key = (x, y, states)
+
+        try:
+            return self._matches[key]
+        except KeyError:
+            pass
+
+        member = numpy.zeros(len(self._states), dtype=bool)
+        for state in states:
+            code = self._states.find(state)
+
+            if code is not None:
+                member[code] = True
+
+        mask = shift(
+            member[self._codes], x, y, self._boundary.state in states,
+            self._boundary
+        )
+        self._matches[key] = mask
+
+        return mask
+
+
+def shift(array, x, y, fill, boundary=EDGE):
+    """
+    Shift the last two axes of an array so that each cell holds the value
+    of its neighbor at (x, y). Neighbors outside the array are read
+    through the boundary, or take the fill value if it has no cell for
+    them.
+
+    array: the array to shift.
+    x: the x offset of the neighbor.
+    y: the y offset of the neighbor.
+    fill: the value of neighbors outside the array.
+    boundary: the pica.boundaries.Boundary of the array.
+    """
+    height, width = array.shape[-2:]
+
+    rows = boundary.index(numpy.arange(y, y + height), height)
+    columns = boundary.index(numpy.arange(x, x + width), width)
+
+    if rows is not None and columns is not None:
+        return array[..., rows[:, None], columns]
+
+    shifted = numpy.full(array.shape, fill, dtype=array.dtype)
+
+    if abs(x) < width and abs(y) < height:
+        shifted[
+            ..., max(0, -y):height - max(0, y), max(0, -x):width - max(0, x)
+        ] = array[
+            ..., max(0, y):height - max(0, -y), max(0, x):width - max(0, -x)
+        ]
+
+    return shifted
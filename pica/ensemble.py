@@ -0,0 +1,236 @@
+"""
+Many independent replicas of a cellular automata, stepped together.
+"""
+from random import SystemRandom
+
+import numpy
+
+from pica.boundaries import EDGE
+from pica.cells import ArrayCells, StateTable
+from pica.engines import ArrayEngine
+from pica.optimizer import Report, optimize as optimize_rules
+from pica.randomness import RANDOMIZE, STEP, keys, sample
+
+
+class Ensemble:
+    """
+    A collection of replicas of a cellular automata that share rules but
+    have their own cells and seeds. The cells of every replica are kept
+    in one (replicas, height, width) array of state codes, and each step
+    evaluates the rules for every replica in a single vectorized pass.
+
+    Each replica takes the same steps as an Automata run with an
+    ArrayEngine given the replica's seed.
+
+    replicas: the number of replicas.
+    width: the width of each replica.
+    height: the height of each replica.
+    initial_state: the state every cell starts in.
+    seeds: a seed for each replica (optional). If not given, seeds are
+        chosen at random.
+    engine: the pica.engines.ArrayEngine (or subclass) used to evaluate
+        the rules (defaults to an ArrayEngine).
+    optimize: whether to simplify the rules before running them (see
+        pica.optimizer.optimize).
+    boundary: the pica.boundaries.Boundary of every replica.
+    """
+    def __init__(
+            self, replicas, width, height, initial_state, *rules,
+            seeds=None, engine=None, optimize=True, boundary=EDGE):
+        if seeds is None:
+            generator = SystemRandom()
+            seeds = [generator.getrandbits(64) for _ in range(replicas)]
+
+        seeds = tuple(seeds)
+
+        if len(seeds) != replicas:
+            raise ValueError(seeds)
+
+        if engine is None:
+            engine = ArrayEngine()
+
+        if optimize:
+            optimized, self._optimization = optimize_rules(rules)
+        else:
+            optimized, self._optimization = rules, Report()
+
+        engine.prepare(optimized)
+
+        self._engine = engine
+        self._seeds = seeds
+        self._keys = tuple(key[:, None, None] for key in keys(seeds))
+        self._width = width
+        self._height = height
+        self._boundary = boundary
+        self._steps = 0
+        self._randomized = 0
+
+        self._states = StateTable()
+        code = self._states.code(initial_state)
+
+        self._codes = numpy.full(
+            (replicas, height, width), code, dtype=self._states.dtype
+        )
+
+    @property
+    def replicas(self):
+        return len(self._seeds)
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def height(self):
+        return self._height
+
+    @property
+    def boundary(self):
+        return self._boundary
+
+    @property
+    def seeds(self):
+        return self._seeds
+
+    @property
+    def steps(self):
+        """
+        The number of steps taken.
+        """
+        return self._steps
+
+    @property
+    def engine(self):
+        return self._engine
+
+    @property
+    def optimization(self):
+        """
+        A pica.optimizer.Report of what was removed from the rules.
+        """
+        return self._optimization
+
+    @property
+    def states(self):
+        """
+        The table of states the codes refer to.
+        """
+        return self._states
+
+    @property
+    def codes(self):
+        """
+        The (replicas, height, width) array of state codes.
+        """
+        return self._codes
+
+    def code(self, state):
+        """
+        Get the code for a state, interning the state (and widening the
+        grid if needed) if it hasn't been seen before.
+
+        state: the state to get the code of.
+        """
+        code = self._states.code(state)
+
+        if self._codes.dtype != self._states.dtype:
+            self._codes = self._codes.astype(self._states.dtype)
+
+        return code
+
+    def replica(self, index):
+        """
+        The cells of a replica, as ArrayCells sharing the ensemble's
+        codes. Updating them changes the ensemble, but only for states
+        the ensemble already knows about (see update).
+
+        index: the index of the replica.
+        """
+        return ArrayCells.from_codes(
+            self._codes[index], self._states, self._boundary
+        )
+
+    def update(self, replica, x, y, state):
+        """
+        Update a cell of a replica.
+
+        replica: the index of the replica.
+        x: the x position of the cell.
+        y: the y position of the cell.
+        state: the state to set the cell to.
+        """
+        if x < 0 or x >= self._width:
+            raise ValueError(x)
+
+        if y < 0 or y >= self._height:
+            raise ValueError(y)
+
+        self._codes[replica, y, x] = self.code(state)
+
+    def randomize(self, states):
+        """
+        Randomize every replica, the same way Automata.randomize would.
+
+        states: a sequence of possible states.
+        """
+        if not states:
+            raise ValueError(states)
+
+        codes = numpy.array([self.code(state) for state in states])
+
+        draws = self._draws(self._randomized, RANDOMIZE)
+        self._randomized += 1
+
+        # the same arithmetic as Automata.randomize
+        self._codes[...] = codes[(draws * len(states)).astype(int)]
+
+    def step(self):
+        """
+        Take a step in every replica. Returns an array of the number of
+        cells that changed in each replica.
+        """
+        codes = self._engine.next_codes(self, self._draws(self._steps, STEP))
+
+        changed = codes != self._codes
+        self._codes = codes
+        self._steps += 1
+
+        return changed.sum(axis=(1, 2))
+
+    def population(self, state):
+        """
+        An array of the number of cells in a state in each replica.
+
+        state: the state to count.
+        """
+        code = self._states.find(state)
+
+        if code is None:
+            return numpy.zeros(self.replicas, dtype=int)
+
+        return (self._codes == code).sum(axis=(1, 2))
+
+    def populations(self):
+        """
+        A dictionary from each state to an array of the number of cells in
+        that state in each replica.
+        """
+        counts = numpy.zeros((self.replicas, len(self._states)), dtype=int)
+
+        flat = self._codes.reshape(self.replicas, -1)
+        for replica in range(self.replicas):
+            counts[replica] = numpy.bincount(
+                flat[replica], minlength=len(self._states)
+            )
+
+        return {
+            state: counts[:, code] for code, state in enumerate(self._states)
+        }
+
+    def _draws(self, step, channel):
+        """
+        The (replicas, height, width) array of draws for a step.
+        """
+        y, x = numpy.mgrid[0:self._height, 0:self._width]
+
+        return sample(self._keys, step, x, y, channel)
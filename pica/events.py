@@ -0,0 +1,155 @@
+"""
+An event-driven, continuous-time engine for rulesets where transitions
+are rare.
+"""
+from heapq import heappop, heappush
+from itertools import count
+from random import Random
+
+from pica.boundaries import EDGE
+from pica.changes import Changes
+from pica.engines import Engine, SerialEngine, affected, readers
+
+
+class EventEngine(SerialEngine):
+    """
+    Step a cellular automata in continuous time, jumping straight from
+    one transition to the next instead of visiting every cell.
+
+    Each cell leaves its state at a rate equal to the probability a
+    synchronous step would give it of changing, split between its
+    possible next states in the same proportions. Pending transitions are
+    kept in a priority queue, and when a cell changes only the cells whose
+    neighborhoods include it have their rates recalculated. Because the
+    waiting times are exponential, cells that still have the same rates
+    keep their pending transitions.
+
+    Updating cells other than through this engine's steps causes every
+    rate to be recalculated at the next step.
+
+    duration: how much simulated time each step covers.
+    seed: the seed for random draws (optional).
+    cache_size: the most distributions to remember (None for no limit).
+    """
+    def __init__(self, duration=1.0, seed=None, cache_size=4096):
+        super().__init__(cache_size, seed)
+
+        self._duration = duration
+        self._clock = Random(self._random.seed)
+
+        self._time = 0.0
+        self._version = None
+        self._events = []
+        self._scheduled = {}
+        self._sequence = count()
+
+    def cells(self, width, height, initial_state, boundary=EDGE):
+        return Engine.cells(self, width, height, initial_state, boundary)
+
+    @property
+    def time(self):
+        """
+        The simulated time the cells are at.
+        """
+        return self._time
+
+    def prepare(self, rules):
+        super().prepare(rules)
+
+        for state in self._rules.states:
+            if not self._rules.pure(state):
+                raise ValueError(
+                    'the rates for {!r} cannot be tracked'.format(state)
+                )
+
+        self._version = None
+        self._reach = readers(self._rules.neighborhood)
+
+    def step(self, cells):
+        """
+        Advance the simulation by one step's duration. Returns a set of
+        Changes for the cells that ended in a different state.
+        """
+        if cells.version != self._version:
+            self._events = []
+            self._scheduled = {}
+
+            for x in range(cells.width):
+                for y in range(cells.height):
+                    self._schedule(cells, x, y)
+
+        end = self._time + self._duration
+        initial = {}
+
+        while self._events and self._events[0][0] < end:
+            time, x, y, event = heappop(self._events)
+
+            rate, targets, current = self._scheduled[(x, y)]
+
+            if current != event:  # rescheduled since
+                continue
+
+            self._time = time
+
+            value = rate * self._clock.random()
+            for state, probability in targets:
+                value -= probability
+
+                if value < 0:
+                    break
+
+            initial.setdefault((x, y), cells.cell(x, y))
+            cells.update(x, y, state)
+
+            del self._scheduled[(x, y)]
+
+            # in order, as each takes a draw from the clock
+            for reader in sorted(affected(cells, (x,), (y,), self._reach)):
+                self._schedule(cells, *reader)
+
+        self._time = end
+        self._version = cells.version
+        self._steps += 1
+
+        changed = [
+            (x, y) for (x, y), state in initial.items()
+            if cells.cell(x, y) != state
+        ]
+
+        return Changes(
+            [x for x, _ in changed], [y for _, y in changed],
+            [cells.cell(x, y) for x, y in changed]
+        )
+
+    def _schedule(self, cells, x, y):
+        """
+        Recalculate the rates of a cell and schedule its next transition.
+        """
+        current = cells.cell(x, y)
+        targets = []
+
+        if self._rules.outcomes(current) is not None:
+            distribution = self.distribution(
+                cells, x, y, current, self._rules.gather(cells, x, y)
+            )
+
+            targets = [
+                (state, probability)
+                for state, probability in distribution.probabilities()
+                if state != current
+            ]
+
+        rate = sum(probability for _, probability in targets)
+
+        scheduled = self._scheduled.get((x, y))
+        if scheduled is not None and scheduled[:2] == (rate, targets):
+            return  # the pending transition is still valid
+
+        event = next(self._sequence)
+
+        self._scheduled[(x, y)] = (rate, targets, event)
+
+        if rate > 0:
+            heappush(self._events, (
+                self._time + self._clock.expovariate(rate), x, y, event
+            ))
@@ -6,10 +6,24 @@ from collections import namedtuple
 import locale
 from time import sleep
 
+from pica.changes import stream
+
 
 State = namedtuple('State', ('state', 'symbol', 'pair'))
 
 
+def label(state):
+    """
+    The name of a state in a summary or snapshot.
+
+    state: the state.
+    """
+    if isinstance(state, State):
+        return state.state
+
+    return str(state)
+
+
 def simulate(screen, automata, step_length, pixel_width=1):
     """
     Simulate a cellular automata
@@ -35,13 +49,11 @@ def simulate(screen, automata, step_length, pixel_width=1):
     while True:
         sleep(step_length)
 
-        changes = automata.step()
-
-        for change in changes:
+        for x, y, state in stream(automata.step()):
             screen.addstr(
-                change.y,
-                change.x * pixel_width,
-                change.state.symbol,
-                curses.color_pair(change.state.pair)
+                y,
+                x * pixel_width,
+                state.symbol,
+                curses.color_pair(state.pair)
             )
         screen.refresh()
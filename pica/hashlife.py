@@ -0,0 +1,664 @@
+"""
+Quadtree memoization (hashlife) for deterministic rules.
+"""
+from functools import partial
+
+import numpy
+
+from pica.boundaries import EDGE
+from pica.cells import StateTable
+from pica.changes import Changes
+from pica.tables import TableEngine
+
+
+class Node:
+    """
+    A square of 2 ** level cells on a side, made of four quadrants one
+    level down. Nodes are canonical (see Hashlife.node), so two nodes
+    with the same cells are usually the same object. The quadrants of a
+    level 1 node are symbols.
+
+    nw, ne, sw, se: the quadrants.
+    level: the level of the node.
+    """
+    __slots__ = ('nw', 'ne', 'sw', 'se', 'level')
+
+    def __init__(self, nw, ne, sw, se, level):
+        self.nw = nw
+        self.ne = ne
+        self.sw = sw
+        self.se = se
+        self.level = level
+
+
+class Hashlife:
+    """
+    Canonical quadtree nodes of the symbols of a deterministic
+    TransitionTable with a radius of at most one, and a memo of what
+    each node's center becomes after a power of two steps.
+
+    Positions outside the grid hold None, which never changes, so a grid
+    can be padded with None to any size without changing how it evolves.
+
+    Whenever more than cache_size nodes and results are kept, garbage is
+    collected (see collect). During an advance this is checked before
+    each step of the recursion, so there are at most cache_size (or twice
+    what the last collection had to keep, if that was more) plus the few
+    nodes a single step builds. After an advance there are at most
+    cache_size, unless the advanced node alone has more nodes.
+
+    table: the deterministic pica.tables.TransitionTable.
+    cache_size: the number of nodes and results to keep.
+    """
+    def __init__(self, table, cache_size):
+        if not table.deterministic:
+            raise ValueError(table)
+
+        self._symbols = table.symbols
+        self._none = len(table.symbols) - 1
+        self._positions = table.positions
+        self._weights = [
+            len(table.symbols) ** index
+            for index in range(len(table.positions))
+        ]
+        self._next = table.next_symbols(
+            numpy.arange(len(table)), None
+        ).tolist()
+
+        self._cache_size = cache_size
+        self._limit = cache_size
+        self._nodes = {}
+        self._results = {}
+        self._empty = [self._none]
+        self._stack = []
+
+    @property
+    def symbols(self):
+        """
+        The states of the nodes, in symbol order. The last is None.
+        """
+        return self._symbols
+
+    def __len__(self):
+        """
+        The number of nodes and results being kept.
+        """
+        return len(self._nodes) + len(self._results)
+
+    def node(self, nw, ne, sw, se):
+        """
+        The canonical node with the given quadrants.
+
+        nw, ne, sw, se: the quadrants (canonical nodes, or symbols).
+        """
+        key = (nw, ne, sw, se)
+        node = self._nodes.get(key)
+
+        if node is None:
+            level = 1 if isinstance(nw, int) else nw.level + 1
+            node = self._nodes[key] = Node(nw, ne, sw, se, level)
+
+        return node
+
+    def empty(self, level):
+        """
+        The node of a level where every position is None.
+
+        level: the level of the node.
+        """
+        while len(self._empty) <= level:
+            quadrant = self._empty[-1]
+            self._empty.append(
+                self.node(quadrant, quadrant, quadrant, quadrant)
+            )
+
+        return self._empty[level]
+
+    def build(self, level, width, height, symbol):
+        """
+        A node with a symbol in every position of a width by height grid
+        at its top left, and None everywhere else.
+
+        level: the level of the node.
+        width: the width of the grid.
+        height: the height of the grid.
+        symbol: the symbol of the grid's cells.
+        """
+        if width <= 0 or height <= 0:
+            return self.empty(level)
+
+        if level == 0:
+            return symbol
+
+        half = 1 << (level - 1)
+        build = partial(self.build, level - 1)
+
+        return self.node(
+            build(width, height, symbol),
+            build(width - half, height, symbol),
+            build(width, height - half, symbol),
+            build(width - half, height - half, symbol),
+        )
+
+    def get(self, node, x, y):
+        """
+        The symbol of a position within a node.
+
+        node: the node.
+        x: the x position within the node.
+        y: the y position within the node.
+        """
+        for level in range(node.level - 1, -1, -1):
+            east = (x >> level) & 1
+            south = (y >> level) & 1
+
+            node = (
+                (node.se if east else node.sw) if south else
+                (node.ne if east else node.nw)
+            )
+
+        return node
+
+    def set(self, node, x, y, symbol):
+        """
+        A node like another, but with the symbol at a position changed.
+
+        node: the node.
+        x: the x position within the node.
+        y: the y position within the node.
+        symbol: the new symbol.
+        """
+        if not isinstance(node, Node):
+            return symbol
+
+        half = 1 << (node.level - 1)
+        nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+
+        if y < half:
+            if x < half:
+                nw = self.set(nw, x, y, symbol)
+            else:
+                ne = self.set(ne, x - half, y, symbol)
+        elif x < half:
+            sw = self.set(sw, x, y - half, symbol)
+        else:
+            se = self.set(se, x - half, y - half, symbol)
+
+        return self.node(nw, ne, sw, se)
+
+    def advance(self, root, generations):
+        """
+        A node like another after a number of steps. The node must be
+        surrounded by None.
+
+        root: the node (of at least level 1).
+        generations: the number of steps.
+        """
+        level = root.level
+
+        for power in range(generations.bit_length()):
+            if not (generations >> power) & 1:
+                continue
+
+            if len(self) > self._limit:
+                self.collect(root)
+
+            # put the root in the top left of the center of a node big
+            # enough to advance it by this power of two in one go
+            size = max(level + 2, power + 2)
+
+            inner = root
+            while inner.level < size - 2:
+                empty = self.empty(inner.level)
+                inner = self.node(inner, empty, empty, empty)
+
+            empty = self.empty(size - 2)
+            universe = self.node(
+                self.node(empty, empty, empty, inner),
+                self.empty(size - 1), self.empty(size - 1),
+                self.empty(size - 1)
+            )
+
+            root = self.successor(universe, power)
+
+            while root.level > level:
+                root = root.nw
+
+        if len(self) > self._cache_size:
+            self.collect(root)
+
+        return root
+
+    def successor(self, node, power):
+        """
+        The center of a node after 2 ** power steps.
+
+        node: the node (of at least level 2).
+        power: the power of two (at most two less than the node's level).
+        """
+        level = node.level
+
+        if node is self.empty(level):
+            return self.empty(level - 1)
+
+        key = (node, power)
+        result = self._results.get(key)
+
+        if result is not None:
+            return result
+
+        if len(self) > self._limit:
+            self.collect()
+
+        if level == 2:
+            result = self._base(node)
+        else:
+            # everything this step builds is kept by collections during
+            # it, so the nodes stay canonical
+            working = [node]
+            self._stack.append(working)
+
+            nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+            node = self.node
+
+            parts = [
+                nw,
+                node(nw.ne, ne.nw, nw.se, ne.sw),
+                ne,
+                node(nw.sw, nw.se, sw.nw, sw.ne),
+                node(nw.se, ne.sw, sw.ne, se.nw),
+                node(ne.sw, ne.se, se.nw, se.ne),
+                sw,
+                node(sw.ne, se.nw, sw.se, se.sw),
+                se,
+            ]
+            working.append(parts)
+
+            # at full speed, both halves advance by half of the steps;
+            # otherwise only the second half does
+            advanced = []
+            working.append(advanced)
+
+            for part in parts:
+                if power == level - 2:
+                    advanced.append(self.successor(part, power - 1))
+                else:
+                    advanced.append(node(
+                        part.nw.se, part.ne.sw, part.sw.ne, part.se.nw
+                    ))
+
+            if power == level - 2:
+                power -= 1
+
+            quadrants = []
+            working.append(quadrants)
+
+            for index in (0, 1, 3, 4):
+                quadrants.append(self.successor(
+                    node(
+                        advanced[index], advanced[index + 1],
+                        advanced[index + 3], advanced[index + 4]
+                    ),
+                    power
+                ))
+
+            result = node(*quadrants)
+
+            self._stack.pop()
+
+        self._results[key] = result
+
+        return result
+
+    def _base(self, node):
+        """
+        The center of a level 2 node after a step, from the table.
+        """
+        grid = (
+            (node.nw.nw, node.nw.ne, node.ne.nw, node.ne.ne),
+            (node.nw.sw, node.nw.se, node.ne.sw, node.ne.se),
+            (node.sw.nw, node.sw.ne, node.se.nw, node.se.ne),
+            (node.sw.sw, node.sw.se, node.se.sw, node.se.se),
+        )
+
+        center = []
+        for y, x in ((1, 1), (1, 2), (2, 1), (2, 2)):
+            index = sum(
+                grid[y + dy][x + dx] * weight
+                for (dx, dy), weight in zip(self._positions, self._weights)
+            )
+
+            symbol = self._next[index]
+            center.append(grid[y][x] if symbol < 0 else symbol)
+
+        return self.node(*center)
+
+    def collect(self, *roots):
+        """
+        Forget every node that can't be reached from the given roots or a
+        step in progress, and every result that isn't between two nodes
+        that are kept (or every result, if there would still be more than
+        the cache size). Forgotten nodes that are still held elsewhere
+        stay correct, but are no longer canonical.
+
+        If what is kept is still more than half of the cache size, the
+        next collection waits until there is twice as much, so that
+        collecting doesn't take over when most nodes are in use.
+
+        roots: the nodes to keep.
+        """
+        nodes = {}
+        pending = list(roots) + self._stack + self._empty[1:]
+
+        while pending:
+            node = pending.pop()
+
+            if isinstance(node, list):
+                pending.extend(node)
+            elif isinstance(node, Node):
+                key = (node.nw, node.ne, node.sw, node.se)
+
+                if key not in nodes:
+                    nodes[key] = node
+                    pending.extend(key)
+
+        def kept(node):
+            return nodes.get((node.nw, node.ne, node.sw, node.se)) is node
+
+        self._nodes = nodes
+        self._results = {
+            key: result for key, result in self._results.items()
+            if kept(key[0]) and kept(result)
+        }
+
+        if len(self) > self._cache_size:
+            self._results = {}
+
+        self._limit = max(self._cache_size, 2 * len(self))
+
+
+class QuadCells:
+    """
+    A collection of cells stored as a canonical quadtree of symbols, with
+    the grid at the top left of its root and None around it. Stepping
+    replaces the root, so cells that haven't changed share their nodes
+    with the previous generation.
+
+    hashlife: the Hashlife the nodes belong to.
+    boundary: the pica.boundaries.Boundary of the grid, whose state must
+        be None (defaults to pica.boundaries.EDGE).
+    """
+    __slots__ = (
+        '_width', '_height', '_version', '_boundary', '_hashlife', '_states',
+        '_root',
+    )
+
+    def __init__(self, width, height, initial_state, hashlife, boundary=EDGE):
+        if boundary.state is not None or boundary.index(-1, 1) is not None:
+            raise ValueError(boundary)
+
+        self._width = width
+        self._height = height
+        self._version = 0
+        self._boundary = boundary
+        self._hashlife = hashlife
+        self._states = StateTable(hashlife.symbols[:-1])
+
+        level = max(1, (max(width, height) - 1).bit_length())
+
+        self._root = hashlife.build(
+            level, width, height, self.symbol(initial_state)
+        )
+
+    @property
+    def width(self):
+        return self._width
+
+    @property
+    def height(self):
+        return self._height
+
+    @property
+    def version(self):
+        """
+        A counter that goes up every time a cell is updated.
+        """
+        return self._version
+
+    @property
+    def boundary(self):
+        """
+        The pica.boundaries.Boundary of the grid.
+        """
+        return self._boundary
+
+    @property
+    def states(self):
+        """
+        The table of states, where each state's code is its symbol.
+        """
+        return self._states
+
+    @property
+    def root(self):
+        """
+        The root Node of the quadtree.
+        """
+        return self._root
+
+    def symbol(self, state):
+        """
+        The symbol of a state.
+
+        state: the state, which the rules must mention.
+        """
+        symbol = self._states.find(state)
+
+        if symbol is None:
+            raise ValueError(state)
+
+        return symbol
+
+    def cell(self, x, y):
+        """
+        Get the value of the cell (or what the boundary says is there if
+        that cell is not in range)
+
+        x: the x position of the cell.
+        y: the y position of the cell.
+        """
+        if not (0 <= y < self._height and 0 <= x < self._width):
+            return self._boundary.state
+
+        return self._states.state(self._hashlife.get(self._root, x, y))
+
+    def row(self, y):
+        """
+        A generator for enumerating over a row of the cells.
+
+        y: the y position of the cell.
+        """
+        if y < 0 or y >= self._height:
+            raise ValueError(y)
+
+        for x in range(self._width):
+            yield self._states.state(self._hashlife.get(self._root, x, y))
+
+    def update(self, x, y, state):
+        """
+        Update a cell.
+
+        x: the x position of the cell.
+        y: the y position of the cell.
+        state: The state to set the cell to.
+        """
+        if x < 0 or x >= self._width:
+            raise ValueError(x)
+
+        if y < 0 or y >= self._height:
+            raise ValueError(y)
+
+        self._root = self._hashlife.set(self._root, x, y, self.symbol(state))
+        self._version += 1
+
+    def apply(self, changes):
+        """
+        Update every cell in a collection of changes. The changes are
+        assumed to be in range.
+
+        changes: the pica.changes.Changes to apply.
+        """
+        hashlife = self._hashlife
+        root = self._root
+
+        for x, y, state in zip(changes.xs, changes.ys, changes.states):
+            root = hashlife.set(root, x, y, self.symbol(state))
+
+        self._root = root
+        self._version += len(changes)
+
+    def replace(self, root):
+        """
+        Replace every cell at once with the root of the next generation.
+        Returns the Changes between the two, which are found when first
+        needed.
+
+        root: the new root Node.
+        """
+        if root.level != self._root.level:
+            raise ValueError(root.level)
+
+        previous = self._root
+        self._root = root
+        self._version += 1
+
+        return Changes.lazy(partial(
+            diff, previous, root, self._width, self._height, self._states
+        ))
+
+
+def diff(before, after, width, height, table):
+    """
+    The x positions, y positions and new symbols of the cells that differ
+    between two quadtrees, and their table. Shared nodes are skipped.
+
+    before: the earlier root.
+    after: the later root.
+    width: the width of the grid.
+    height: the height of the grid.
+    table: the pica.cells.StateTable the symbols refer to.
+    """
+    xs = []
+    ys = []
+    codes = []
+
+    pending = [(before, after, 0, 0)]
+    while pending:
+        old, new, x, y = pending.pop()
+
+        if old is new or x >= width or y >= height:
+            continue
+
+        if not isinstance(new, Node):
+            xs.append(x)
+            ys.append(y)
+            codes.append(new)
+            continue
+
+        half = 1 << (new.level - 1)
+        pending.extend((
+            (old.se, new.se, x + half, y + half),
+            (old.sw, new.sw, x, y + half),
+            (old.ne, new.ne, x + half, y),
+            (old.nw, new.nw, x, y),
+        ))
+
+    return (
+        numpy.array(xs, dtype=numpy.intp), numpy.array(ys, dtype=numpy.intp),
+        numpy.array(codes, dtype=table.dtype), table
+    )
+
+
+class HashEngine(TableEngine):
+    """
+    Step deterministic rules with hashlife: the cells are a canonical
+    quadtree, and what the center of each node becomes after a power of
+    two steps is memoized, so repetitive patterns can be advanced huge
+    numbers of steps at once (see advance).
+
+    Rules are deterministic if their TransitionTable is (every
+    neighborhood has at most one next state), and must only read their
+    immediate neighbors. Other rules, states the rules never mention, and
+    boundaries other than pica.boundaries.EDGE are stepped like a
+    TableEngine.
+
+    cache_size: the number of nodes and results to keep (see Hashlife).
+    max_entries: the largest table to build.
+    seed: the seed for random draws (optional).
+    """
+    def __init__(self, cache_size=1 << 20, max_entries=1 << 20, seed=None):
+        super().__init__(max_entries, seed)
+
+        self._cache_size = cache_size
+        self._hashlife = None
+
+    @property
+    def hashlife(self):
+        """
+        The Hashlife of the rules (or None if they aren't deterministic).
+        """
+        return self._hashlife
+
+    def prepare(self, rules):
+        super().prepare(rules)
+
+        self._hashlife = None
+
+        if (
+                self._table is not None and self._table.deterministic and
+                self._rules.neighborhood.radius <= 1):
+            self._hashlife = Hashlife(self._table, self._cache_size)
+
+    def cells(self, width, height, initial_state, boundary=EDGE):
+        if (
+                self._hashlife is not None and boundary == EDGE and
+                initial_state in self._hashlife.symbols[:-1]):
+            return QuadCells(
+                width, height, initial_state, self._hashlife, boundary
+            )
+
+        return super().cells(width, height, initial_state, boundary)
+
+    def step(self, cells):
+        """
+        Take a step in the simulation. Returns a set of Changes.
+        """
+        return self.advance(cells, 1)
+
+    def advance(self, cells, generations):
+        """
+        Take a number of steps at once. Returns the set of Changes
+        between the first and last generations.
+
+        cells: the cells to step.
+        generations: the number of steps.
+        """
+        if not isinstance(cells, QuadCells):
+            if generations == 1:
+                return super().step(cells)
+
+            before = cells.codes.copy()
+
+            for _ in range(generations):
+                super().step(cells)
+
+            changes = Changes.diff(before, cells.codes, cells.states)
+            cells.defer(changes)
+
+            return changes
+
+        root = self._hashlife.advance(cells.root, generations)
+
+        self._steps += generations
+
+        return cells.replace(root)
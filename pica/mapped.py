@@ -0,0 +1,362 @@
+"""
+Cells stored in a memory-mapped file, for grids larger than memory or
+that should outlive the process.
+"""
+from functools import partial
+import mmap
+import os
+import pickle
+
+import numpy
+
+from pica.boundaries import EDGE
+from pica.cells import ArrayCells, StateTable
+from pica.changes import Changes
+from pica.parallel import halo
+from pica.randomness import Stream
+from pica.tables import TableEngine
+
+MAGIC = b'PICAGRID'
+
+FORMAT = 2
+
+HEADER = numpy.dtype([
+    ('magic', 'S8'),
+    ('format', '<u4'),
+    ('current', '<u4'),
+    ('width', '<u8'),
+    ('height', '<u8'),
+    ('step', '<u8'),
+    ('seed', '<u8'),
+    ('dtype', 'S8'),
+    ('table', '<u8'),
+])
+
+
+class MappedCells(ArrayCells):
+    """
+    ArrayCells whose codes live in a file, through numpy.memmap, so only
+    the pages being read or written need to be in memory.
+
+    The file starts with a header holding the dimensions of the grid, the
+    step counter, the seed of the run, which of its two grids is current,
+    and the pickled table of states. The grids follow, page aligned and
+    row-major. The second grid is the back buffer an engine writes the
+    next generation into before swapping.
+
+    Opening a file unpickles its table of states, which can run arbitrary
+    code, so only open files from a trusted source.
+
+    The type of the codes is fixed when the file is created, so a
+    ValueError is raised if more states are interned than it can hold.
+    Writes reach the file whenever the operating system writes the pages
+    back (see flush).
+
+    path: the path of the file to create (overwriting it if it exists).
+    states: states to intern up front, in code order (optional).
+    boundary: the pica.boundaries.Boundary of the grid (defaults to
+        pica.boundaries.EDGE, where everything outside is None).
+    dtype: the type of the codes (defaults to the smallest type that holds
+        every state given).
+    seed: the seed of the run, stored for when it is resumed (optional).
+        Only its lowest 64 bits, which are all draws depend on, are kept.
+    """
+    __slots__ = ('_path', '_header', '_grids')
+
+    def __init__(
+            self, path, width, height, initial_state, states=(),
+            boundary=EDGE, dtype=None, seed=0):
+        table = StateTable(states)
+        code = table.code(initial_state)
+
+        dtype = numpy.dtype(table.dtype if dtype is None else dtype)
+        if len(table) > numpy.iinfo(dtype).max + 1:
+            raise ValueError(dtype)
+
+        states = pickle.dumps(list(table))
+
+        # leave room for the table to grow as states are interned
+        offset = HEADER.itemsize + max(2 * len(states), 1 << 12)
+        offset = -(-offset // mmap.ALLOCATIONGRANULARITY)
+        offset *= mmap.ALLOCATIONGRANULARITY
+
+        with open(path, 'wb') as handle:
+            handle.write(numpy.array(
+                (
+                    MAGIC, FORMAT, 0, width, height, 0, seed % (1 << 64),
+                    dtype.str.encode(), len(states)
+                ),
+                dtype=HEADER
+            ).tobytes())
+            handle.write(states)
+
+            # the grids are left sparse, so a grid of zeros costs nothing
+            handle.truncate(offset + 2 * width * height * dtype.itemsize)
+
+        self._attach(path, boundary)
+
+        if code:
+            self._codes[:] = code
+
+    @classmethod
+    def open(cls, path, boundary=EDGE):
+        """
+        Open the cells stored in an existing file. Nothing is read but the
+        header and the table of states. The table is unpickled, so the file
+        must be trusted.
+
+        path: the path of the file.
+        boundary: the pica.boundaries.Boundary of the grid.
+        """
+        cells = cls.__new__(cls)
+        cells._attach(path, boundary)
+
+        return cells
+
+    def _attach(self, path, boundary):
+        header = numpy.memmap(path, dtype=HEADER, mode='r+', shape=(1,))
+
+        if header['magic'][0] != MAGIC or header['format'][0] != FORMAT:
+            raise ValueError(path)
+
+        with open(path, 'rb') as handle:
+            handle.seek(HEADER.itemsize)
+            states = pickle.loads(handle.read(int(header['table'][0])))
+
+        self._path = path
+        self._header = header
+        self._width = int(header['width'][0])
+        self._height = int(header['height'][0])
+        self._version = 0
+        self._boundary = boundary
+        self._states = StateTable(states)
+        self._pending = None
+
+        dtype = numpy.dtype(header['dtype'][0].decode())
+        size = self._width * self._height * dtype.itemsize
+        offset = os.path.getsize(path) - 2 * size
+
+        self._grids = tuple(
+            numpy.memmap(
+                path, dtype=dtype, mode='r+', offset=offset + index * size,
+                shape=(self._height, self._width)
+            )
+            for index in range(2)
+        )
+
+        self._codes = self._grids[int(header['current'][0])]
+
+    @property
+    def path(self):
+        """
+        The path of the file the cells are stored in.
+        """
+        return self._path
+
+    @property
+    def step(self):
+        """
+        The number of times the cells have been swapped, which is kept in
+        the file.
+        """
+        return int(self._header['step'][0])
+
+    @property
+    def seed(self):
+        """
+        The seed of the run the cells are from, which is kept in the file.
+        """
+        return int(self._header['seed'][0])
+
+    @property
+    def back(self):
+        """
+        The (height, width) array of the back grid, which holds the
+        previous generation until the next one is written into it.
+        """
+        return self._grids[1 - int(self._header['current'][0])]
+
+    def code(self, state):
+        """
+        Get the code for a state, interning the state (and writing the
+        table to the file) if it hasn't been seen before.
+
+        state: the state to get the code of.
+        """
+        code = self._states.find(state)
+
+        if code is not None:
+            return code
+
+        if len(self._states) > numpy.iinfo(self._codes.dtype).max:
+            raise ValueError(state)
+
+        states = pickle.dumps(list(self._states) + [state])
+        if HEADER.itemsize + len(states) > self._grids[0].offset:
+            raise ValueError(state)
+
+        with open(self._path, 'r+b') as handle:
+            handle.seek(HEADER.itemsize)
+            handle.write(states)
+
+        self._header['table'] = len(states)
+
+        return self._states.code(state)
+
+    def swap(self, codes):
+        """
+        Make the back grid the current generation, after copying the next
+        generation into it (unless it was written there directly). Returns
+        the previous grid, which will be overwritten by the next swap.
+
+        codes: the (height, width) array of state codes.
+        """
+        if codes.shape != self._codes.shape:
+            raise ValueError(codes.shape)
+
+        back = self.back
+        if codes is not back:
+            back[:] = codes
+
+        previous = self._codes
+        self._codes = back
+
+        self._header['current'] = 1 - int(self._header['current'][0])
+        self._header['step'] += 1
+        self._version += 1
+
+        return previous
+
+    def flush(self):
+        """
+        Write every change to the cells to the file.
+        """
+        for grid in self._grids:
+            grid.flush()
+
+        self._header.flush()
+
+
+class MappedEngine(TableEngine):
+    """
+    Step MappedCells a band of rows at a time. Each band is read along
+    with a halo of the rows its neighborhoods reach, evaluated like a
+    TableEngine would, and written straight into the back grid, so pages
+    are touched in the order they are laid out in the file and only a
+    band's worth of cells is held in memory.
+
+    Random draws are keyed by the step counter in the file, and the seed
+    is stored in it, so cells that are reopened carry on exactly as if
+    they'd never been closed. Other cells are stepped like a TableEngine.
+
+    path: the file the cells are stored in. If it exists, the cells are
+        opened from it (and resume from its step) rather than created.
+    band: the number of rows in a band.
+    max_entries: the largest table to build.
+    seed: the seed for random draws (optional). If not given, cells opened
+        from a file use the seed stored in it.
+    """
+    def __init__(self, path, band=64, max_entries=1 << 20, seed=None):
+        super().__init__(max_entries, seed)
+
+        self._path = path
+        self._band = band
+        self._seeded = seed is not None
+
+    @property
+    def path(self):
+        return self._path
+
+    def cells(self, width, height, initial_state, boundary=EDGE):
+        if not os.path.exists(self._path):
+            return MappedCells(
+                self._path, width, height, initial_state, boundary=boundary,
+                seed=self._random.seed
+            )
+
+        cells = MappedCells.open(self._path, boundary)
+
+        if (cells.width, cells.height) != (width, height):
+            raise ValueError((cells.width, cells.height))
+
+        if not self._seeded:
+            self._random = Stream(cells.seed)
+
+        return cells
+
+    def step(self, cells):
+        """
+        Take a step in the simulation. Returns a set of Changes.
+        """
+        if not isinstance(cells, MappedCells):
+            return super().step(cells)
+
+        # the previous step's changes read the grid about to be overwritten
+        cells.settle()
+
+        radius = self._rules.neighborhood.radius
+        front = cells.codes
+        back = cells.back
+
+        for top in range(0, cells.height, self._band):
+            bottom = min(top + self._band, cells.height)
+            rows, inner = halo(
+                top, bottom, radius, cells.height, cells.boundary
+            )
+
+            window = ArrayCells.from_codes(
+                numpy.array(front[rows]), cells.states, cells.boundary
+            )
+
+            # only the band's own cells need draws; the halo is thrown away
+            draws = numpy.zeros(window.codes.shape)
+            draws[inner:inner + bottom - top] = self._random.draws(
+                cells.step, cells.width, bottom - top, 0, top
+            )
+
+            codes = self.next_codes(window, draws)[inner:inner + bottom - top]
+
+            if len(window.states) > len(cells.states):
+                codes = numpy.array(
+                    [cells.code(state) for state in window.states]
+                )[codes]
+
+            back[top:bottom] = codes
+
+        cells.swap(back)
+
+        self._steps += 1
+
+        changes = Changes.lazy(
+            partial(diff, front, back, cells.states, self._band)
+        )
+        cells.defer(changes)
+
+        return changes
+
+
+def diff(before, after, table, band):
+    """
+    The x positions, y positions and new codes of the cells that differ
+    between two grids, and their table, compared a band of rows at a time.
+
+    before: the earlier grid.
+    after: the later grid.
+    table: the pica.cells.StateTable the codes refer to.
+    band: the number of rows to compare at once.
+    """
+    xs = []
+    ys = []
+
+    for top in range(0, before.shape[0], band):
+        rows, columns = numpy.nonzero(
+            before[top:top + band] != after[top:top + band]
+        )
+
+        xs.append(columns)
+        ys.append(rows + top)
+
+    xs = numpy.concatenate(xs) if xs else numpy.zeros(0, dtype=numpy.intp)
+    ys = numpy.concatenate(ys) if ys else numpy.zeros(0, dtype=numpy.intp)
+
+    return xs, ys, numpy.array(after[ys, xs]), table
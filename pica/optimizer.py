@@ -0,0 +1,380 @@
+"""
+Simplify a collection of rules before running them.
+"""
+from pica.conditions import (
+    Constant, Equals, Not, And, Or, InRange, If
+)
+from pica.rules import Rule, Requirement
+
+
+class Report:
+    """
+    What an optimization pass did to a collection of rules.
+    """
+    def __init__(self):
+        self._removed = []
+        self._folded = 0
+        self._merged = 0
+
+    @property
+    def removed(self):
+        """
+        A list of (rule, reason) pairs for each rule that was dropped.
+        """
+        return self._removed
+
+    @property
+    def folded(self):
+        """
+        The number of conditions that were folded into constants.
+        """
+        return self._folded
+
+    @property
+    def merged(self):
+        """
+        The number of conditions that were replaced with an identical
+        condition from elsewhere in the rules.
+        """
+        return self._merged
+
+    def __str__(self):
+        return 'removed {} rules, folded {} conditions, merged {}'.format(
+            len(self._removed), self._folded, self._merged
+        )
+
+
+def optimize(rules, states=None):
+    """
+    Optimize a collection of rules. Returns a list of rules that behave
+    the same way and a Report of what changed. The given rules and their
+    conditions are not modified.
+
+    Only the built-in rules and conditions are looked inside of; anything
+    else (including subclasses) is left as it is.
+
+    Conditions testing the cell itself against the rule's from_state are
+    folded into constants, rules that can never fire (or never affect the
+    outcome) are dropped, and structurally identical conditions are
+    merged so that they are only evaluated once per cell.
+
+    rules: an iterable of rules.
+    states: the states cells may start in (optional). If given, rules for
+        states that can't be reached from them are dropped too.
+    """
+    report = Report()
+    folded = []
+
+    for original in rules:
+        rule = original
+
+        if type(rule) in (Rule, Requirement):
+            condition = fold(rule.condition, rule.from_state, report)
+
+            if condition is not rule.condition:
+                rule = rebuild(rule, condition)
+
+        folded.append((original, rule))
+
+    optimized = prune(folded, states, report)
+    merge(optimized, report)
+
+    return optimized, report
+
+
+def fold(condition, state, report):
+    """
+    Fold the parts of a condition that are constant for cells in a state,
+    returning the original condition if nothing changed.
+
+    condition: the condition to fold.
+    state: the state of the cell the condition is evaluated for.
+    report: the Report to record folds in.
+    """
+    if type(condition) is Equals:
+        if not condition.states:
+            folded = Constant(False)
+        elif condition.x == 0 and condition.y == 0:
+            folded = Constant(state in condition.states)
+        else:
+            return condition
+    elif type(condition) is Not:
+        inner = fold(condition.conditions[0], state, report)
+
+        if type(inner) is Constant:
+            folded = Constant(not inner.value)
+        elif inner is condition.conditions[0]:
+            return condition
+        else:
+            return Not(inner)
+    elif type(condition) in (And, Or):
+        short = type(condition) is Or
+
+        conditions = []
+        for inner in condition.conditions:
+            inner = fold(inner, state, report)
+
+            if type(inner) is Constant:
+                if bool(inner.value) == short:
+                    folded = Constant(short)
+                    break
+            else:
+                conditions.append(inner)
+        else:
+            if not conditions:
+                folded = Constant(not short)
+            elif unchanged(conditions, condition.conditions):
+                return condition
+            else:
+                return type(condition)(*conditions)
+    elif type(condition) is InRange:
+        lower = condition.lower
+        upper = condition.upper
+
+        conditions = []
+        for inner in condition.conditions:
+            inner = fold(inner, state, report)
+
+            if type(inner) is Constant:
+                if inner.value:
+                    lower -= 1
+                    upper -= 1
+            else:
+                conditions.append(inner)
+
+        if upper < 0 or lower > len(conditions):
+            folded = Constant(False)
+        elif lower <= 0 and upper >= len(conditions):
+            folded = Constant(True)
+        elif unchanged(conditions, condition.conditions):
+            return condition
+        else:
+            return InRange(*conditions, lower=max(lower, 0), upper=upper)
+    elif type(condition) is If:
+        if_condition = fold(condition.if_condition, state, report)
+
+        if type(if_condition) is Constant:
+            if if_condition.value:
+                return fold(condition.true_condition, state, report)
+            elif condition.false_condition:
+                return fold(condition.false_condition, state, report)
+
+            folded = Constant(False)
+        else:
+            conditions = [
+                fold(inner, state, report)
+                for inner in condition.conditions[1:]
+            ]
+
+            if unchanged([if_condition] + conditions, condition.conditions):
+                return condition
+
+            return If(if_condition, *conditions)
+    else:
+        return condition
+
+    report._folded += 1
+
+    return folded
+
+
+def prune(rules, states, report):
+    """
+    Drop rules that can't affect the outcome of a step.
+
+    rules: a list of (original, folded) pairs of rules.
+    states: the states cells may start in (or None if unknown).
+    report: the Report to record removed (original) rules in.
+    """
+    vetoed = {
+        (rule.from_state, rule.to_state) for _, rule in rules
+        if type(rule) is Requirement and
+        type(rule.condition) is Constant and not rule.condition.value
+    }
+
+    reachable = None
+    if states is not None:
+        reachable = set(states)
+
+        changed = True
+        while changed:
+            changed = False
+
+            for _, rule in rules:
+                if type(rule) in (Rule, Requirement):
+                    if (
+                        rule.from_state in reachable and
+                        rule.to_state not in reachable
+                    ):
+                        reachable.add(rule.to_state)
+                        changed = True
+
+    # a zero weight still makes a state a candidate, which matters when
+    # negative weights can make the total negative. rules of other types
+    # might have any weight
+    negative = {
+        rule.from_state for _, rule in rules
+        if type(rule) not in (Rule, Requirement) or
+        (type(rule) is Rule and rule.change < 0)
+    }
+
+    kept = []
+
+    for original, rule in rules:
+        reason = None
+
+        if reachable is not None and rule.from_state not in reachable:
+            reason = 'unreachable from_state'
+        elif type(rule) is Rule:
+            if rule.change == 0 and rule.from_state not in negative:
+                reason = 'zero weight'
+            elif (
+                type(rule.condition) is Constant and
+                not rule.condition.value
+            ):
+                reason = 'never true'
+            elif (rule.from_state, rule.to_state) in vetoed:
+                reason = 'always forbidden'
+        elif type(rule) is Requirement:
+            if type(rule.condition) is Constant and rule.condition.value:
+                reason = 'always satisfied'
+
+        if reason is None:
+            kept.append((original, rule))
+        else:
+            report._removed.append((original, reason))
+
+    targets = {
+        (rule.from_state, rule.to_state)
+        for _, rule in kept if type(rule) is Rule
+    }
+
+    # rules of other types may produce any state, so nothing they might
+    # produce can be known to need no forbidding
+    custom = {
+        rule.from_state for _, rule in kept
+        if type(rule) not in (Rule, Requirement)
+    }
+
+    pruned = []
+
+    for original, rule in kept:
+        if (
+            type(rule) is Requirement and
+            rule.from_state not in custom and
+            (rule.from_state, rule.to_state) not in targets
+        ):
+            report._removed.append((original, 'nothing to forbid'))
+        else:
+            pruned.append(rule)
+
+    return pruned
+
+
+def merge(rules, report):
+    """
+    Merge structurally identical conditions across a list of rules, in
+    place.
+
+    rules: a list of rules. Rules and Requirements will be replaced with
+        copies sharing their conditions.
+    report: the Report to record merges in.
+    """
+    table = {}
+
+    for index, rule in enumerate(rules):
+        if type(rule) in (Rule, Requirement):
+            condition = canonical(rule.condition, table, report)
+
+            if condition is not rule.condition:
+                rules[index] = rebuild(rule, condition)
+
+
+def canonical(condition, table, report):
+    """
+    Get the canonical instance of a condition, building it from canonical
+    subconditions.
+
+    condition: the condition to look up.
+    table: a dictionary from structural keys to canonical conditions.
+    report: the Report to record merges in.
+    """
+    if type(condition) in (Not, And, Or, InRange, If):
+        conditions = [
+            canonical(inner, table, report) for inner in condition.conditions
+        ]
+
+        if not unchanged(conditions, condition.conditions):
+            if type(condition) is InRange:
+                condition = InRange(
+                    *conditions, lower=condition.lower, upper=condition.upper
+                )
+            else:
+                condition = type(condition)(*conditions)
+
+    key = structure(condition)
+
+    if key is None:
+        return condition
+
+    if key in table:
+        if table[key] is not condition:
+            report._merged += 1
+
+        return table[key]
+
+    table[key] = condition
+
+    return condition
+
+
+def structure(condition):
+    """
+    A hashable key describing the structure of a condition whose
+    subconditions are already canonical (or None if the condition can't
+    be described).
+
+    condition: the condition to describe.
+    """
+    if type(condition) is Constant:
+        return (Constant, bool(condition.value))
+    elif type(condition) is Equals:
+        try:
+            return (Equals, condition.x, condition.y, frozenset(
+                condition.states
+            ))
+        except TypeError:  # unhashable states
+            return None
+    elif type(condition) is InRange:
+        return (
+            InRange, condition.lower, condition.upper,
+            tuple(id(inner) for inner in condition.conditions)
+        )
+    elif type(condition) in (Not, And, Or, If):
+        return (
+            type(condition),
+            tuple(id(inner) for inner in condition.conditions)
+        )
+
+
+def rebuild(rule, condition):
+    """
+    Copy a Rule or Requirement with a new condition.
+
+    rule: the rule to copy.
+    condition: the condition of the copy.
+    """
+    if type(rule) is Rule:
+        return Rule(rule.from_state, rule.to_state, condition, rule.change)
+
+    return Requirement(rule.from_state, rule.to_state, condition)
+
+
+def unchanged(conditions, originals):
+    """
+    Whether a sequence of conditions are exactly the original conditions.
+    """
+    return len(conditions) == len(originals) and all(
+        condition is original
+        for condition, original in zip(conditions, originals)
+    )
@@ -0,0 +1,418 @@
+"""
+Step a cellular automata in tiles across a pool of worker processes.
+"""
+from multiprocessing import Pool
+try:
+    from multiprocessing.shared_memory import SharedMemory
+except ImportError:  # new in python 3.8
+    SharedMemory = None
+from os import cpu_count
+from weakref import finalize
+
+import numpy
+
+from pica.boundaries import EDGE
+from pica.cells import ArrayCells
+from pica.changes import Changes
+from pica.engines import Engine, ArrayEngine
+from pica.randomness import Stream
+from pica.tables import alphabet
+
+
+class SharedArray:
+    """
+    An array in a block of shared memory, which other processes can
+    attach to by name.
+
+    shape: the shape of the array.
+    dtype: the type of the array.
+    """
+    def __init__(self, shape, dtype):
+        dtype = numpy.dtype(dtype)
+
+        self._memory = SharedMemory(
+            create=True, size=max(int(numpy.prod(shape)) * dtype.itemsize, 1)
+        )
+        self._array = numpy.ndarray(shape, dtype, buffer=self._memory.buf)
+        self._finalizer = finalize(self, release, self._memory)
+
+    @property
+    def name(self):
+        """
+        The name other processes can attach to the memory by.
+        """
+        return self._memory.name
+
+    @property
+    def array(self):
+        return self._array
+
+    def release(self):
+        """
+        Free the shared memory. The array can't be used afterwards.
+        """
+        self._finalizer()
+
+
+class SharedCells(ArrayCells):
+    """
+    ArrayCells whose codes are kept in shared memory, so that worker
+    processes can read them without copying.
+    """
+    __slots__ = ('_shared',)
+
+    def __init__(
+            self, width, height, initial_state, states=(), boundary=EDGE):
+        super().__init__(width, height, initial_state, states, boundary)
+
+        self._shared = None
+        self._share()
+
+    @property
+    def name(self):
+        """
+        The name of the shared memory holding the codes.
+        """
+        return self._shared.name
+
+    def code(self, state):
+        """
+        Get the code for a state, interning the state (and widening the
+        grid if needed) if it hasn't been seen before.
+
+        state: the state to get the code of.
+        """
+        code = super().code(state)
+
+        if self._codes is not self._shared.array:  # widened
+            self._share()
+
+        return code
+
+    def swap(self, shared):
+        """
+        Replace every cell at once with a block of shared memory holding
+        the next generation, without copying it. Returns the previous
+        SharedArray, which the caller becomes responsible for.
+
+        shared: the SharedArray holding the next generation.
+        """
+        if shared.array.shape != self._codes.shape:
+            raise ValueError(shared.array.shape)
+
+        previous = self._shared
+
+        self._shared = shared
+        self._codes = shared.array
+        self._version += 1
+
+        return previous
+
+    def _share(self):
+        """
+        Move the codes into a new block of shared memory.
+        """
+        previous = self._shared
+
+        self._shared = SharedArray(self._codes.shape, self._codes.dtype)
+        self._shared.array[...] = self._codes
+        self._codes = self._shared.array
+
+        if previous is not None:
+            previous.release()
+
+
+class ParallelEngine(Engine):
+    """
+    Evaluate the rules as arrays (like an ArrayEngine), with the grid
+    split into tiles that are stepped concurrently by a pool of worker
+    processes.
+
+    The cells are kept in shared memory. Each worker reads its tile plus
+    a halo as wide as the furthest neighbor the rules read, and writes the
+    next states of its tile into a second shared grid. Only once every
+    tile is finished are the grids swapped, so every cell sees its
+    neighbors' states from before the step.
+
+    The workers are started on the first step and reused until the
+    engine is closed (or prepared with new rules). The rules are sent to
+    each worker once, when it starts.
+
+    Each cell's draw depends only on the seed, the step and its position,
+    so results with a given seed don't depend on the tiles or processes
+    (and match the other engines).
+
+    Shared memory needs python 3.8 or later. On earlier versions, an
+    ImportError is raised when the engine is created.
+
+    processes: the number of worker processes (defaults to the number of
+        CPUs).
+    tiles: the number of tiles to split the grid into (defaults to the
+        number of processes).
+    seed: the seed for random draws (optional).
+    """
+    def __init__(self, processes=None, tiles=None, seed=None):
+        if SharedMemory is None:
+            raise ImportError('multiprocessing.shared_memory')
+
+        super().__init__(seed)
+
+        self._processes = processes or cpu_count() or 1
+        self._tiles = tiles or self._processes
+        self._radius = 0
+
+        self._pool = None
+        self._back = None
+        self._finalizer = None
+
+    def cells(self, width, height, initial_state, boundary=EDGE):
+        # intern everything the rules can produce up front, so the workers
+        # agree with the cells on every code
+        return SharedCells(
+            width, height, initial_state, alphabet(self._rules)[:-1],
+            boundary
+        )
+
+    def prepare(self, rules):
+        super().prepare(rules)
+
+        self.close()
+        self._radius = self._rules.neighborhood.radius
+
+    def close(self):
+        """
+        Stop the worker processes and free the engine's shared memory.
+        """
+        if self._finalizer is not None:
+            self._finalizer()
+
+        self._pool = None
+        self._back = None
+        self._finalizer = None
+
+    def step(self, cells):
+        """
+        Take a step in the simulation. Returns a set of Changes.
+
+        cells: the SharedCells to step.
+        """
+        front = self._swap(cells)
+
+        # shared memory can be freed at any time, so the diff can't wait
+        changes = Changes.diff(front, cells.codes, cells.states)
+        changes.resolve()
+
+        return changes
+
+    def advance(self, cells, generations):
+        """
+        Take a number of steps without finding their changes.
+
+        cells: the SharedCells to step.
+        generations: the number of steps.
+        """
+        for _ in range(generations):
+            self._swap(cells)
+
+    def _swap(self, cells):
+        """
+        Write the next generation into the back grid and swap it in.
+        Returns the previous generation's array.
+        """
+        if not isinstance(cells, SharedCells):
+            raise TypeError('cells must be created by the engine')
+
+        front = cells.codes
+
+        if self._pool is None:
+            self._pool = Pool(
+                self._processes, initialize, (tuple(self._rules),)
+            )
+            self._finalizer = finalize(self, shutdown, self._pool)
+
+        if (
+                self._back is None or
+                self._back.array.shape != front.shape or
+                self._back.array.dtype != front.dtype):
+            if self._back is not None:
+                self._back.release()
+
+            self._back = SharedArray(front.shape, front.dtype)
+
+        states = tuple(cells.states)
+
+        tasks = [
+            (
+                cells.name, self._back.name, front.shape, front.dtype.str,
+                states, cells.boundary, bounds, self._radius,
+                self._random.seed, self._steps
+            )
+            for bounds in tile_bounds(cells.width, cells.height, self._tiles)
+        ]
+
+        # waits for every tile, so nothing is written before all are read
+        self._pool.map(step_tile, tasks)
+
+        self._back = cells.swap(self._back)
+
+        self._steps += 1
+
+        return front
+
+
+def tile_bounds(width, height, count):
+    """
+    Split a grid into roughly equal tiles. Returns a list of (left, top,
+    right, bottom) bounds, with right and bottom exclusive.
+
+    width: the width of the grid.
+    height: the height of the grid.
+    count: the number of tiles to aim for.
+    """
+    across = max(
+        factor for factor in range(1, int(count ** 0.5) + 1)
+        if count % factor == 0
+    )
+    down = count // across
+
+    if width > height:
+        across, down = down, across
+
+    across = max(min(across, width), 1)
+    down = max(min(down, height), 1)
+
+    columns = [width * index // across for index in range(across + 1)]
+    rows = [height * index // down for index in range(down + 1)]
+
+    return [
+        (left, top, right, bottom)
+        for top, bottom in zip(rows, rows[1:])
+        for left, right in zip(columns, columns[1:])
+    ]
+
+
+def release(memory):
+    """
+    Free a block of shared memory.
+
+    memory: the SharedMemory to free.
+    """
+    memory.unlink()
+
+    try:
+        memory.close()
+    except BufferError:  # an array still refers to it
+        pass
+
+
+def shutdown(pool):
+    """
+    Stop a pool of workers.
+
+    pool: the Pool to stop.
+    """
+    pool.terminate()
+    pool.join()
+
+
+WORKER = {}
+
+
+def initialize(rules):
+    """
+    Prepare a worker process to step tiles.
+
+    rules: the rules to step the tiles with.
+    """
+    engine = ArrayEngine()
+    engine.prepare(rules)
+
+    WORKER['engine'] = engine
+    WORKER['memory'] = {}
+
+
+def attach(name, shape, dtype):
+    """
+    An array in shared memory, attaching to the memory if this worker
+    hasn't yet.
+
+    name: the name of the shared memory.
+    shape: the shape of the array.
+    dtype: the type of the array.
+    """
+    memory = WORKER['memory']
+
+    if name not in memory:
+        memory[name] = SharedMemory(name=name)
+
+    return numpy.ndarray(shape, dtype, buffer=memory[name].buf)
+
+
+def step_tile(task):
+    """
+    Calculate the next state codes of a tile, writing them into the back
+    grid.
+
+    task: a tuple of the names of the front and back shared memory, the
+        shape and type of the grids, the states the codes refer to, the
+        boundary of the grid, the bounds of the tile, the radius of the
+        halo, and the seed and step number for random draws.
+    """
+    (
+        front, back, shape, dtype, states, boundary, bounds, radius, seed,
+        step
+    ) = task
+    left, top, right, bottom = bounds
+
+    # grids that have been replaced won't be used again
+    for name in set(WORKER['memory']) - {front, back}:
+        WORKER['memory'].pop(name).close()
+
+    front = attach(front, shape, dtype)
+    back = attach(back, shape, dtype)
+
+    rows, inner_top = halo(top, bottom, radius, shape[0], boundary)
+    columns, inner_left = halo(left, right, radius, shape[1], boundary)
+
+    tile = ArrayCells.from_codes(
+        front[rows[:, None], columns], states, boundary
+    )
+
+    # only the tile's own cells need draws; the halo is thrown away
+    inner = (
+        slice(inner_top, inner_top + bottom - top),
+        slice(inner_left, inner_left + right - left),
+    )
+
+    draws = numpy.zeros(tile.codes.shape)
+    draws[inner] = Stream(seed).draws(
+        step, right - left, bottom - top, left, top
+    )
+
+    back[top:bottom, left:right] = WORKER['engine'].next_codes(
+        tile, draws
+    )[inner]
+
+
+def halo(start, stop, radius, size, boundary):
+    """
+    The indices along an axis of a grid of a range of cells plus a halo
+    of the cells within a radius of it. Positions outside the grid are
+    read through the boundary, or left out if it has no cell for them.
+    Returns the indices and the offset of the range within them.
+
+    start: the first position of the range.
+    stop: the position after the last of the range.
+    radius: the width of the halo.
+    size: the length of the axis.
+    boundary: the pica.boundaries.Boundary of the grid.
+    """
+    positions = numpy.arange(start - radius, stop + radius)
+    indices = boundary.index(positions, size)
+
+    if indices is None:
+        return positions[(positions >= 0) & (positions < size)], min(
+            radius, start
+        )
+
+    return indices, radius
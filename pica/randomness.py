@@ -0,0 +1,166 @@
+"""
+Counter-based random draws, so that every cell's draw for every step can
+be calculated on its own, in any order.
+"""
+from random import SystemRandom
+
+import numpy
+
+MASK = 0xFFFFFFFF
+
+# the Philox4x32 multipliers and key increments
+MULTIPLIERS = (0xD2511F53, 0xCD9E8D57)
+INCREMENTS = (0x9E3779B9, 0xBB67AE85)
+ROUNDS = 10
+
+STEP = 0
+RANDOMIZE = 1
+
+
+class Stream:
+    """
+    Uniform [0, 1) draws keyed by a seed, a step number and the position
+    of a cell.
+
+    Each draw is the Philox4x32-10 block for the counter (x, y, step,
+    channel) under the key of the seed, so the same cell on the same step
+    always gets the same draw, however (and however many of) the other
+    draws are calculated. Draws calculated one at a time and as arrays
+    are identical.
+
+    seed: a 64-bit seed (optional). If not given, one is chosen at random
+        (and can be read back from seed to replay the draws).
+    """
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = SystemRandom().getrandbits(64)
+
+        self._seed = seed
+        self._key = (seed & MASK, (seed >> 32) & MASK)
+
+    @property
+    def seed(self):
+        return self._seed
+
+    def draw(self, step, x, y, channel=STEP):
+        """
+        The draw for a single cell.
+
+        step: the step number.
+        x: the x position of the cell.
+        y: the y position of the cell.
+        channel: what the draw is for (see STEP and RANDOMIZE).
+        """
+        return uniform(
+            (x & MASK, y & MASK, step & MASK, channel & MASK), self._key
+        )
+
+    def sample(self, step, x, y, channel=STEP):
+        """
+        The draws for arrays of cells.
+
+        step: the step number.
+        x: an array of the x positions of the cells.
+        y: an array of the y positions of the cells (the same shape as x).
+        channel: what the draws are for (see STEP and RANDOMIZE).
+        """
+        return sample(self._key, step, x, y, channel)
+
+    def draws(self, step, width, height, left=0, top=0, channel=STEP):
+        """
+        The (height, width) array of draws for a rectangle of cells.
+
+        step: the step number.
+        width: the width of the rectangle.
+        height: the height of the rectangle.
+        left: the x position of the left of the rectangle.
+        top: the y position of the top of the rectangle.
+        channel: what the draws are for (see STEP and RANDOMIZE).
+        """
+        y, x = numpy.mgrid[top:top + height, left:left + width]
+
+        return self.sample(step, x, y, channel)
+
+
+def keys(seeds):
+    """
+    The Philox keys for an array of 64-bit seeds, as a pair of arrays.
+
+    seeds: an array of seeds.
+    """
+    seeds = numpy.asarray(seeds, dtype=numpy.uint64)
+
+    return seeds & MASK, (seeds >> 32) & MASK
+
+
+def sample(key, step, x, y, channel=STEP):
+    """
+    The draws for arrays of cells under a key. The key may be a pair of
+    arrays (see keys), which are broadcast against the positions.
+
+    key: a pair of 32-bit words.
+    step: the step number.
+    x: an array of the x positions of the cells.
+    y: an array of the y positions of the cells.
+    channel: what the draws are for (see STEP and RANDOMIZE).
+    """
+    x, y = numpy.broadcast_arrays(
+        numpy.asarray(x, dtype=numpy.uint64) & MASK,
+        numpy.asarray(y, dtype=numpy.uint64) & MASK
+    )
+
+    return uniform(
+        (
+            x, y,
+            numpy.full(x.shape, step & MASK, dtype=numpy.uint64),
+            numpy.full(x.shape, channel & MASK, dtype=numpy.uint64),
+        ),
+        key
+    )
+
+
+def uniform(counter, key):
+    """
+    A uniform [0, 1) draw (or array of draws) from the first 53 bits of
+    the Philox4x32-10 block for a counter.
+
+    counter: a tuple of four 32-bit words.
+    key: a tuple of two 32-bit words.
+    """
+    first, second, _, _ = philox(counter, key)
+
+    if isinstance(first, int):
+        return ((first >> 5) * 67108864 + (second >> 6)) / 9007199254740992
+
+    return (
+        ((first >> 5) << 26) | (second >> 6)
+    ).astype(numpy.float64) / 9007199254740992
+
+
+def philox(counter, key):
+    """
+    The Philox4x32-10 block for a counter. Works on Python integers and
+    on numpy arrays of uint64 holding 32-bit values.
+
+    counter: a tuple of four 32-bit words.
+    key: a tuple of two 32-bit words.
+    """
+    first, second, third, fourth = counter
+    low, high = key
+
+    for round in range(ROUNDS):
+        if round:
+            low = (low + INCREMENTS[0]) & MASK
+            high = (high + INCREMENTS[1]) & MASK
+
+        product = first * MULTIPLIERS[0]
+        other = third * MULTIPLIERS[1]
+
+        first, second, third, fourth = (
+            (other >> 32) ^ second ^ low,
+            other & MASK,
+            (product >> 32) ^ fourth ^ high,
+            product & MASK,
+        )
+
+    return first, second, third, fourth
@@ -1,5 +1,10 @@
 from abc import ABCMeta, abstractproperty, abstractmethod
-from collections import namedtuple
+from bisect import bisect_right
+from collections import namedtuple, Counter
+from functools import lru_cache
+
+from pica.compiler import Compiler, Neighborhood, compile_rules
+from pica.conditions import CONTEXT
 
 Result = namedtuple('Result', ('state', 'difference'))
 
@@ -7,10 +12,17 @@ Result = namedtuple('Result', ('state', 'difference'))
 class AbstractRule(metaclass=ABCMeta):
     """
     A rule for a cellular automata
+
+    Rules that can be evaluated for every cell of a pica.engines.Grid at
+    once also define mask(grid), returning the Result the rule produces
+    and a boolean array of the cells it produces it for.
     """
+    __slots__ = ('_generation', '_cached', '_compiled')
+
     def __init__(self):
-        self._is_cached = False
+        self._generation = None
         self._cached = None
+        self._compiled = None
 
     @abstractproperty
     def from_state(self):
@@ -25,23 +37,46 @@ class AbstractRule(metaclass=ABCMeta):
         Returns the condition the rule is predicated on
         """
 
+    @property
+    def compiled(self):
+        """
+        The rule's condition, compiled into a single function taking
+        (cells, x, y). It is compiled the first time it is needed.
+        """
+        if self._compiled is None:
+            self._compiled = Compiler().function(self.condition)
+
+        return self._compiled
+
     @abstractmethod
     def evaluate(self, cells, x, y):
         """
         The evaluation of the rule
         """
 
+    def source(self, compiler):
+        """
+        The source of an expression evaluating the rule (for a cell it is
+        known to apply to), for use by a pica.compiler.Compiler. By
+        default, the compiled code calls the rule itself.
+
+        compiler: the compiler building the function.
+        """
+        return compiler.call(self)
+
     def __call__(self, cells, x, y):
         """
         Evaluate the rule using the cached value if possible
         """
-        if not self._is_cached:
+        generation = CONTEXT.generation
+
+        if self._generation != generation:
             if self.from_state == cells.cell(x, y):
                 self._cached = self.evaluate(cells, x, y)
             else:
                 self._cached = None
 
-            self._is_cached = True
+            self._generation = generation
 
         return self._cached
 
@@ -49,15 +84,33 @@ class AbstractRule(metaclass=ABCMeta):
         """
         Reset the rule.
         """
-        self._cached = None
-        self._is_cached = False
+        self._generation = None
         self.condition.reset()
 
+    def __getstate__(self):
+        # compiled functions can't be pickled, but can be rebuilt
+        state = dict(getattr(self, '__dict__', {}))
+
+        for cls in type(self).__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                if name != '_compiled' and hasattr(self, name):
+                    state[name] = getattr(self, name)
+
+        return state
+
+    def __setstate__(self, state):
+        self._compiled = None
+
+        for name, value in state.items():
+            setattr(self, name, value)
+
 
 class Rule(AbstractRule):
     """
     A rule for changing between two states.
     """
+    __slots__ = ('_from_state', '_to_state', '_condition', '_change')
+
     def __init__(self, from_state, to_state, condition, change):
         super().__init__()
 
@@ -70,6 +123,14 @@ class Rule(AbstractRule):
     def from_state(self):
         return self._from_state
 
+    @property
+    def to_state(self):
+        return self._to_state
+
+    @property
+    def change(self):
+        return self._change
+
     @property
     def condition(self):
         return self._condition
@@ -78,15 +139,35 @@ class Rule(AbstractRule):
         """
         Evaluate the rule
         """
-        if self._condition(cells, x, y):
+        if self.compiled(cells, x, y):
             return Result(self._to_state, self._change)
 
+    def mask(self, grid):
+        """
+        Evaluate the rule for every cell
+        """
+        return (
+            Result(self._to_state, self._change),
+            grid.is_state(self._from_state) & self._condition.mask(grid)
+        )
+
+    def source(self, compiler):
+        """
+        The source for evaluating the rule
+        """
+        return '({} if {} else None)'.format(
+            compiler.constant(Result(self._to_state, self._change)),
+            compiler.source(self._condition)
+        )
+
 
 class Requirement(AbstractRule):
     """
     Require a condition to be true in order for a transition to be
     allowed.
     """
+    __slots__ = ('_from_state', '_to_state', '_condition')
+
     def __init__(self, from_state, to_state, condition):
         super().__init__()
 
@@ -98,6 +179,10 @@ class Requirement(AbstractRule):
     def from_state(self):
         return self._from_state
 
+    @property
+    def to_state(self):
+        return self._to_state
+
     @property
     def condition(self):
         return self._condition
@@ -106,5 +191,324 @@ class Requirement(AbstractRule):
         """
         Evaluate the rule
         """
-        if not self._condition(cells, x, y):
+        if not self.compiled(cells, x, y):
             return Result(self._to_state, None)
+
+    def mask(self, grid):
+        """
+        Evaluate the rule for every cell
+        """
+        return (
+            Result(self._to_state, None),
+            grid.is_state(self._from_state) & ~self._condition.mask(grid)
+        )
+
+    def source(self, compiler):
+        """
+        The source for evaluating the rule
+        """
+        return '(None if {} else {})'.format(
+            compiler.source(self._condition),
+            compiler.constant(Result(self._to_state, None))
+        )
+
+
+class Distribution(namedtuple('Distribution', ('states', 'tally', 'total'))):
+    """
+    The possible next states of a cell, with a running tally of their
+    weights.
+
+    The states are in a canonical order (the order their rules come in),
+    rather than the order the rules happened to fire in, so that a draw
+    picks the same state however the distribution was calculated.
+
+    The tally must never go down (see UnorderedDistribution), so a state
+    can be chosen by a binary search of it.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_results(cls, results, order=()):
+        """
+        Build a distribution from the results of a cell's rules.
+
+        results: an iterable of Results (or None).
+        order: the order to put states in (see RuleSet.candidates). States
+            that aren't in it come after, in the order they fired in.
+        """
+        possibilities = Counter()
+        forbidden = set()
+
+        for result in results:
+            if result:
+                if result.difference is None:
+                    forbidden.add(result.state)
+                else:
+                    possibilities[result.state] += result.difference
+
+        for state in forbidden:
+            del possibilities[state]  # works even if state not a key
+
+        if order and len(possibilities) > 1:
+            rank = {state: index for index, state in enumerate(order)}
+            ordered_states = sorted(
+                possibilities, key=lambda state: rank.get(state, len(rank))
+            )
+        else:
+            ordered_states = possibilities
+
+        states = []
+        tally = []
+        ordered = True
+
+        total = 0
+        for state in ordered_states:
+            probability = possibilities[state]
+            total += probability
+
+            if probability < 0:
+                ordered = False
+
+            states.append(state)
+            tally.append(total)
+
+        if not ordered:
+            cls = UnorderedDistribution
+
+        return cls(tuple(states), tuple(tally), total)
+
+    def choose(self, draw):
+        """
+        Choose a state (or None if there are no possibilities). The state
+        is the first whose tally is above the total times the draw.
+
+        draw: a uniform draw from [0, 1).
+        """
+        index = bisect_right(self.tally, self.total * draw)
+
+        if index < len(self.states):
+            return self.states[index]
+
+    def probabilities(self):
+        """
+        The probability of choosing each state, as a list of (state,
+        probability) pairs. A state is chosen for the draws that fall
+        below its tally but not below any earlier tally.
+        """
+        if self.total <= 0:
+            return []
+
+        probabilities = []
+
+        covered = 0
+        for state, tally in zip(self.states, self.tally):
+            probability = (min(tally, self.total) - covered) / self.total
+
+            if probability > 0:
+                probabilities.append((state, probability))
+
+            covered = max(covered, tally)
+
+        return probabilities
+
+    def settles(self, state):
+        """
+        Whether a cell in a state is certain to stay in it.
+
+        state: the current state of the cell.
+        """
+        if self.total < 0:
+            return False
+
+        previous = 0
+        for possible, tally in zip(self.states, self.tally):
+            if tally != previous and possible != state:
+                return False
+
+            previous = tally
+
+        return True
+
+
+class UnorderedDistribution(Distribution):
+    """
+    A Distribution with negative weights, whose tally can go down. States
+    are chosen by scanning the tally instead.
+    """
+    __slots__ = ()
+
+    def choose(self, draw):
+        """
+        Choose a state (or None if there are no possibilities).
+
+        draw: a uniform draw from [0, 1).
+        """
+        value = self.total * draw
+
+        for state, tally in zip(self.states, self.tally):
+            if value < tally:
+                return state
+
+
+class RuleSet:
+    """
+    A collection of rules, indexed by the state they apply to so that only
+    the applicable rules need to be looked at for a cell.
+
+    The rules for each state are compiled into a single function, reading
+    from a neighborhood that is gathered once per cell. Compound
+    conditions shared between rules are evaluated at most once per cell.
+
+    Distributions are cached by the results of the rules that produced
+    them (that is, by which rules fired), so cells with the same active
+    rules share one precomputed tally.
+
+    rules: an iterable of rules. Their from_states must be hashable.
+    cache_size: the most distributions to remember (None for no limit).
+    """
+    def __init__(self, rules, cache_size=4096):
+        self._rules = tuple(rules)
+
+        by_state = {}
+        for rule in self._rules:
+            by_state.setdefault(rule.from_state, []).append(rule)
+
+        self._by_state = {
+            state: tuple(applicable) for state, applicable in by_state.items()
+        }
+
+        self._candidates = {}
+        for state, applicable in self._by_state.items():
+            candidates = []
+
+            for rule in applicable:
+                to_state = getattr(rule, 'to_state', None)
+
+                if to_state is not None and to_state not in candidates:
+                    candidates.append(to_state)
+
+            self._candidates[state] = tuple(candidates)
+
+        self._neighborhood = Neighborhood()
+
+        self._outcomes = {}
+        self._pure = set()
+
+        compiled = compile_rules(
+            list(self._by_state.values()), self._neighborhood
+        )
+
+        for state, (function, pure) in zip(self._by_state, compiled):
+            self._outcomes[state] = function
+
+            if pure:
+                self._pure.add(state)
+
+        self._gather = self._neighborhood.gatherer()
+        self._padded = {}
+
+        self._distribution = lru_cache(cache_size)(self._tally)
+
+    @property
+    def neighborhood(self):
+        """
+        The pica.compiler.Neighborhood the rules read.
+        """
+        return self._neighborhood
+
+    @property
+    def gather(self):
+        """
+        A function taking (cells, x, y) that returns the neighborhood of a
+        cell, to be passed to the functions from outcomes.
+        """
+        return self._gather
+
+    def padded_gather(self, border):
+        """
+        A function taking (rows, x, y) that returns the neighborhood of a
+        cell like gather, but reads the rows of pica.cells.Cells with a
+        ghost border directly (see Neighborhood.padded_gatherer).
+
+        border: the width of the ghost border.
+        """
+        try:
+            return self._padded[border]
+        except KeyError:
+            gather = self._neighborhood.padded_gatherer(border)
+            self._padded[border] = gather
+
+            return gather
+
+    @property
+    def states(self):
+        """
+        The states that have at least one applicable rule.
+        """
+        return tuple(self._by_state)
+
+    def applicable(self, state):
+        """
+        The rules (in their original order) that apply to cells in a
+        state.
+
+        state: the state of the cell.
+        """
+        return self._by_state.get(state, ())
+
+    def candidates(self, state):
+        """
+        The states the rules for cells in a state can lead to, in the
+        order the rules first mention them.
+
+        state: the state of the cell.
+        """
+        return self._candidates.get(state, ())
+
+    def distribution(self, state, results):
+        """
+        The Distribution of next states for a cell, from the results of
+        its rules.
+
+        state: the state of the cell.
+        results: the tuple returned by the cell's outcomes.
+        """
+        return self._distribution(state, results)
+
+    def cache_info(self):
+        """
+        The hits, misses, maxsize and currsize of the distribution cache.
+        """
+        return self._distribution.cache_info()
+
+    def _tally(self, state, results):
+        """
+        Build the distribution for the results of the rules for a state.
+        """
+        return Distribution.from_results(results, self.candidates(state))
+
+    def outcomes(self, state):
+        """
+        The compiled rules for cells in a state (or None if no rules
+        apply). This is a function taking (cells, x, y, n), where n is the
+        gathered neighborhood of the cell, and returning a tuple with the
+        Result (or None) of each applicable rule.
+
+        state: the state of the cell.
+        """
+        return self._outcomes.get(state)
+
+    def pure(self, state):
+        """
+        Whether the outcomes for cells in a state only depend on the
+        state and the gathered neighborhood (and so can be memoized).
+
+        state: the state of the cell.
+        """
+        return state in self._pure
+
+    def __iter__(self):
+        return iter(self._rules)
+
+    def __len__(self):
+        return len(self._rules)
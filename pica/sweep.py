@@ -0,0 +1,218 @@
+"""
+Run a simulation for every combination of a grid of parameters.
+"""
+from argparse import ArgumentParser
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import product
+import json
+from os import cpu_count
+import sys
+from time import perf_counter
+
+from pica.cli import ENGINES, conway, city
+from pica.engines import ArrayEngine
+from pica.graphics import label
+
+SIMULATIONS = {
+    'conway': conway,
+    'city': city,
+}
+
+
+def grid(parameters):
+    """
+    Every combination of a grid of parameters. Returns a list of
+    dictionaries from parameter name to value.
+
+    parameters: a dictionary from parameter name to a sequence of values.
+    """
+    names = list(parameters)
+
+    return [
+        dict(zip(names, values))
+        for values in product(*(parameters[name] for name in names))
+    ]
+
+
+def sweep(
+        factory, parameters, width, height, steps, engine=ArrayEngine,
+        seed=0, workers=None, chunk_size=None):
+    """
+    Run a simulation for every combination of a grid of parameters in a
+    pool of worker processes, yielding a summary of each run (see
+    summarize) as it finishes.
+
+    Runs are sent to the workers in chunks, as the parameters for each run
+    rather than the rules: the simulation is built in the worker.
+
+    factory: a function taking (width, height, engine, **parameters)
+        that returns an Automata (like pica.cli.city). It must be defined
+        at the top level of a module.
+    parameters: a dictionary from parameter name to a sequence of values.
+    width: the width of each simulation.
+    height: the height of each simulation.
+    steps: the number of steps to run each simulation for.
+    engine: the engine class to run with. It is called with the seed for
+        each run.
+    seed: the seed of the first run. Each run's seed is this plus the
+        index of the run.
+    workers: the number of worker processes (defaults to the number of
+        CPUs).
+    chunk_size: the number of runs to send to a worker at once (defaults
+        to about four chunks per worker).
+    """
+    workers = workers or cpu_count() or 1
+    runs = list(enumerate(grid(parameters)))
+
+    if chunk_size is None:
+        chunk_size = max(len(runs) // (workers * 4), 1)
+
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [
+            executor.submit(
+                run_chunk, factory, width, height, steps, engine, seed,
+                runs[start:start + chunk_size]
+            )
+            for start in range(0, len(runs), chunk_size)
+        ]
+
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+def run_chunk(factory, width, height, steps, engine, seed, runs):
+    """
+    Run a chunk of simulations, returning a list of their summaries.
+
+    factory: a function taking (width, height, engine, **parameters)
+        that returns an Automata.
+    width: the width of each simulation.
+    height: the height of each simulation.
+    steps: the number of steps to run each simulation for.
+    engine: the engine class to run with.
+    seed: the seed of the first run of the sweep.
+    runs: a list of (index, parameters) pairs.
+    """
+    summaries = []
+
+    for index, parameters in runs:
+        start = perf_counter()
+
+        automata = factory(
+            width, height, engine(seed=seed + index), **parameters
+        )
+
+        changes = []
+        for _ in range(steps):
+            changes.append(len(automata.step()))
+
+        summaries.append(summarize(
+            automata, index, parameters, seed + index, changes,
+            perf_counter() - start
+        ))
+
+    return summaries
+
+
+def summarize(automata, index, parameters, seed, changes, seconds):
+    """
+    A JSON-serializable summary of a run.
+
+    automata: the Automata after the run.
+    index: the index of the run.
+    parameters: the parameters of the run.
+    seed: the seed of the run.
+    changes: the number of cells that changed in each step.
+    seconds: how long the run took.
+    """
+    cells = automata.cells
+
+    populations = Counter()
+    for y in range(cells.height):
+        populations.update(cells.row(y))
+
+    return {
+        'run': index,
+        'parameters': parameters,
+        'seed': seed,
+        'steps': len(changes),
+        'changes': sum(changes),
+        'last_changes': changes[-1] if changes else 0,
+        'populations': {
+            label(state): count for state, count in populations.items()
+        },
+        'seconds': seconds,
+    }
+
+
+def record(summaries, output):
+    """
+    Write summaries to a file as JSON lines, as they arrive. Returns the
+    number of summaries written.
+
+    summaries: an iterable of summaries.
+    output: a writable text file.
+    """
+    count = 0
+
+    for summary in summaries:
+        output.write(json.dumps(summary, sort_keys=True))
+        output.write('\n')
+        output.flush()
+
+        count += 1
+
+    return count
+
+
+def parameter(text):
+    """
+    Parse a parameter from the command line, given as name=value,value...
+
+    text: the text to parse.
+    """
+    name, _, values = text.partition('=')
+
+    if not name or not values:
+        raise ValueError(text)
+
+    return name, [json.loads(value) for value in values.split(',')]
+
+
+def main():
+    """
+    Run a parameter sweep from the command line.
+    """
+    parser = ArgumentParser(description='cellular automata parameter sweep')
+    parser.add_argument('--width', default=64, type=int)
+    parser.add_argument('--height', default=64, type=int)
+    parser.add_argument('--steps', default=100, type=int)
+    parser.add_argument('--engine', default='array', choices=sorted(ENGINES))
+    parser.add_argument('--seed', default=0, type=int)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--chunk-size', type=int)
+    parser.add_argument(
+        '--parameter', action='append', default=[], type=parameter,
+        help='a parameter and the values to try, as name=value,value...'
+    )
+    parser.add_argument('--output', default='-')
+    parser.add_argument('simulation', choices=sorted(SIMULATIONS))
+
+    args = parser.parse_args()
+
+    summaries = sweep(
+        SIMULATIONS[args.simulation], dict(args.parameter), args.width,
+        args.height, args.steps, ENGINES[args.engine], args.seed,
+        args.workers, args.chunk_size
+    )
+
+    if args.output == '-':
+        record(summaries, sys.stdout)
+    else:
+        with open(args.output, 'w') as output:
+            record(summaries, output)
+
+
+if __name__ == '__main__':
+    main()
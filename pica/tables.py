@@ -0,0 +1,283 @@
+"""
+Precomputed transition tables for small state spaces.
+"""
+from itertools import product
+
+import numpy
+
+from pica.boundaries import EDGE
+from pica.conditions import CONTEXT, CompoundCondition, Equals
+from pica.engines import ArrayEngine, Distribution, shift
+
+
+class TransitionTable:
+    """
+    The distribution of next states for every possible neighborhood of a
+    RuleSet, indexed by an encoding of the neighborhood.
+
+    The symbols of the table are the states the rules mention, plus None
+    (for neighbors outside the grid). A neighborhood is encoded as the
+    symbols of the cell and each neighbor its rules read, as digits of a
+    base-(number of symbols) number, with the cell itself as the lowest
+    digit.
+
+    rules: the pica.rules.RuleSet to tabulate. Every state's rules must
+        be pure (see RuleSet.pure).
+    max_entries: the largest table to build. A ValueError is raised if the
+        table would be larger.
+    """
+    def __init__(self, rules, max_entries):
+        for state in rules.states:
+            if not rules.pure(state):
+                raise ValueError(
+                    'the rules for {!r} cannot be tabulated'.format(state)
+                )
+
+        self._symbols = alphabet(rules)
+        self._positions = ((0, 0),) + tuple(
+            offset for offset in rules.neighborhood.offsets if offset != (0, 0)
+        )
+
+        size = len(self._symbols) ** len(self._positions)
+        if size > max_entries:
+            raise ValueError(
+                'a table of {} entries is larger than {}'.format(
+                    size, max_entries
+                )
+            )
+
+        symbols = {state: symbol for symbol, state in enumerate(self._symbols)}
+        reads = [
+            self._positions.index(offset)
+            for offset in rules.neighborhood.offsets
+        ]
+
+        distributions = []
+
+        # product varies the last digit fastest, so reverse each entry to
+        # put the cell itself in the lowest digit
+        for entry in product(self._symbols, repeat=len(self._positions)):
+            entry = entry[::-1]
+            outcomes = rules.outcomes(entry[0])
+
+            if outcomes is None:
+                distributions.append(Distribution((), (), 0))
+            else:
+                CONTEXT.advance()
+
+                distributions.append(Distribution.from_results(
+                    outcomes(
+                        None, None, None, tuple(entry[read] for read in reads)
+                    ),
+                    rules.candidates(entry[0])
+                ))
+
+        width = max(
+            (len(distribution.states) for distribution in distributions),
+            default=0
+        )
+
+        self._candidates = numpy.full((size, max(width, 1)), -1)
+        self._tally = numpy.full((size, max(width, 1)), -numpy.inf)
+        self._total = numpy.zeros(size)
+
+        self._deterministic = True
+        self._next = numpy.full(size, -1)
+
+        for index, distribution in enumerate(distributions):
+            for column, (state, tally) in enumerate(
+                    zip(distribution.states, distribution.tally)):
+                self._candidates[index, column] = symbols[state]
+                self._tally[index, column] = tally
+
+            self._total[index] = distribution.total
+
+            possible = [
+                state for state, tally, previous in zip(
+                    distribution.states, distribution.tally,
+                    (0,) + distribution.tally
+                )
+                if tally != previous
+            ]
+
+            if distribution.total < 0 or len(possible) > 1:
+                self._deterministic = False
+            elif distribution.total > 0:
+                self._next[index] = symbols[possible[0]]
+
+    @property
+    def symbols(self):
+        """
+        The states of the table, in symbol order. The last is None.
+        """
+        return self._symbols
+
+    @property
+    def positions(self):
+        """
+        The offsets encoded in an index, starting with the cell itself.
+        """
+        return self._positions
+
+    @property
+    def deterministic(self):
+        """
+        Whether every neighborhood has at most one possible next state.
+        """
+        return self._deterministic
+
+    def __len__(self):
+        return len(self._total)
+
+    def symbolize(self, cells):
+        """
+        Map the codes of ArrayCells to the symbols of the table. Returns
+        None if the cells contain a state the table doesn't know about.
+
+        cells: the ArrayCells to map.
+        """
+        symbols = {state: symbol for symbol, state in enumerate(self._symbols)}
+        lookup = numpy.array(
+            [symbols.get(state, -1) for state in cells.states], dtype=int
+        )
+
+        symbols = lookup[cells.codes]
+
+        if (symbols < 0).any():
+            return None
+
+        return symbols
+
+    def encode(self, symbols, boundary=EDGE):
+        """
+        The index of the neighborhood of every cell of an array of
+        symbols. The boundary's state must be a symbol.
+
+        symbols: an array of symbols (with cells along the last two axes).
+        boundary: the pica.boundaries.Boundary of the array.
+        """
+        outside = self._symbols.index(boundary.state)
+
+        index = numpy.zeros(symbols.shape, dtype=numpy.int64)
+        for x, y in reversed(self._positions):
+            index *= len(self._symbols)
+            index += shift(symbols, x, y, outside, boundary)
+
+        return index
+
+    def next_symbols(self, index, draws):
+        """
+        Choose the next symbol of each cell (or -1 for cells that don't
+        change).
+
+        index: an array of neighborhood indices.
+        draws: an array of uniform [0, 1) draws (ignored if the table is
+            deterministic).
+        """
+        if self._deterministic:
+            return self._next[index]
+
+        value = self._total[index] * draws
+
+        chosen = numpy.full(index.shape, -1)
+        for column in range(self._tally.shape[1]):
+            hit = (chosen < 0) & (value < self._tally[index, column])
+            chosen[hit] = self._candidates[index, column][hit]
+
+        chosen[self._total[index] == 0] = -1
+
+        return chosen
+
+
+class TableEngine(ArrayEngine):
+    """
+    Step by looking up the neighborhood of every cell in a precomputed
+    TransitionTable. Deterministic rules go straight to the next state.
+
+    If the rules can't be tabulated, the table would be too large, or the
+    cells (or their boundary) hold a state the rules never mention, the
+    rules are evaluated as arrays instead.
+
+    max_entries: the largest table to build.
+    seed: the seed for random draws (optional).
+    """
+    def __init__(self, max_entries=1 << 20, seed=None):
+        super().__init__(seed)
+
+        self._max_entries = max_entries
+        self._table = None
+
+    @property
+    def table(self):
+        """
+        The TransitionTable (or None if the rules couldn't be tabulated).
+        """
+        return self._table
+
+    def prepare(self, rules):
+        super().prepare(rules)
+
+        try:
+            self._table = TransitionTable(self._rules, self._max_entries)
+        except ValueError:
+            self._table = None
+
+    def next_codes(self, cells, draws):
+        """
+        Calculate the next state code of every cell.
+
+        cells: the ArrayCells to evaluate.
+        draws: an array of uniform [0, 1) draws, one per cell.
+        """
+        symbols = None
+        if (
+                self._table is not None and
+                cells.boundary.state in self._table.symbols):
+            symbols = self._table.symbolize(cells)
+
+        if symbols is None:
+            return super().next_codes(cells, draws)
+
+        chosen = self._table.next_symbols(
+            self._table.encode(symbols, cells.boundary), draws
+        )
+
+        # the last symbol is None, which is never a next state
+        codes = numpy.array(
+            [cells.code(state) for state in self._table.symbols[:-1]] + [0]
+        )
+
+        return numpy.where(chosen < 0, cells.codes, codes[chosen]).astype(
+            cells.codes.dtype
+        )
+
+
+def alphabet(rules):
+    """
+    All of the states a RuleSet mentions, followed by None.
+
+    rules: the pica.rules.RuleSet.
+    """
+    states = []
+
+    def add(state):
+        if state is not None and state not in states:
+            states.append(state)
+
+    for rule in rules:
+        add(rule.from_state)
+
+        if hasattr(rule, 'to_state'):
+            add(rule.to_state)
+
+        pending = [rule.condition]
+        while pending:
+            condition = pending.pop()
+
+            if isinstance(condition, Equals):
+                for state in condition.states:
+                    add(state)
+            elif isinstance(condition, CompoundCondition):
+                pending.extend(reversed(condition.conditions))
+
+    return tuple(states) + (None,)
@@ -20,9 +20,13 @@ setup(
     license='MPL 2.0',
     url='https://github.com/bcj/pica',
     packages=('pica',),
+    install_requires=(
+        'numpy>=1.17',
+    ),
     entry_points = {
         'console_scripts': (
             'pica = pica.cli:main',
+            'pica-sweep = pica.sweep:main',
         )
     },
     tests_require=(
@@ -8,6 +8,22 @@ def test_automata():
     """
     The AbstractRule object
     """
+    from pica.engines import SerialEngine, FrontierEngine, ArrayEngine
+    from pica.parallel import ParallelEngine, SharedMemory
+    from pica.tables import TableEngine
+
+    engines = [SerialEngine, FrontierEngine, ArrayEngine, TableEngine]
+    if SharedMemory is not None:
+        engines.append(ParallelEngine)
+
+    for engine in engines:
+        check_automata(engine)
+
+
+def check_automata(engine):
+    """
+    Run a game of life with an engine
+    """
     from pica.conditions import Equals, Not, InRange
     from pica.rules import Rule, Requirement
     from pica.automata import Automata, Change
@@ -29,7 +45,7 @@ def test_automata():
         Rule('dead', 'live', Equals(0, 0, 'dead'), 1),
     ]
 
-    automata = Automata(5, 5, 'dead', *rules)
+    automata = Automata(5, 5, 'dead', *rules, engine=engine())
     automata.cells.update(0, 0, 'live')
     automata.cells.update(0, 1, 'live')
     automata.cells.update(1, 0, 'live')
@@ -40,7 +56,7 @@ def test_automata():
     assert_equals(automata.step(), set())
     assert_equals(automata.step(), set())
 
-    automata = Automata(5, 5, 'dead', *rules)
+    automata = Automata(5, 5, 'dead', *rules, engine=engine())
     automata.cells.update(0, 0, 'live')
     automata.cells.update(2, 0, 'live')
     automata.cells.update(2, 1, 'live')
@@ -76,3 +92,45 @@ def test_automata():
 
     assert_equals(automata.step(), set())
     assert_equals(automata.step(), set())
+
+
+def test_run():
+    """
+    Run an automata without building changes, observing it periodically
+    """
+    from nose.tools import assert_raises
+
+    from pica.bits import BitEngine
+    from pica.cli import conway
+    from pica.hashlife import HashEngine
+
+    expected = conway(9, 7, BitEngine(seed=8))
+    for _ in range(10):
+        expected.step()
+
+    for engine in (BitEngine, HashEngine):
+        automata = conway(9, 7, engine(seed=8))
+        observed = []
+
+        automata.run(
+            10, 4, lambda automata, steps: observed.append(
+                (steps, automata.engine.steps)
+            )
+        )
+
+        assert_equals(observed, [(4, 4), (8, 8)])
+        assert_equals(automata.engine.steps, 10)
+
+        for y in range(7):
+            assert_equals(
+                list(automata.cells.row(y)), list(expected.cells.row(y))
+            )
+
+    automata.run(0)
+    assert_equals(automata.engine.steps, 10)
+
+    with assert_raises(ValueError):
+        automata.run(-1)
+
+    with assert_raises(ValueError):
+        automata.run(5, 0)
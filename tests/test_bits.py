@@ -0,0 +1,127 @@
+"""
+Tests for the bits module.
+"""
+from nose.tools import (
+    assert_equals, assert_false, assert_is_none, assert_raises, assert_true
+)
+
+
+def test_bit_cells():
+    """
+    Create a BitCells object
+    """
+    from pica.boundaries import Wrap
+    from pica.changes import Changes
+    from pica.bits import BitCells
+
+    cells = BitCells(70, 3, 'off', ('off', 'on'))
+
+    assert_equals(cells.width, 70)
+    assert_equals(cells.height, 3)
+    assert_equals(cells.words.shape, (3, 2))
+    assert_equals(cells.cell(69, 2), 'off')
+    assert_is_none(cells.cell(70, 2))
+
+    with assert_raises(ValueError):
+        cells.update(1, 1, 'other')
+
+    with assert_raises(ValueError):
+        cells.update(70, 1, 'on')
+
+    cells.update(65, 1, 'on')
+    cells.update(0, 2, 'on')
+
+    assert_equals(cells.version, 2)
+    assert_equals(cells.cell(65, 1), 'on')
+    assert_equals(cells.words[1, 1], 2)
+    assert_equals(list(cells.row(2)), ['on'] + ['off'] * 69)
+
+    cells.apply(Changes([65, 3, 4], [1, 0, 0], ['off', 'on', 'on']))
+
+    assert_equals(cells.version, 5)
+    assert_equals(cells.cell(65, 1), 'off')
+    assert_equals(cells.bits[0].tolist(), [0, 0, 0, 1, 1] + [0] * 65)
+
+    # bits past the width stay clear
+    cells = BitCells(70, 2, 'on', ('off', 'on'), Wrap())
+
+    assert_equals(cells.words[0, 1], (1 << 6) - 1)
+    assert_equals(cells.cell(-1, 5), 'on')
+
+    with assert_raises(ValueError):
+        BitCells(3, 3, 'on', ('on', 'on'))
+
+
+def test_totalistic_rule():
+    """
+    Detect two-state totalistic rules from their transition tables
+    """
+    from pica.bits import TotalisticRule
+    from pica.rules import RuleSet
+    from pica.tables import TransitionTable
+    from tests.test_tables import life
+
+    rule = TotalisticRule.from_table(TransitionTable(RuleSet(life()), 1 << 20))
+
+    assert_equals(rule.on, 'live')
+    assert_equals(rule.off, 'dead')
+    assert_equals(len(rule.offsets), 8)
+    assert_equals(rule.birth, {3})
+    assert_equals(rule.survival, {2, 3})
+    assert_false(rule.outside)
+
+    from pica.conditions import And, Equals
+    from pica.rules import Rule
+
+    # depends on which neighbor is on, not just how many
+    rules = RuleSet((
+        Rule(
+            'dead', 'live',
+            And(Equals(1, 0, 'live'), Equals(-1, 0, 'dead')), 1
+        ),
+    ))
+
+    assert_is_none(
+        TotalisticRule.from_table(TransitionTable(rules, 1 << 20))
+    )
+
+
+def test_bit_engine():
+    """
+    Step the game of life 64 cells at a time
+    """
+    from pica.bits import BitCells, BitEngine
+    from pica.boundaries import Constant, Reflect, Wrap, EDGE
+    from pica.cells import ArrayCells
+    from pica.cli import conway
+    from pica.engines import ArrayEngine
+
+    for boundary in (EDGE, Wrap(), Reflect()):
+        for width, height in ((70, 9), (5, 5)):
+            expected = conway(width, height, ArrayEngine(seed=4), boundary)
+            automata = conway(width, height, BitEngine(seed=4), boundary)
+
+            assert_true(isinstance(automata.cells, BitCells))
+
+            for y in range(height):
+                for x in range(width):
+                    automata.cells.update(x, y, expected.cells.cell(x, y))
+
+            for _ in range(10):
+                assert_equals(set(automata.step()), set(expected.step()))
+
+            for y in range(height):
+                assert_equals(
+                    list(automata.cells.row(y)), list(expected.cells.row(y))
+                )
+
+    from pica.rules import RuleSet
+    from tests.test_tables import life
+
+    engine = BitEngine()
+    engine.prepare(RuleSet(life()))
+
+    # a boundary state the bits can't hold falls back to a table
+    cells = engine.cells(3, 3, engine.totalistic.off, Constant('other'))
+    assert_true(isinstance(cells, ArrayCells))
+    assert_equals(engine.step(cells), set())
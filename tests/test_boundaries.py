@@ -0,0 +1,38 @@
+"""
+Tests for the boundaries module.
+"""
+from nose.tools import assert_equals, assert_is_none, assert_true
+
+
+def test_boundaries():
+    """
+    Map positions outside a grid
+    """
+    import numpy
+
+    from pica.boundaries import BOUNDARIES, EDGE, Constant, Reflect, Wrap
+
+    assert_is_none(EDGE.state)
+    assert_is_none(EDGE.index(-1, 4))
+    assert_is_none(EDGE.locate(4, 0, 4, 3))
+    assert_equals(EDGE.locate(3, 2, 4, 3), (3, 2))
+    assert_equals(Constant('x').state, 'x')
+    assert_equals(Constant('x'), Constant('x'))
+    assert_true(Constant('x') != Constant('y'))
+
+    wrap = Wrap()
+    assert_equals([wrap.index(x, 4) for x in (-5, -1, 4, 9)], [3, 3, 0, 1])
+    assert_equals(wrap.locate(-1, 3, 4, 3), (3, 0))
+
+    reflect = Reflect()
+    assert_equals(
+        [reflect.index(x, 4) for x in range(-5, 10)],
+        [3, 3, 2, 1, 0, 0, 1, 2, 3, 3, 2, 1, 0, 0, 1]
+    )
+    assert_equals(
+        reflect.index(numpy.arange(-5, 10), 4).tolist(),
+        [reflect.index(x, 4) for x in range(-5, 10)]
+    )
+
+    assert_equals(BOUNDARIES['wrap'], wrap)
+    assert_equals(sorted(BOUNDARIES), ['edge', 'reflect', 'wrap'])
@@ -1,7 +1,9 @@
 """
 Tests for the cells module.
 """
-from nose.tools import assert_equals, assert_is_none, assert_raises
+from nose.tools import (
+    assert_equals, assert_false, assert_is_none, assert_raises, assert_true
+)
 
 
 def test_cells():
@@ -51,3 +53,172 @@ def test_cells():
     for y in range(2):
         for x, cell in enumerate(cells.row(y)):
             assert_equals(cell, (x, y))
+
+
+def test_state_table():
+    """
+    Intern states into codes
+    """
+    import numpy
+    from pica.cells import StateTable
+
+    table = StateTable(('a', 'b'))
+
+    assert_equals(len(table), 2)
+    assert_equals(list(table), ['a', 'b'])
+    assert_equals(table.code('a'), 0)
+    assert_equals(table.code('b'), 1)
+    assert_is_none(table.find('c'))
+    assert_false('c' in table)
+
+    assert_equals(table.code('c'), 2)
+    assert_equals(table.code('c'), 2)
+    assert_equals(table.find('c'), 2)
+    assert_true('c' in table)
+    assert_equals(table.state(2), 'c')
+    assert_equals(table.dtype, numpy.uint8)
+
+    for state in range(300):
+        table.code(state)
+
+    assert_equals(table.dtype, numpy.uint16)
+
+
+def test_array_cells():
+    """
+    Create an ArrayCells object
+    """
+    import numpy
+    from pica.cells import ArrayCells
+
+    cells = ArrayCells(3, 2, 'state')
+
+    assert_equals(cells.width, 3)
+    assert_equals(cells.height, 2)
+    assert_equals(cells.codes.shape, (2, 3))
+    assert_equals(cells.codes.dtype, numpy.uint8)
+
+    for x in range(3):
+        for y in range(2):
+            assert_equals(cells.cell(x, y), 'state')
+
+    for x, y in ((-1, -1), (0, 4), (3, 2)):
+        assert_is_none(cells.cell(x, y))
+
+    for y in (-1, 2, 3):
+        with assert_raises(ValueError):
+            list(cells.row(y))
+
+    for x, y in ((-1, -1), (0, 4), (3, 2)):
+        with assert_raises(ValueError):
+            cells.update(x, y, 'new state')
+
+    for x in range(3):
+        for y in range(2):
+            cells.update(x, y, (x, y))
+
+            assert_equals(cells.cell(x, y), (x, y))
+
+    for y in range(2):
+        for x, cell in enumerate(cells.row(y)):
+            assert_equals(cell, (x, y))
+
+    assert_equals(cells.states.code('state'), 0)
+    assert_equals(cells.codes[1, 2], cells.states.code((2, 1)))
+
+    # growing past 256 states widens the grid
+    cells = ArrayCells(300, 1, 0)
+    for x in range(300):
+        cells.update(x, 0, x)
+
+    assert_equals(cells.codes.dtype, numpy.uint16)
+    assert_equals(list(cells.row(0)), list(range(300)))
+
+
+def test_buffered_cells():
+    """
+    Buffered cells swap generations
+    """
+    from pica.cells import BufferedCells
+
+    cells = BufferedCells(3, 2, 'a')
+
+    for y, row in enumerate(cells.back):
+        for x in range(len(row)):
+            row[x] = (x, y)
+
+    assert_equals(cells.cell(1, 0), 'a')
+
+    cells.swap()
+
+    assert_equals(cells.version, 1)
+    assert_equals(cells.cell(1, 0), (1, 0))
+    assert_equals(list(cells.row(1)), [(0, 1), (1, 1), (2, 1)])
+    assert_equals(cells.back, [['a'] * 3, ['a'] * 3])
+
+    cells.update(2, 1, 'b')
+
+    assert_equals(cells.rows[1][2], 'b')
+    assert_equals(cells.back[1][2], 'a')
+
+
+def test_array_cells_swap():
+    """
+    Array cells swap in a new array without copying
+    """
+    import numpy
+    from pica.cells import ArrayCells
+
+    cells = ArrayCells(3, 2, 'a', ('a', 'b'))
+    codes = numpy.ones((2, 3), dtype=cells.codes.dtype)
+
+    previous = cells.swap(codes)
+
+    assert_true(cells.codes is codes)
+    assert_equals(previous.tolist(), [[0, 0, 0], [0, 0, 0]])
+    assert_equals(cells.cell(2, 1), 'b')
+    assert_equals(cells.version, 1)
+
+    with assert_raises(ValueError):
+        cells.swap(numpy.ones((3, 2), dtype=cells.codes.dtype))
+
+
+def test_ghost_border():
+    """
+    Cells keep a ghost border filled from their boundary
+    """
+    from pica.boundaries import Constant, Reflect, Wrap
+    from pica.cells import ArrayCells, Cells
+
+    for boundary in (Constant('x'), Wrap(), Reflect()):
+        cells = Cells(3, 2, 'a', boundary, 2)
+        array_cells = ArrayCells(3, 2, 'a', boundary=boundary)
+
+        for x in range(3):
+            for y in range(2):
+                cells.update(x, y, (x, y))
+                array_cells.update(x, y, (x, y))
+
+        cells.refresh()
+
+        for x in range(-2, 5):
+            for y in range(-2, 4):
+                expected = boundary.state
+                position = boundary.locate(x, y, 3, 2)
+
+                if position is not None:
+                    expected = position
+
+                assert_equals(cells.rows[y + 2][x + 2], expected)
+                assert_equals(cells.cell(x, y), expected)
+                assert_equals(array_cells.cell(x, y), expected)
+
+        assert_equals(cells.cell(-7, 0), array_cells.cell(-7, 0))
+        assert_equals(list(cells.row(1)), [(0, 1), (1, 1), (2, 1)])
+
+    # the border is only refreshed once something has changed
+    cells.update(0, 0, 'b')
+    assert_equals(cells.rows[1][2], (0, 0))
+
+    cells.refresh()
+    assert_equals(cells.rows[1][2], 'b')
@@ -0,0 +1,154 @@
+"""
+Tests for the changes module.
+"""
+from nose.tools import assert_equals, assert_false, assert_true
+
+
+def test_changes():
+    """
+    Changes behave as a set of Change tuples
+    """
+    from pica.changes import Change, Changes
+
+    changes = Changes([0, 2, 1], [1, 0, 1], ['a', 'b', 'a'])
+
+    assert_equals(len(changes), 3)
+    assert_equals(
+        changes, {Change(0, 1, 'a'), Change(2, 0, 'b'), Change(1, 1, 'a')}
+    )
+    assert_equals(
+        {Change(0, 1, 'a'), Change(2, 0, 'b'), Change(1, 1, 'a')}, changes
+    )
+    assert_equals(list(changes)[1], Change(2, 0, 'b'))
+
+    assert_true(Change(2, 0, 'b') in changes)
+    assert_false(Change(2, 0, 'a') in changes)
+    assert_false(Change(3, 3, 'a') in changes)
+    assert_false('b' in changes)
+
+    assert_equals(changes & {Change(0, 1, 'a')}, {Change(0, 1, 'a')})
+    assert_equals(type(changes | set()), set)
+
+    assert_equals(changes.xs, [0, 2, 1])
+    assert_equals(changes.ys, [1, 0, 1])
+    assert_equals(changes.states, ['a', 'b', 'a'])
+
+    assert_equals(Changes(), set())
+    assert_false(Changes())
+
+
+def test_change_arrays():
+    """
+    Changes as arrays of codes
+    """
+    from array import array
+
+    import numpy
+
+    from pica.cells import ArrayCells, Cells, StateTable
+    from pica.changes import Change, Changes, stream
+
+    table = StateTable(('a', 'b', 'c'))
+    xs = numpy.array([1, 0])
+    ys = numpy.array([2, 2])
+    codes = numpy.array([2, 1], dtype=numpy.uint8)
+
+    changes = Changes.from_codes(xs, ys, codes, table)
+
+    assert_equals(changes, {Change(1, 2, 'c'), Change(0, 2, 'b')})
+    assert_equals(list(stream(changes)), [(1, 2, 'c'), (0, 2, 'b')])
+    assert_equals(changes.states, ['c', 'b'])
+    assert_true(changes.table is table)
+
+    arrays = changes.arrays()
+    assert_true(arrays[0] is xs)
+    assert_true(arrays[2] is codes)
+
+    # coordinates in buffers are viewed rather than copied
+    buffered = Changes(array('l', [3, 4]), array('l', [0, 1]), ['b', 'd'])
+    xs, ys, codes = buffered.arrays()
+
+    assert_equals(xs.tolist(), [3, 4])
+    buffered.xs[0] = 5
+    assert_equals(xs.tolist(), [5, 4])
+
+    assert_equals(
+        [buffered.table.state(code) for code in codes.tolist()], ['b', 'd']
+    )
+
+    cells = Cells(6, 3, 'a')
+    cells.apply(changes)
+    cells.apply(buffered)
+
+    assert_equals(cells.version, 4)
+    assert_equals(list(cells.row(2)), ['b', 'c', 'a', 'a', 'a', 'a'])
+    assert_equals(cells.cell(5, 0), 'b')
+    assert_equals(cells.cell(4, 1), 'd')
+
+    grid = ArrayCells(6, 3, 'a')
+    grid.apply(changes)
+    grid.apply(buffered)
+
+    assert_equals(grid.version, 4)
+    assert_equals(list(grid.row(2)), ['b', 'c', 'a', 'a', 'a', 'a'])
+    assert_equals(grid.cell(5, 0), 'b')
+    assert_equals(grid.cell(4, 1), 'd')
+
+    assert_equals(list(stream({Change(1, 1, 'a')})), [Change(1, 1, 'a')])
+
+
+def test_change_diff():
+    """
+    Changes found by diffing two generations when first needed
+    """
+    import numpy
+
+    from pica.cells import StateTable
+    from pica.changes import Change, Changes
+
+    before = [['a', 'a'], ['a', 'b']]
+    after = [['a', 'b'], ['a', 'b']]
+
+    changes = Changes.diff(before, after)
+    after[1][0] = 'c'  # not looked at yet
+
+    assert_equals(changes, {Change(1, 0, 'b'), Change(0, 1, 'c')})
+
+    after[0][0] = 'd'  # already resolved
+    assert_equals(len(changes), 2)
+    assert_equals(list(changes.xs), [1, 0])
+
+    table = StateTable(('a', 'b'))
+    changes = Changes.diff(
+        numpy.array([[0, 0], [1, 1]]), numpy.array([[0, 1], [0, 1]]), table
+    )
+
+    assert_equals(changes, {Change(1, 0, 'b'), Change(0, 1, 'a')})
+    assert_true(changes.table is table)
+    assert_false(Changes.diff(before, before))
+
+
+def test_lazy_changes():
+    """
+    Changes found by calling a function when first needed
+    """
+    import numpy
+
+    from pica.cells import StateTable
+    from pica.changes import Change, Changes
+
+    table = StateTable(('a', 'b'))
+    calls = []
+
+    def find():
+        calls.append(None)
+
+        return numpy.array([2]), numpy.array([1]), numpy.array([1]), table
+
+    changes = Changes.lazy(find)
+    assert_equals(calls, [])
+
+    assert_equals(changes, {Change(2, 1, 'b')})
+    assert_equals(len(changes), 1)
+    assert_true(changes.table is table)
+    assert_equals(len(calls), 1)
@@ -0,0 +1,149 @@
+"""
+Tests for the chunks module.
+"""
+from nose.tools import (
+    assert_equals, assert_false, assert_is_none, assert_raises, assert_true
+)
+
+
+def test_chunked_cells():
+    """
+    Create a ChunkedCells object
+    """
+    from pica.boundaries import Wrap
+    from pica.changes import Changes
+    from pica.chunks import ChunkedCells
+
+    cells = ChunkedCells(10, 7, 'a', size=4)
+
+    assert_equals(cells.width, 10)
+    assert_equals(cells.height, 7)
+    assert_equals(cells.chunks, (3, 2))
+    assert_equals(cells.dense, 0)
+
+    for x, y in ((-1, -1), (0, 7), (10, 2)):
+        assert_is_none(cells.cell(x, y))
+
+        with assert_raises(ValueError):
+            cells.update(x, y, 'b')
+
+    with assert_raises(ValueError):
+        list(cells.row(7))
+
+    # writing the state a chunk is already in doesn't expand it
+    cells.update(1, 1, 'a')
+    assert_equals(cells.dense, 0)
+    assert_equals(cells.version, 1)
+
+    cells.update(9, 6, 'b')
+    cells.update(5, 1, 'c')
+
+    assert_equals(cells.dense, 2)
+    assert_equals(cells.cell(9, 6), 'b')
+    assert_equals(cells.cell(5, 1), 'c')
+    assert_equals(cells.cell(4, 1), 'a')
+    assert_true(cells.chunk(1, 0) is not None)
+    assert_equals(list(cells.row(1)), ['a'] * 5 + ['c'] + ['a'] * 4)
+    assert_equals(
+        cells.window(4, 0, 6, 2, 1),
+        [
+            [None] * 4, ['a', 'a', 'a', 'a'], ['a', 'a', 'c', 'a'],
+            ['a', 'a', 'a', 'a'],
+        ]
+    )
+
+    # chunks that become uniform again are collapsed
+    cells.apply(Changes([9, 5, 6], [6, 1, 1], ['a', 'a', 'b']))
+
+    assert_equals(cells.dense, 1)
+    assert_is_none(cells.chunk(2, 1))
+    assert_equals(cells.uniform(2, 1), 'a')
+    assert_equals(cells.cell(6, 1), 'b')
+    assert_equals(cells.version, 6)
+
+    # only the part of a chunk inside the grid has to be uniform
+    cells.apply(Changes([8, 9, 8, 9, 8, 9], [4, 4, 5, 5, 6, 6], ['c'] * 6))
+
+    assert_equals(cells.dense, 1)
+    assert_equals(cells.uniform(2, 1), 'c')
+    assert_equals(cells.cell(8, 5), 'c')
+
+    cells.update(6, 1, 'a')
+    assert_equals(cells.dense, 1)
+
+    cells.compact()
+    assert_equals(cells.dense, 0)
+
+    cells = ChunkedCells(3, 2, 'a', Wrap(), size=2)
+    cells.update(2, 1, 'b')
+
+    assert_equals(cells.cell(-1, -1), 'b')
+    assert_equals(cells.window(0, 0, 1, 1, 1)[0], ['b', 'a', 'a'])
+
+
+def test_chunked_engine():
+    """
+    Step ChunkedCells the same way a SerialEngine steps Cells
+    """
+    from pica.boundaries import Reflect, Wrap
+    from pica.chunks import ChunkedCells, ChunkedEngine
+    from pica.cli import city, conway
+    from pica.engines import SerialEngine
+
+    for boundary in (None, Wrap(), Reflect()):
+        for factory in (city, conway):
+            runs = []
+
+            for engine in (
+                    SerialEngine(seed=2), ChunkedEngine(size=8, seed=2),
+                    ChunkedEngine(size=3, seed=2)):
+                if boundary is None:
+                    automata = factory(23, 17, engine)
+                else:
+                    automata = factory(23, 17, engine, boundary=boundary)
+
+                runs.append([automata.step() for _ in range(12)])
+
+            assert_true(isinstance(automata.cells, ChunkedCells))
+            assert_true(sum(len(changes) for changes in runs[0]) > 5)
+
+            for run in runs[1:]:
+                assert_equals(run, runs[0])
+
+
+def test_chunked_activity():
+    """
+    Only the chunks around changing cells are stepped
+    """
+    from pica.automata import Automata
+    from pica.chunks import ChunkedEngine
+    from pica.cli import conway
+    from pica.graphics import State
+
+    alive = State('alive', '  ', 15)
+    dead = State('dead', '  ', 0)
+
+    automata = Automata(
+        4000, 3000, dead, *conway(3, 3).engine.rules,
+        engine=ChunkedEngine(size=32, seed=1), optimize=False
+    )
+
+    glider = {(1, 0), (2, 1), (0, 2), (1, 2), (2, 2)}
+    for x, y in glider:
+        automata.cells.update(x + 2000, y + 1520, alive)
+
+    for _ in range(8):
+        automata.step()
+
+    assert_equals(automata.cells.dense, 1)
+    assert_false(automata.engine._active - {
+        (column, row) for column in (61, 62, 63) for row in (46, 47, 48)
+    })
+
+    assert_equals(
+        {
+            (x, y) for x in range(2000, 2010) for y in range(1520, 1530)
+            if automata.cells.cell(x, y) == alive
+        },
+        {(x + 2002, y + 1522) for x, y in glider}
+    )
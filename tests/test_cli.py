@@ -0,0 +1,111 @@
+"""
+Tests for the cli module.
+"""
+from nose.tools import assert_equals
+
+
+def test_batch():
+    """
+    Run a simulation headlessly, writing snapshots as JSON lines
+    """
+    from io import StringIO
+    import json
+
+    from pica.cli import batch, conway
+    from pica.engines import ArrayEngine
+
+    automata = conway(4, 3, ArrayEngine(seed=3))
+    output = StringIO()
+
+    assert_equals(batch(automata, 5, 2, output), 3)
+
+    snapshots = [json.loads(line) for line in output.getvalue().splitlines()]
+
+    assert_equals([snapshot['step'] for snapshot in snapshots], [2, 4, 5])
+    assert_equals(snapshots[-1]['width'], 4)
+    assert_equals(snapshots[-1]['height'], 3)
+
+    last = snapshots[-1]
+    for y in range(3):
+        assert_equals(
+            [last['states'][index] for index in last['rows'][y]],
+            [state.state for state in automata.cells.row(y)]
+        )
+
+    # only the final state is written without observations
+    output = StringIO()
+    assert_equals(batch(automata, 4, None, output), 1)
+    assert_equals(json.loads(output.getvalue())['step'], 4)
+
+
+def test_parser():
+    """
+    Options are only accepted by the commands they apply to
+    """
+    from nose.tools import assert_raises
+
+    from pica.cli import parser
+
+    args = parser().parse_args(
+        ['run', 'city', '--steps', '5', '--observe-every', '2', '--width', '3']
+    )
+
+    assert_equals(args.command, 'run')
+    assert_equals(args.simulation, 'city')
+    assert_equals((args.steps, args.observe_every, args.width), (5, 2, 3))
+
+    args = parser().parse_args(['conway', '--time', '0.5'])
+
+    assert_equals(args.command, 'conway')
+    assert_equals(args.time, 0.5)
+    assert_equals((args.width, args.engine, args.seed), (8, 'serial', None))
+
+    # the common options can also come before the command
+    args = parser().parse_args(
+        ['--width', '20', '--height', '20', '--seed', '4', 'conway']
+    )
+
+    assert_equals(args.command, 'conway')
+    assert_equals((args.width, args.height, args.seed), (20, 20, 4))
+
+    args = parser().parse_args(
+        ['--width', '20', '--engine', 'array', 'run', 'city', '--width', '5']
+    )
+
+    assert_equals((args.width, args.engine), (5, 'array'))
+
+    for argv in (
+            ['conway', '--steps', '5', '--output', 'x'],
+            ['run', 'conway', '--time', '0.5'],
+            ['run'],
+            []):
+        with assert_raises(SystemExit):
+            parser().parse_args(argv)
+
+
+def test_main():
+    """
+    Run a simulation from the command line, rejecting bad observations
+    """
+    from nose.tools import assert_raises
+    import json
+    import os
+    from tempfile import TemporaryDirectory
+
+    from pica.cli import main
+
+    with TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'out.jsonl')
+        main([
+            'run', 'conway', '--steps', '4', '--observe-every', '2',
+            '--engine', 'array', '--seed', '1', '--output', path
+        ])
+
+        with open(path) as output:
+            steps = [json.loads(line)['step'] for line in output]
+
+        assert_equals(steps, [2, 4])
+
+    for observe_every in ('0', '-1'):
+        with assert_raises(SystemExit):
+            main(['run', 'conway', '--observe-every', observe_every])
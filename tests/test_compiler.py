@@ -0,0 +1,216 @@
+"""
+Tests for the compiler module.
+"""
+from nose.tools import assert_equals, assert_false, assert_true
+
+
+def test_compile_condition():
+    """
+    Compiled conditions match conditions evaluated directly
+    """
+    from random import Random
+
+    from pica.cells import Cells
+    from pica.compiler import compile_condition
+    from pica.conditions import Condition, Equals, Not, And, Or, InRange, If
+
+    class Implementation(Condition):
+        """
+        A condition with no source
+        """
+        def evaluate(self, cells, x, y):
+            return cells.cell(x, y) == 'c'
+
+    generator = Random(2)
+
+    cells = Cells(6, 5, 'a')
+    for x in range(6):
+        for y in range(5):
+            cells.update(x, y, generator.choice('abc'))
+
+    neighbors = [
+        Equals(x, y, 'a')
+        for x in range(-1, 2) for y in range(-1, 2)
+        if x != 0 or y != 0
+    ]
+
+    conditions = (
+        Equals(0, 0),
+        Equals(0, 0, 'a'),
+        Equals(1, -1, 'b', 'c'),
+        Equals(-1, 0, None),
+        Not(Equals(1, 1, 'a')),
+        And(Equals(0, 0, 'a'), Equals(1, 0, 'b')),
+        And(),
+        Or(Equals(0, 0, 'a'), Equals(-1, 0, 'b')),
+        Or(),
+        InRange(*neighbors, lower=2, upper=3),
+        InRange(*neighbors, lower=3),
+        InRange(*neighbors, upper=0),
+        InRange(*neighbors, upper=-1),
+        InRange(),
+        And(
+            InRange(*neighbors[:4], lower=1, upper=1),
+            Not(InRange(*neighbors[4:], lower=2, upper=2))
+        ),
+        If(Equals(0, 0, 'a'), Equals(0, 1, 'b')),
+        If(Equals(0, 0, 'a'), Equals(0, 1, 'b'), Not(Equals(1, 0, 'c'))),
+        Implementation(),
+        Or(Equals(0, 0, 'a'), Not(Implementation())),
+    )
+
+    for condition in conditions:
+        compiled = compile_condition(condition)
+
+        for x in range(-1, 7):
+            for y in range(-1, 6):
+                condition.reset()
+                assert_equals(
+                    bool(compiled(cells, x, y)),
+                    bool(condition(cells, x, y))
+                )
+
+
+def test_compile_in_range():
+    """
+    Compiled ranges stop once more than upper subconditions have matched
+    """
+    from pica.cells import Cells
+    from pica.compiler import compile_condition
+    from pica.conditions import CONTEXT, Condition, InRange
+
+    class Counting(Condition):
+        """
+        A condition that counts its evaluations
+        """
+        def __init__(self, value):
+            super().__init__()
+
+            self.value = value
+            self.count = 0
+
+        def evaluate(self, cells, x, y):
+            self.count += 1
+
+            return self.value
+
+    cells = Cells(1, 1, 'a')
+
+    for values, lower, upper, expected, evaluated in (
+            ((True,) * 6, 0, 2, False, 3),
+            ((False, True, True, False, True, True), 1, 2, False, 5),
+            ((True, False, True, False), 2, 2, True, 4),
+            ((True,) * 3, 0, 0, False, 1),
+            ((True,) * 3, 1, 5, True, 3)):
+        counting = [Counting(value) for value in values]
+        condition = InRange(*counting, lower=lower, upper=upper)
+
+        CONTEXT.advance()
+
+        assert_equals(compile_condition(condition)(cells, 0, 0), expected)
+        assert_equals(
+            [each.count for each in counting],
+            [1] * evaluated + [0] * (len(values) - evaluated)
+        )
+
+
+def test_offset():
+    """
+    Offset source
+    """
+    from pica.compiler import offset
+
+    assert_equals(offset('x', 0), 'x')
+    assert_equals(offset('x', 2), 'x + 2')
+    assert_equals(offset('y', -1), 'y - 1')
+
+
+def test_compile_rules():
+    """
+    Compound conditions shared between rules are evaluated once per cell
+    """
+    from pica.cells import Cells
+    from pica.compiler import Neighborhood, compile_rules, shared_conditions
+    from pica.conditions import CONTEXT, Condition, Equals, Not, Or
+    from pica.rules import Rule, Requirement, Result
+
+    class Counting(Condition):
+        """
+        A condition that counts its evaluations
+        """
+        def __init__(self):
+            super().__init__()
+
+            self.count = 0
+
+        def evaluate(self, cells, x, y):
+            self.count += 1
+
+            return True
+
+    counting = Counting()
+    shared = Or(Equals(1, 0, 'b'), counting)
+    unshared = Equals(1, 0, 'b')
+
+    rules = (
+        Rule('a', 'b', shared, 1),
+        Requirement('a', 'c', Not(shared)),
+        Rule('a', 'd', unshared, 1),
+    )
+
+    assert_equals(
+        shared_conditions(rule.condition for rule in rules), [shared]
+    )
+
+    neighborhood = Neighborhood()
+    (first, first_pure), (second, second_pure) = compile_rules(
+        [rules[:2], rules[2:]], neighborhood
+    )
+
+    # the shared condition calls back into the counting condition
+    assert_false(first_pure)
+    assert_true(second_pure)
+
+    assert_equals(neighborhood.offsets, ((1, 0),))
+    assert_equals(neighborhood.radius, 1)
+
+    cells = Cells(2, 1, 'a')
+    n = neighborhood.gatherer()(cells, 0, 0)
+
+    assert_equals(n, ('a',))
+
+    for expected in range(1, 4):
+        CONTEXT.advance()
+
+        assert_equals(
+            first(cells, 0, 0, n), (Result('b', 1), Result('c', None))
+        )
+        assert_equals(second(cells, 0, 0, n), (None,))
+        assert_equals(counting.count, expected)
+
+
+def test_neighborhood():
+    """
+    Gather the neighborhood of a cell
+    """
+    from pica.cells import Cells
+    from pica.compiler import Neighborhood
+
+    cells = Cells(3, 2, 'a')
+    neighborhood = Neighborhood()
+
+    assert_equals(neighborhood.radius, 0)
+    assert_equals(neighborhood.gatherer()(cells, 0, 0), ())
+
+    assert_equals(neighborhood.index(0, 0), 0)
+    assert_equals(neighborhood.index(-2, 1), 1)
+    assert_equals(neighborhood.index(0, 0), 0)
+    assert_equals(neighborhood.offsets, ((0, 0), (-2, 1)))
+    assert_equals(neighborhood.radius, 2)
+
+    cells.update(0, 1, 'b')
+
+    gather = neighborhood.gatherer()
+
+    assert_equals(gather(cells, 2, 0), ('a', 'b'))
+    assert_equals(gather(cells, 0, 0), ('a', None))
@@ -48,6 +48,56 @@ def test_condition():
     assert_equals(condition(None, None, None), 2)
 
 
+def test_context():
+    """
+    Advancing the context invalidates cached results
+    """
+    from pica.conditions import CONTEXT, Condition, And, Or
+
+    class Implementation(Condition):
+        """
+        An implementation of the Condition class
+        """
+        def __init__(self):
+            super().__init__()
+
+            self._counter = 0
+
+        def evaluate(self, cells, x, y):
+            """
+            An implementation of evaluate.
+            """
+            self._counter += 1
+
+            return self._counter - 1
+
+    condition = Implementation()
+
+    assert_equals(condition(None, None, None), 0)
+    assert_equals(condition(None, None, None), 0)
+
+    CONTEXT.advance()
+
+    assert_equals(condition(None, None, None), 1)
+    assert_equals(condition(None, None, None), 1)
+
+    # a condition shared between compound conditions is evaluated once
+    shared = Implementation()
+    first = And(shared)
+    second = Or(shared)
+
+    CONTEXT.advance()
+
+    assert_false(first(None, None, None))
+    assert_false(second(None, None, None))
+
+    CONTEXT.advance()
+
+    assert_true(first(None, None, None))
+    assert_true(second(None, None, None))
+    assert_equals(shared(None, None, None), 1)
+
+
 def test_equals():
     """
     Equals condition
@@ -0,0 +1,745 @@
+"""
+Tests for the engines module.
+"""
+from nose.tools import assert_equals, assert_true
+
+
+def test_shift():
+    """
+    Shift an array to line cells up with their neighbors
+    """
+    import numpy
+    from pica.engines import shift
+
+    array = numpy.arange(12).reshape(3, 4)
+
+    assert_equals(shift(array, 0, 0, -1).tolist(), array.tolist())
+    assert_equals(
+        shift(array, 1, 0, -1).tolist(),
+        [[1, 2, 3, -1], [5, 6, 7, -1], [9, 10, 11, -1]]
+    )
+    assert_equals(
+        shift(array, -1, 1, -1).tolist(),
+        [[-1, 4, 5, 6], [-1, 8, 9, 10], [-1, -1, -1, -1]]
+    )
+    assert_equals(shift(array, 4, 0, -1).tolist(), [[-1] * 4] * 3)
+
+    stacked = numpy.stack((array, array + 12))
+    assert_equals(
+        shift(stacked, 0, -1, -1).tolist(),
+        [
+            shift(array, 0, -1, -1).tolist(),
+            shift(array + 12, 0, -1, -1).tolist(),
+        ]
+    )
+
+
+def test_affected():
+    """
+    Find the cells that read changed cells, through the boundary
+    """
+    from pica.boundaries import Wrap
+    from pica.cells import Cells
+    from pica.compiler import Neighborhood
+    from pica.engines import affected, readers
+
+    neighborhood = Neighborhood()
+    neighborhood.index(1, 0)
+    neighborhood.index(0, -2)
+
+    reach = readers(neighborhood)
+
+    assert_equals(reach, {(0, 0), (-1, 0), (0, 2)})
+
+    cells = Cells(5, 6, 'a')
+
+    assert_equals(
+        affected(cells, [2], [2], reach), {(2, 2), (1, 2), (2, 4)}
+    )
+    assert_equals(affected(cells, [0, 4], [5, 0], reach), {
+        (0, 5), (4, 0), (3, 0), (4, 2),
+    })
+    assert_equals(affected(cells, [], [], reach), set())
+
+    cells = Cells(5, 6, 'a', Wrap())
+
+    assert_equals(affected(cells, [0], [5], reach), {
+        (0, 5), (4, 5), (0, 1),
+    })
+
+
+def test_masks():
+    """
+    Conditions evaluated as masks match conditions evaluated per cell
+    """
+    from random import Random
+
+    from pica.cells import ArrayCells
+    from pica.conditions import Condition, Equals, Not, And, Or, InRange, If
+    from pica.engines import Grid, maskable
+
+    generator = Random(4)
+
+    cells = ArrayCells(6, 5, 'a')
+    for x in range(6):
+        for y in range(5):
+            cells.update(x, y, generator.choice('abc'))
+
+    neighbors = [
+        Equals(x, y, 'a')
+        for x in range(-1, 2) for y in range(-1, 2)
+        if x != 0 or y != 0
+    ]
+
+    conditions = (
+        Equals(0, 0),
+        Equals(0, 0, 'a'),
+        Equals(1, -1, 'b', 'c'),
+        Equals(0, 2, 'missing'),
+        Equals(-1, 0, None),
+        Not(Equals(1, 1, 'a')),
+        And(Equals(0, 0, 'a'), Equals(1, 0, 'b')),
+        And(),
+        Or(Equals(0, 0, 'a'), Equals(-1, 0, 'b')),
+        Or(),
+        InRange(*neighbors, lower=2, upper=3),
+        InRange(*neighbors, lower=3),
+        InRange(),
+        If(Equals(0, 0, 'a'), Equals(0, 1, 'b')),
+        If(Equals(0, 0, 'a'), Equals(0, 1, 'b'), Not(Equals(1, 0, 'c'))),
+    )
+
+    grid = Grid(cells.codes, cells.states)
+
+    for condition in conditions:
+        mask = condition.mask(grid)
+
+        assert_equals(mask.shape, (5, 6))
+
+        for x in range(6):
+            for y in range(5):
+                condition.reset()
+                assert_equals(mask[y, x], condition(cells, x, y))
+
+    class Implementation(Condition):
+        """
+        A condition with no array evaluation
+        """
+        def evaluate(self, cells, x, y):
+            return True
+
+    for condition in conditions:
+        assert_true(maskable(condition))
+
+    assert_true(not maskable(Implementation()))
+    assert_true(not maskable(Or(Equals(0, 0, 'a'), Not(Implementation()))))
+
+
+def test_array_engine():
+    """
+    Step an automata with the ArrayEngine
+    """
+    from pica.automata import Automata
+    from pica.cells import ArrayCells
+    from pica.conditions import Equals
+    from pica.engines import ArrayEngine, Change
+    from pica.rules import Rule, Requirement
+
+    rules = (
+        Rule('a', 'a', Equals(0, 0, 'a'), 1),
+        Rule('a', 'b', Equals(0, 0, 'a'), 1),
+        Requirement('a', 'b', Equals(-1, 0, 'a', 'b')),
+        Rule('b', 'c', Equals(0, 0, 'b'), 1),
+    )
+
+    automata = Automata(100, 100, 'a', *rules, engine=ArrayEngine(seed=1))
+    assert_true(isinstance(automata.cells, ArrayCells))
+
+    changes = automata.step()
+
+    # the first column can't become b
+    assert_true(all(change.x > 0 for change in changes))
+    assert_true(all(change.state == 'b' for change in changes))
+    assert_true(4000 < len(changes) < 5900)
+
+    for change in changes:
+        assert_equals(automata.cells.cell(change.x, change.y), 'b')
+
+    again = Automata(100, 100, 'a', *rules, engine=ArrayEngine(seed=1))
+    assert_equals(again.step(), changes)
+
+    assert_equals(
+        automata.step() & {Change(x, y, 'c') for x, y, _ in changes},
+        {Change(x, y, 'c') for x, y, _ in changes}
+    )
+
+
+def test_serial_engine():
+    """
+    The SerialEngine reads each neighbor once per cell
+    """
+    from pica.cells import Cells
+    from pica.conditions import Equals, Or
+    from pica.engines import Change, SerialEngine
+    from pica.rules import Rule
+
+    class Counting(Cells):
+        """
+        Cells that count reads
+        """
+        reads = 0
+
+        def cell(self, x, y):
+            Counting.reads += 1
+
+            return super().cell(x, y)
+
+    rules = (
+        Rule('a', 'b', Or(Equals(1, 0, 'b'), Equals(-1, 0, 'b')), 1),
+        Rule('a', 'c', Equals(1, 0, 'b'), 1),
+        Rule('a', 'd', Or(Equals(1, 0, 'b'), Equals(-1, 0, 'b')), 1),
+    )
+
+    engine = SerialEngine()
+    engine.prepare(rules)
+
+    cells = Counting(3, 1, 'a')
+    cells.update(0, 0, 'b')
+
+    changes = engine.step(cells)
+
+    # one read for the state, and one for each offset
+    assert_equals(Counting.reads, 2 * 3 + 1)
+    assert_equals(len(changes), 1)
+    assert_true(changes <= {
+        Change(1, 0, state) for state in 'bcd'
+    })
+
+
+def test_distribution():
+    """
+    Build a distribution from rule results
+    """
+    from pica.engines import Distribution
+    from pica.rules import Result
+
+    distribution = Distribution.from_results((
+        Result('a', 1), None, Result('b', 2), Result('c', None),
+        Result('a', 1), Result('c', 5),
+    ))
+
+    assert_equals(distribution.states, ('a', 'b'))
+    assert_equals(distribution.tally, (2, 4))
+    assert_equals(distribution.total, 4)
+
+    assert_equals(distribution.choose(0), 'a')
+    assert_equals(distribution.choose(0.49), 'a')
+    assert_equals(distribution.choose(0.5), 'b')
+    assert_equals(distribution.choose(0.99), 'b')
+
+    empty = Distribution.from_results(())
+    assert_equals(empty.total, 0)
+    assert_equals(empty.choose(0.5), None)
+
+
+def test_serial_engine_cache():
+    """
+    The SerialEngine memoizes distributions by neighborhood
+    """
+    from pica.cells import Cells
+    from pica.conditions import Condition, Equals, InRange
+    from pica.engines import SerialEngine
+    from pica.rules import Rule, Requirement
+
+    neighbors = [
+        Equals(x, y, 'live')
+        for x in range(-1, 2) for y in range(-1, 2)
+        if x != 0 or y != 0
+    ]
+
+    rules = (
+        Requirement('dead', 'live', InRange(*neighbors, lower=3, upper=3)),
+        Rule('dead', 'live', Equals(0, 0, 'dead'), 1),
+    )
+
+    engine = SerialEngine(cache_size=None)
+    engine.prepare(rules)
+
+    engine.step(Cells(5, 5, 'dead'))
+
+    # 4 corners, 4 edges and the middle
+    info = engine.cache_info()
+    assert_equals((info.hits, info.misses), (16, 9))
+
+    engine = SerialEngine(cache_size=2)
+    engine.prepare(rules)
+
+    engine.step(Cells(5, 5, 'dead'))
+
+    info = engine.cache_info()
+    assert_equals((info.hits + info.misses, info.currsize), (25, 2))
+
+    class Opaque(Condition):
+        """
+        A condition that can't be memoized
+        """
+        def evaluate(self, cells, x, y):
+            return True
+
+    engine = SerialEngine()
+    engine.prepare((Rule('dead', 'live', Opaque(), 1),))
+
+    assert_equals(len(engine.step(Cells(2, 2, 'dead'))), 4)
+    assert_equals(engine.cache_info().misses, 0)
+
+
+def test_frontier_engine():
+    """
+    The FrontierEngine only evaluates cells near changes
+    """
+    from pica.automata import Automata
+    from pica.conditions import Equals, Not, InRange
+    from pica.engines import FrontierEngine, SerialEngine
+    from pica.rules import Rule, Requirement
+
+    neighbors = [
+        Equals(x, y, 'live')
+        for x in range(-1, 2) for y in range(-1, 2)
+        if x != 0 or y != 0
+    ]
+
+    rules = (
+        Requirement(
+            'live', 'dead', Not(InRange(*neighbors, lower=2, upper=3))
+        ),
+        Requirement('dead', 'live', InRange(*neighbors, lower=3, upper=3)),
+        Rule('live', 'dead', Equals(0, 0, 'live'), 1),
+        Rule('dead', 'live', Equals(0, 0, 'dead'), 1),
+    )
+
+    glider = ((1, 0), (2, 1), (0, 2), (1, 2), (2, 2))
+
+    frontier = Automata(20, 20, 'dead', *rules, engine=FrontierEngine())
+    serial = Automata(20, 20, 'dead', *rules, engine=SerialEngine())
+
+    for automata in (frontier, serial):
+        for x, y in glider:
+            automata.cells.update(x, y, 'live')
+
+    assert_equals(frontier.step(), serial.step())
+    assert_equals(frontier.engine.evaluated, 400)
+
+    for _ in range(20):
+        assert_equals(frontier.step(), serial.step())
+        assert_true(frontier.engine.evaluated <= 9 * 8)
+
+    # updating a cell directly makes the next step look at everything
+    for automata in (frontier, serial):
+        automata.cells.update(15, 2, 'live')
+
+    assert_equals(frontier.step(), serial.step())
+    assert_equals(frontier.engine.evaluated, 400)
+
+    # cells that can change on their own are always evaluated
+    automata = Automata(
+        10, 10, 'a', Rule('a', 'b', Equals(0, 0, 'a'), 0.001),
+        Rule('a', 'a', Equals(0, 0, 'a'), 1), engine=FrontierEngine()
+    )
+
+    for _ in range(3):
+        automata.step()
+
+    assert_true(automata.engine.evaluated > 90)
+
+
+def test_reproducible():
+    """
+    Every engine takes the same steps given the same seed
+    """
+    from pica.automata import Automata
+    from pica.conditions import Equals, Or
+    from pica.engines import SerialEngine, FrontierEngine, ArrayEngine
+    from pica.parallel import ParallelEngine, SharedMemory
+    from pica.rules import Rule, Requirement
+    from pica.tables import TableEngine
+
+    rules = (
+        Rule('a', 'a', Equals(0, 0, 'a'), 0.9),
+        Rule('a', 'c', Equals(1, 0, 'b'), 0.3),
+        Rule('a', 'b', Or(Equals(0, 1, 'b'), Equals(-1, 0, 'c')), 0.4),
+        Rule('a', 'c', Equals(0, -1, 'c'), 0.25),
+        Rule('a', 'b', Equals(0, 0, 'a'), 0.01),
+        Requirement('b', 'a', Equals(1, 1, 'c')),
+        Rule('b', 'a', Equals(0, 0, 'b'), 0.1),
+        Rule('c', 'a', Equals(0, 0, 'c'), 0.2),
+        Rule('c', 'c', Equals(0, 0, 'c'), 0.6),
+    )
+
+    engines = [
+        SerialEngine(seed=3), FrontierEngine(seed=3), ArrayEngine(seed=3),
+        TableEngine(seed=3),
+    ]
+    if SharedMemory is not None:
+        engines.append(ParallelEngine(processes=2, tiles=3, seed=3))
+
+    runs = []
+    for engine in engines:
+        automata = Automata(12, 9, 'a', *rules, engine=engine)
+        automata.randomize(('a', 'b'))
+
+        runs.append([automata.step() for _ in range(20)])
+
+        assert_equals(engine.steps, 20)
+
+    if SharedMemory is not None:
+        engines[-1].close()
+
+    assert_true(engines[3].table is not None)
+    assert_true(sum(len(changes) for changes in runs[0]) > 100)
+
+    for run in runs[1:]:
+        assert_equals(run, runs[0])
+
+
+def test_custom_rules():
+    """
+    Array engines evaluate rules they can't mask one cell at a time
+    """
+    from pica.automata import Automata
+    from pica.bits import BitEngine
+    from pica.conditions import Condition, Equals, Or
+    from pica.engines import SerialEngine, ArrayEngine, maskable
+    from pica.ensemble import Ensemble
+    from pica.rules import AbstractRule, Result, Rule
+    from pica.tables import TableEngine
+
+    class Odd(Condition):
+        """
+        A condition on the column of the cell
+        """
+        def evaluate(self, cells, x, y):
+            return x % 2 == 1
+
+    class Spread(AbstractRule):
+        """
+        A rule whose weight depends on a neighbor
+        """
+        @property
+        def from_state(self):
+            return 'a'
+
+        @property
+        def condition(self):
+            return Equals(1, 0, 'b')
+
+        def evaluate(self, cells, x, y):
+            return Result('b', 0.6 if cells.cell(x + 1, y) == 'b' else 0.1)
+
+    rules = (
+        Rule('a', 'a', Equals(0, 0, 'a'), 0.5),
+        Rule('a', 'c', Or(Odd(), Equals(0, 1, 'c')), 0.3),
+        Spread(),
+        Rule('b', 'a', Equals(0, 0, 'b'), 0.2),
+        Rule('b', 'b', Equals(0, 0, 'b'), 0.5),
+        Rule('c', 'a', Odd(), 0.4),
+        Rule('c', 'c', Equals(0, 0, 'c'), 0.4),
+    )
+
+    assert_true(maskable(rules[0]))
+    assert_true(not maskable(rules[1]))
+    assert_true(not maskable(rules[2]))
+
+    runs = []
+    for engine in (
+            SerialEngine(seed=4), ArrayEngine(seed=4), TableEngine(seed=4),
+            BitEngine(seed=4)):
+        automata = Automata(9, 7, 'a', *rules, engine=engine)
+        automata.randomize(('a', 'b', 'c'))
+
+        runs.append([automata.step() for _ in range(10)])
+
+    assert_true(sum(len(changes) for changes in runs[0]) > 50)
+
+    for run in runs[1:]:
+        assert_equals(run, runs[0])
+
+    # and for each replica of an ensemble
+    ensemble = Ensemble(3, 9, 7, 'a', *rules, seeds=(4, 5, 6))
+    ensemble.randomize(('a', 'b', 'c'))
+
+    for _ in range(5):
+        ensemble.step()
+
+    for replica, seed in enumerate((4, 5, 6)):
+        automata = Automata(9, 7, 'a', *rules, engine=ArrayEngine(seed=seed))
+        automata.randomize(('a', 'b', 'c'))
+
+        for _ in range(5):
+            automata.step()
+
+        replicated = ensemble.replica(replica)
+        for y in range(7):
+            assert_equals(
+                list(replicated.row(y)), list(automata.cells.row(y))
+            )
+
+
+def test_candidate_order():
+    """
+    Distributions order states the way the rules do
+    """
+    from pica.engines import Distribution
+    from pica.rules import Result
+
+    results = (None, Result('c', 1), Result('b', 2), None, Result('d', None))
+
+    assert_equals(
+        Distribution.from_results(results), (('c', 'b'), (1, 3), 3)
+    )
+    assert_equals(
+        Distribution.from_results(results, ('b', 'c', 'd')),
+        (('b', 'c'), (2, 3), 3)
+    )
+    assert_equals(
+        Distribution.from_results(results, ('b',)), (('b', 'c'), (2, 3), 3)
+    )
+
+
+def test_choose():
+    """
+    Choose states by searching the tally
+    """
+    from pica.engines import Distribution
+    from pica.rules import Result, UnorderedDistribution
+
+    distribution = Distribution(('a', 'b', 'c', 'd'), (1, 1, 3, 4), 4)
+
+    assert_equals(distribution.choose(0), 'a')
+    assert_equals(distribution.choose(0.25), 'c')
+    assert_equals(distribution.choose(0.74), 'c')
+    assert_equals(distribution.choose(0.75), 'd')
+    assert_equals(distribution.choose(0.9999), 'd')
+
+    unordered = Distribution.from_results(
+        (Result('a', 2), Result('b', -1), Result('c', 1))
+    )
+
+    assert_true(isinstance(unordered, UnorderedDistribution))
+    assert_equals(unordered, (('a', 'b', 'c'), (2, 1, 2), 2))
+    assert_equals(unordered.choose(0.4), 'a')
+    assert_equals(unordered.choose(0.99), 'a')
+
+    assert_equals(type(Distribution.from_results(())), Distribution)
+
+    # the tally is only searched the same way as it's scanned when it
+    # never goes down
+    for draw in (0.0, 0.1, 0.3, 0.5, 0.7, 0.9):
+        assert_equals(
+            distribution.choose(draw),
+            UnorderedDistribution(*distribution).choose(draw)
+        )
+
+
+def test_rule_set_distributions():
+    """
+    Cells whose rules can't be memoized share distributions
+    """
+    from pica.automata import Automata
+    from pica.conditions import Condition, Equals
+    from pica.engines import Distribution, SerialEngine
+    from pica.rules import Rule, Requirement
+
+    class Diagonal(Condition):
+        """
+        Whether the cell is on a diagonal
+        """
+        def evaluate(self, cells, x, y):
+            return x == y
+
+    rules = (
+        Rule('a', 'b', Diagonal(), 0.25),
+        Rule('a', 'c', Equals(1, 0, 'b'), 0.5),
+        Rule('a', 'b', Equals(0, 0, 'a'), 0.125),
+        Requirement('a', 'c', Diagonal()),
+        Rule('b', 'a', Diagonal(), 1),
+        Rule('c', 'c', Equals(0, 0, 'c'), 2),
+        Rule('c', 'a', Equals(0, 0, 'c'), 1),
+    )
+
+    automata = Automata(6, 6, 'a', *rules, engine=SerialEngine(seed=2))
+    automata.randomize(('a', 'b', 'c'))
+
+    engine = automata.engine
+    cells = automata.cells
+
+    for _ in range(3):
+        for x in range(6):
+            for y in range(6):
+                state = cells.cell(x, y)
+
+                if engine.rules.outcomes(state) is None:
+                    continue
+
+                neighborhood = engine.rules.gather(cells, x, y)
+
+                assert_equals(
+                    engine.distribution(cells, x, y, state, neighborhood),
+                    Distribution.from_results(
+                        engine.rules.outcomes(state)(
+                            cells, x, y, neighborhood
+                        ),
+                        engine.rules.candidates(state)
+                    )
+                )
+
+        automata.step()
+
+    # a, b and c each have a handful of combinations of rules that fire
+    assert_true(engine.rules.cache_info().currsize < 12)
+
+
+def test_buffered_steps():
+    """
+    Stepping buffered cells matches applying changes
+    """
+    from pica.cells import BufferedCells, Cells
+    from pica.conditions import Equals
+    from pica.engines import SerialEngine
+    from pica.rules import Rule
+
+    rules = (
+        Rule('a', 'b', Equals(1, 0, 'b'), 1),
+        Rule('a', 'c', Equals(0, 0, 'a'), 0.1),
+        Rule('b', 'a', Equals(0, 0, 'b'), 0.5),
+    )
+
+    runs = []
+    for cells in (Cells(8, 6, 'a'), BufferedCells(8, 6, 'a')):
+        engine = SerialEngine(seed=4)
+        engine.prepare(rules)
+
+        cells.update(7, 2, 'b')
+
+        # earlier changes stay correct once the grids are reused
+        steps = [engine.step(cells) for _ in range(6)]
+        runs.append((steps, [list(cells.row(y)) for y in range(6)]))
+
+    assert_true(isinstance(SerialEngine().cells(2, 2, 'a'), BufferedCells))
+    assert_true(sum(len(changes) for changes in runs[0][0]) > 10)
+    assert_equals(runs[1], runs[0])
+
+
+def test_lazy_changes():
+    """
+    Changes found lazily aren't affected by writes after the step
+    """
+    from pica.bits import BitEngine
+    from pica.cli import conway
+    from pica.engines import ArrayEngine, SerialEngine
+    from pica.tables import TableEngine
+
+    for engine in (SerialEngine, ArrayEngine, TableEngine, BitEngine):
+        automata = conway(6, 5, engine(seed=3))
+        cells = automata.cells
+
+        before = [list(cells.row(y)) for y in range(5)]
+        changes = automata.step()
+        after = [list(cells.row(y)) for y in range(5)]
+
+        states = sorted({state for row in after for state in row})
+        cells.update(0, 0, states[1 - states.index(after[0][0])])
+        automata.randomize(states)
+
+        assert_equals(
+            sorted((x, y) for x, y, _ in changes),
+            sorted(
+                (x, y) for y in range(5) for x in range(6)
+                if before[y][x] != after[y][x]
+            )
+        )
+
+        for x, y, state in changes:
+            assert_equals(state, after[y][x])
+
+
+def test_boundaries():
+    """
+    Every engine steps the same way through each boundary
+    """
+    from pica.automata import Automata
+    from pica.boundaries import Constant, Reflect, Wrap
+    from pica.conditions import Equals, Or
+    from pica.engines import SerialEngine, FrontierEngine, ArrayEngine
+    from pica.parallel import ParallelEngine, SharedMemory
+    from pica.rules import Rule, Requirement
+    from pica.tables import TableEngine
+
+    rules = (
+        Rule('a', 'a', Equals(0, 0, 'a'), 0.9),
+        Rule('a', 'c', Equals(2, 0, 'b'), 0.3),
+        Rule('a', 'b', Or(Equals(0, 1, 'b'), Equals(-1, 0, 'c')), 0.4),
+        Rule('a', 'b', Equals(1, -2, None), 0.3),
+        Requirement('b', 'a', Equals(1, 1, 'c')),
+        Rule('b', 'a', Equals(0, 0, 'b'), 0.1),
+        Rule('c', 'a', Equals(0, 0, 'c'), 0.2),
+    )
+
+    for boundary in (Wrap(), Reflect(), Constant('c')):
+        engines = [
+            SerialEngine(seed=3), FrontierEngine(seed=3),
+            ArrayEngine(seed=3), TableEngine(seed=3),
+        ]
+        if SharedMemory is not None:
+            engines.append(ParallelEngine(processes=2, tiles=3, seed=3))
+
+        runs = []
+        for engine in engines:
+            automata = Automata(
+                7, 9, 'a', *rules, engine=engine, boundary=boundary
+            )
+            automata.randomize(('a', 'b'))
+
+            runs.append([automata.step() for _ in range(10)])
+
+        if SharedMemory is not None:
+            engines[-1].close()
+
+        assert_true(sum(len(changes) for changes in runs[0]) > 40)
+
+        for run in runs[1:]:
+            assert_equals(run, runs[0])
+
+
+def test_wrap():
+    """
+    A glider crosses the edges of a torus
+    """
+    from pica.boundaries import Wrap
+    from pica.cli import conway
+    from pica.engines import SerialEngine, ArrayEngine
+    from pica.graphics import State
+
+    alive = State('alive', '  ', 15)
+    dead = State('dead', '  ', 0)
+
+    for engine in (SerialEngine(), ArrayEngine()):
+        automata = conway(6, 6, engine, Wrap())
+
+        glider = {(1, 0), (2, 1), (0, 2), (1, 2), (2, 2)}
+        for x in range(6):
+            for y in range(6):
+                automata.cells.update(
+                    x, y, alive if (x, y) in glider else dead
+                )
+
+        # it moves one cell diagonally every four steps
+        for _ in range(4 * 6):
+            automata.step()
+
+        assert_equals(
+            {
+                (x, y) for x in range(6) for y in range(6)
+                if automata.cells.cell(x, y) == alive
+            },
+            glider
+        )
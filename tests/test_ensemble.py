@@ -0,0 +1,76 @@
+"""
+Tests for the ensemble module.
+"""
+from nose.tools import assert_equals, assert_raises
+
+
+def test_ensemble():
+    """
+    Step many replicas at once
+    """
+    from pica.automata import Automata
+    from pica.conditions import Equals, Or
+    from pica.engines import ArrayEngine
+    from pica.ensemble import Ensemble
+    from pica.rules import Rule
+
+    rules = (
+        Rule('a', 'a', Equals(0, 0, 'a'), 0.8),
+        Rule('a', 'b', Or(Equals(1, 0, 'b'), Equals(0, 1, 'b')), 0.5),
+        Rule('b', 'c', Equals(-1, -1, 'c'), 1),
+        Rule('b', 'b', Equals(0, 0, 'b'), 2),
+        Rule('c', 'a', Equals(0, 0, 'c'), 0.1),
+    )
+
+    ensemble = Ensemble(4, 7, 5, 'a', *rules, seeds=(1, 2, 3, 4))
+
+    assert_equals(ensemble.replicas, 4)
+    assert_equals(ensemble.codes.shape, (4, 5, 7))
+
+    ensemble.randomize(('a', 'b', 'c'))
+
+    replicas = []
+    for seed in ensemble.seeds:
+        automata = Automata(7, 5, 'a', *rules, engine=ArrayEngine(seed=seed))
+        automata.randomize(('a', 'b', 'c'))
+
+        replicas.append(automata)
+
+    for _ in range(10):
+        counts = ensemble.step()
+
+        for index, automata in enumerate(replicas):
+            assert_equals(counts[index], len(automata.step()))
+
+    assert_equals(ensemble.steps, 10)
+
+    populations = ensemble.populations()
+    assert_equals(set(populations), {'a', 'b', 'c'})
+
+    for index, automata in enumerate(replicas):
+        cells = ensemble.replica(index)
+
+        for y in range(5):
+            assert_equals(list(cells.row(y)), list(automata.cells.row(y)))
+
+        for state in ('a', 'b', 'c'):
+            population = sum(
+                list(automata.cells.row(y)).count(state) for y in range(5)
+            )
+
+            assert_equals(populations[state][index], population)
+            assert_equals(ensemble.population(state)[index], population)
+
+    assert_equals(ensemble.population('d').tolist(), [0, 0, 0, 0])
+
+    ensemble.update(2, 6, 4, 'd')
+    assert_equals(ensemble.population('d').tolist(), [0, 0, 1, 0])
+    assert_equals(ensemble.replica(2).cell(6, 4), 'd')
+
+    with assert_raises(ValueError):
+        ensemble.update(0, 7, 0, 'a')
+
+    with assert_raises(ValueError):
+        Ensemble(2, 3, 3, 'a', *rules, seeds=(1,))
+
+    assert_equals(len(Ensemble(3, 2, 2, 'a', *rules).seeds), 3)
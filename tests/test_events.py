@@ -0,0 +1,121 @@
+"""
+Tests for the events module.
+"""
+from nose.tools import assert_equals, assert_raises, assert_true
+
+
+def test_event_engine():
+    """
+    Step with an EventEngine
+    """
+    from pica.automata import Automata
+    from pica.conditions import Condition, Equals
+    from pica.events import EventEngine
+    from pica.rules import Rule
+
+    # each cell leaves a at a rate of 0.01
+    automata = Automata(
+        40, 40, 'a',
+        Rule('a', 'a', Equals(0, 0, 'a'), 0.99),
+        Rule('a', 'b', Equals(0, 0, 'a'), 0.01),
+        engine=EventEngine(seed=3)
+    )
+
+    changed = set()
+    for step in range(50):
+        changes = automata.step()
+
+        assert_true(all(change.state == 'b' for change in changes))
+        changed |= {(change.x, change.y) for change in changes}
+
+    assert_equals(automata.engine.time, 50)
+
+    # 1 - e^-0.5 of the cells should have changed
+    assert_true(0.33 < len(changed) / 1600 < 0.45)
+
+    for x in range(40):
+        for y in range(40):
+            assert_equals(
+                automata.cells.cell(x, y), 'b' if (x, y) in changed else 'a'
+            )
+
+    # b spreads left at a rate of 1
+    automata = Automata(
+        20, 1, 'a',
+        Rule('a', 'b', Equals(1, 0, 'b'), 1),
+        engine=EventEngine(duration=5, seed=1)
+    )
+
+    assert_equals(automata.step(), set())
+
+    automata.cells.update(19, 0, 'b')
+
+    spread = 1 + len(automata.step())
+    assert_true(2 <= spread <= 12)
+    assert_equals(
+        list(automata.cells.row(0)), ['a'] * (20 - spread) + ['b'] * spread
+    )
+
+    class Opaque(Condition):
+        """
+        A condition that can't be tracked
+        """
+        def evaluate(self, cells, x, y):
+            return True
+
+    with assert_raises(ValueError):
+        Automata(2, 2, 'a', Rule('a', 'b', Opaque(), 1), engine=EventEngine())
+
+
+def test_probabilities():
+    """
+    The probabilities of a distribution
+    """
+    from pica.engines import Distribution
+
+    assert_equals(
+        Distribution(('a', 'b'), (1, 4), 4).probabilities(),
+        [('a', 0.25), ('b', 0.75)]
+    )
+    assert_equals(
+        Distribution(('a', 'b', 'c'), (2, 1, 3), 3).probabilities(),
+        [('a', 2 / 3), ('c', 1 / 3)]
+    )
+    assert_equals(Distribution(('a',), (-1,), -1).probabilities(), [])
+    assert_equals(Distribution((), (), 0).probabilities(), [])
+
+
+def test_event_wrap():
+    """
+    Transitions spread across the edges of a torus
+    """
+    from pica.automata import Automata
+    from pica.boundaries import Wrap
+    from pica.conditions import Equals
+    from pica.events import EventEngine
+    from pica.rules import Rule
+
+    automata = Automata(
+        5, 1, 'a',
+        Rule('a', 'b', Equals(-1, 0, 'b'), 1),
+        engine=EventEngine(duration=50, seed=2), boundary=Wrap()
+    )
+
+    automata.cells.update(4, 0, 'b')
+
+    assert_equals(len(automata.step()), 4)
+    assert_equals(list(automata.cells.row(0)), ['b'] * 5)
+
+
+def test_event_replay():
+    """
+    An unseeded run can be replayed from the seed its stream chose
+    """
+    from pica.cli import city
+    from pica.events import EventEngine
+
+    original = city(6, 6, EventEngine())
+    replay = city(6, 6, EventEngine(seed=original.engine.random.seed))
+
+    for _ in range(5):
+        assert_equals(set(replay.step()), set(original.step()))
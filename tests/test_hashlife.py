@@ -0,0 +1,127 @@
+"""
+Tests for the hashlife module.
+"""
+from nose.tools import (
+    assert_equals, assert_is_none, assert_raises, assert_true
+)
+
+
+def test_quad_cells():
+    """
+    Create a QuadCells object
+    """
+    from pica.boundaries import Wrap
+    from pica.changes import Change, Changes
+    from pica.hashlife import Hashlife, QuadCells
+    from pica.rules import RuleSet
+    from pica.tables import TransitionTable
+    from tests.test_tables import life
+
+    hashlife = Hashlife(TransitionTable(RuleSet(life()), 1 << 20), 1 << 10)
+    cells = QuadCells(5, 3, 'dead', hashlife)
+
+    assert_equals(cells.width, 5)
+    assert_equals(cells.height, 3)
+    assert_equals(cells.root.level, 3)
+    assert_equals(list(cells.row(2)), ['dead'] * 5)
+    assert_is_none(cells.cell(5, 0))
+
+    with assert_raises(ValueError):
+        cells.update(1, 1, 'other')
+
+    with assert_raises(ValueError):
+        QuadCells(5, 3, 'dead', hashlife, Wrap())
+
+    root = cells.root
+    cells.update(4, 2, 'live')
+    cells.apply(Changes([0, 4], [0, 2], ['live', 'dead']))
+
+    assert_equals(cells.version, 3)
+    assert_equals(cells.cell(0, 0), 'live')
+    assert_equals(cells.cell(4, 2), 'dead')
+
+    # the same cells share the same nodes
+    cells.update(0, 0, 'dead')
+    assert_true(cells.root is root)
+
+    previous = cells.root
+    cells.update(2, 1, 'live')
+    changes = cells.replace(previous)
+
+    assert_equals(changes, {Change(2, 1, 'dead')})
+    assert_equals(cells.cell(2, 1), 'dead')
+
+
+def test_hash_engine():
+    """
+    Step and advance the game of life with hashlife
+    """
+    from pica.bits import BitEngine
+    from pica.cells import ArrayCells
+    from pica.cli import city, conway
+    from pica.hashlife import HashEngine, QuadCells
+
+    for width, height in ((5, 5), (13, 7)):
+        expected = conway(width, height, BitEngine(seed=6))
+        automata = conway(width, height, HashEngine(cache_size=64, seed=6))
+
+        assert_true(isinstance(automata.cells, QuadCells))
+
+        for y in range(height):
+            for x in range(width):
+                automata.cells.update(x, y, expected.cells.cell(x, y))
+
+        for _ in range(5):
+            assert_equals(set(automata.step()), set(expected.step()))
+
+        for generations in (3, 16, 37):
+            before = [list(expected.cells.row(y)) for y in range(height)]
+
+            for _ in range(generations):
+                expected.step()
+
+            changes = automata.engine.advance(automata.cells, generations)
+
+            for x, y, state in changes:
+                assert_true(before[y][x] != state)
+
+            for y in range(height):
+                assert_equals(
+                    list(automata.cells.row(y)), list(expected.cells.row(y))
+                )
+
+    # random rules aren't deterministic
+    automata = city(5, 5, HashEngine(seed=1))
+
+    assert_is_none(automata.engine.hashlife)
+    assert_true(isinstance(automata.cells, ArrayCells))
+
+    before = automata.cells.codes.copy()
+    changes = automata.engine.advance(automata.cells, 3)
+
+    for x, y, _ in changes:
+        assert_true(before[y, x] != automata.cells.codes[y, x])
+
+
+def test_cache_size():
+    """
+    Garbage collection keeps the cache within its size
+    """
+    from pica.bits import BitEngine
+    from pica.cli import conway
+    from pica.hashlife import HashEngine
+
+    expected = conway(32, 32, BitEngine(seed=1))
+    automata = conway(32, 32, HashEngine(cache_size=500, seed=1))
+
+    for _ in range(256):
+        expected.step()
+
+    automata.engine.advance(automata.cells, 256)
+
+    assert_true(len(automata.engine.hashlife) <= 500)
+
+    for y in range(32):
+        assert_equals(
+            list(automata.cells.row(y)), list(expected.cells.row(y))
+        )
@@ -0,0 +1,130 @@
+"""
+Tests for the mapped module.
+"""
+from nose.tools import assert_equals, assert_raises, assert_true
+
+
+def test_mapped_cells():
+    """
+    Create MappedCells and open them again
+    """
+    import os
+    from tempfile import TemporaryDirectory
+
+    import numpy
+
+    from pica.boundaries import Wrap
+    from pica.changes import Changes
+    from pica.mapped import MappedCells
+
+    with TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'grid')
+
+        cells = MappedCells(path, 5, 3, 'a', states=('b', 'a'), seed=-1)
+
+        assert_equals(cells.seed, (1 << 64) - 1)
+        assert_equals(cells.width, 5)
+        assert_equals(cells.height, 3)
+        assert_equals(cells.step, 0)
+        assert_equals(list(cells.row(0)), ['a'] * 5)
+
+        cells.update(1, 2, 'c')
+        cells.apply(Changes([0, 4], [0, 1], ['b', 'c']))
+        cells.flush()
+
+        previous = cells.swap(numpy.ones((3, 5), dtype=numpy.uint8))
+        assert_equals(previous[2, 1], cells.code('c'))
+        assert_equals(cells.step, 1)
+
+        with assert_raises(ValueError):
+            cells.swap(numpy.ones((2, 5), dtype=numpy.uint8))
+
+        opened = MappedCells.open(path, Wrap())
+
+        assert_equals(opened.step, 1)
+        assert_equals(opened.seed, (1 << 64) - 1)
+        assert_equals(list(opened.states), ['b', 'a', 'c'])
+        assert_equals(list(opened.row(1)), ['a'] * 5)
+        assert_equals(list(opened.back[:, 4]), [1, 2, 1])
+        assert_equals(opened.cell(-1, 0), 'a')
+
+        # the type of the codes can't grow
+        with assert_raises(ValueError):
+            for state in range(256):
+                opened.code(state)
+
+        with assert_raises(ValueError):
+            MappedCells.open(__file__)
+
+
+def test_mapped_engine():
+    """
+    Step cells stored in a file a band at a time, and resume them
+    """
+    import os
+    from tempfile import TemporaryDirectory
+
+    from pica.automata import Automata
+    from pica.boundaries import Reflect, Wrap, EDGE
+    from pica.cli import city
+    from pica.mapped import MappedCells, MappedEngine
+    from pica.tables import TableEngine
+
+    with TemporaryDirectory() as directory:
+        for index, boundary in enumerate((EDGE, Wrap(), Reflect())):
+            path = os.path.join(directory, str(index))
+
+            expected = city(13, 11, TableEngine(seed=2), boundary=boundary)
+            automata = city(
+                13, 11, MappedEngine(path, band=4, seed=2), boundary=boundary
+            )
+
+            assert_true(isinstance(automata.cells, MappedCells))
+
+            for y in range(11):
+                for x in range(13):
+                    automata.cells.update(x, y, expected.cells.cell(x, y))
+
+            for _ in range(3):
+                assert_equals(set(automata.step()), set(expected.step()))
+
+            automata.cells.flush()
+
+            resumed = Automata(
+                13, 11, None, *automata._rules,
+                engine=MappedEngine(path, band=4, seed=2), boundary=boundary
+            )
+
+            assert_equals(resumed.cells.step, 3)
+
+            for _ in range(3):
+                assert_equals(set(resumed.step()), set(expected.step()))
+
+            with assert_raises(ValueError):
+                MappedEngine(path).cells(12, 11, None)
+
+        # an unseeded run resumes with the seed it started with
+        path = os.path.join(directory, 'unseeded')
+
+        engine = MappedEngine(path, band=4)
+        automata = city(13, 11, engine)
+        expected = city(13, 11, TableEngine(seed=engine.random.seed))
+
+        for y in range(11):
+            for x in range(13):
+                automata.cells.update(x, y, expected.cells.cell(x, y))
+
+        for _ in range(2):
+            assert_equals(set(automata.step()), set(expected.step()))
+
+        automata.cells.flush()
+
+        resumed = Automata(
+            13, 11, None, *automata._rules,
+            engine=MappedEngine(path, band=4)
+        )
+
+        assert_equals(resumed.cells.seed, engine.random.seed)
+
+        for _ in range(3):
+            assert_equals(set(resumed.step()), set(expected.step()))
@@ -0,0 +1,209 @@
+"""
+Tests for the optimizer module.
+"""
+from nose.tools import assert_equals, assert_is, assert_true
+
+
+def outcomes(rules, cells, x, y):
+    """
+    The possible outcomes for a cell, as a dictionary of weights and a set
+    of forbidden states.
+    """
+    from pica.conditions import CONTEXT
+
+    CONTEXT.advance()
+
+    weights = {}
+    forbidden = set()
+
+    for rule in rules:
+        result = rule(cells, x, y)
+
+        if result:
+            if result.difference is None:
+                forbidden.add(result.state)
+            else:
+                weights[result.state] = (
+                    weights.get(result.state, 0) + result.difference
+                )
+
+    return {
+        state: weight for state, weight in weights.items()
+        if state not in forbidden and weight
+    }
+
+
+def test_fold():
+    """
+    Fold conditions on the cell itself into constants
+    """
+    from pica.conditions import Equals, Not, And, Or, InRange, If
+    from pica.optimizer import Report, fold
+
+    report = Report()
+
+    assert_equals(fold(Equals(0, 0, 'a'), 'a', report).value, True)
+    assert_equals(fold(Equals(0, 0, 'b'), 'a', report).value, False)
+    assert_equals(fold(Equals(1, 0), 'a', report).value, False)
+    assert_equals(fold(Not(Equals(0, 0, 'a')), 'a', report).value, False)
+
+    unchanged = Equals(1, 0, 'a')
+    assert_is(fold(unchanged, 'a', report), unchanged)
+    assert_is(fold(Not(unchanged), 'a', report).conditions[0], unchanged)
+
+    assert_equals(
+        fold(And(Equals(0, 0, 'a'), Equals(0, 0, 'b')), 'a', report).value,
+        False
+    )
+    assert_equals(
+        fold(Or(Equals(1, 0, 'a'), Equals(0, 0, 'a')), 'a', report).value,
+        True
+    )
+    assert_equals(
+        fold(And(Equals(0, 0, 'a'), unchanged), 'a', report).conditions,
+        (unchanged,)
+    )
+
+    folded = fold(
+        InRange(Equals(0, 0, 'a'), unchanged, Equals(0, 1, 'a'), lower=2),
+        'a', report
+    )
+    assert_equals((folded.lower, folded.upper), (1, 2))
+    assert_equals(len(folded.conditions), 2)
+
+    assert_equals(
+        fold(
+            InRange(Equals(0, 0, 'a'), unchanged, upper=0), 'a', report
+        ).value,
+        False
+    )
+    assert_equals(
+        fold(
+            InRange(Equals(0, 0, 'b'), unchanged, upper=1), 'a', report
+        ).value,
+        True
+    )
+
+    assert_is(fold(If(Equals(0, 0, 'a'), unchanged), 'a', report), unchanged)
+    assert_equals(
+        fold(If(Equals(0, 0, 'b'), unchanged), 'a', report).value, False
+    )
+
+    assert_true(report.folded > 0)
+
+
+def test_optimize():
+    """
+    Optimize a collection of rules
+    """
+    from pica.conditions import Constant, Equals, Or
+    from pica.optimizer import optimize
+    from pica.rules import Rule, Requirement
+
+    rules = (
+        Rule('a', 'a', Equals(0, 0, 'a'), 0.9),
+        Rule('a', 'b', Or(Equals(1, 0, 'b'), Equals(-1, 0, 'b')), 0.1),
+        Rule('a', 'c', Or(Equals(1, 0, 'b'), Equals(-1, 0, 'b')), 0.2),
+        Rule('a', 'd', Equals(1, 0, 'd'), 0),
+        Rule('a', 'd', Equals(0, 0, 'b'), 1),
+        Requirement('a', 'e', Equals(0, 0, 'b')),
+        Rule('a', 'e', Equals(1, 0, 'e'), 1),
+        Requirement('a', 'b', Equals(0, 0, 'a')),
+        Requirement('a', 'c', Equals(0, 1, 'a')),
+        Requirement('a', 'f', Equals(0, 1, 'a')),
+        Rule('g', 'a', Equals(1, 0, 'a'), 1),
+    )
+
+    optimized, report = optimize(rules)
+
+    assert_equals(
+        [rule for rule, _ in report.removed],
+        [rules[3], rules[4], rules[6], rules[7], rules[5], rules[9]]
+    )
+    assert_equals(
+        [reason for _, reason in report.removed],
+        [
+            'zero weight', 'never true', 'always forbidden',
+            'always satisfied', 'nothing to forbid', 'nothing to forbid',
+        ]
+    )
+    assert_equals(
+        [(rule.from_state, rule.to_state) for rule in optimized],
+        [('a', 'a'), ('a', 'b'), ('a', 'c'), ('a', 'c'), ('g', 'a')]
+    )
+
+    assert_true(isinstance(optimized[0].condition, Constant))
+    assert_is(optimized[1].condition, optimized[2].condition)
+    assert_equals((optimized[3].condition.x, optimized[3].condition.y), (0, 1))
+
+    # the original rules are untouched
+    assert_true(isinstance(rules[0].condition, Equals))
+
+    optimized, report = optimize(rules, states=('a',))
+    assert_equals(
+        [rule for rule, reason in report.removed if reason.startswith('un')],
+        [rules[10]]
+    )
+
+
+def test_equivalent():
+    """
+    Optimized rules have the same outcomes as the originals
+    """
+    from random import Random
+    from unittest.mock import patch
+
+    from pica.cells import Cells
+    from pica.cli import city
+    from pica.optimizer import optimize
+
+    with patch('pica.cli.Automata') as automata:
+        city(8, 8)
+
+    original_rules = automata.call_args[0][3:]
+    rules, _ = optimize(original_rules)
+    states = sorted({rule.from_state for rule in original_rules})
+
+    generator = Random(7)
+
+    for _ in range(20):
+        cells = Cells(8, 8, states[0])
+        for x in range(8):
+            for y in range(8):
+                cells.update(x, y, generator.choice(states))
+
+        for x in range(8):
+            for y in range(8):
+                assert_equals(
+                    outcomes(rules, cells, x, y),
+                    outcomes(original_rules, cells, x, y)
+                )
+
+    from pica.automata import Automata
+    from pica.conditions import Equals
+    from pica.engines import SerialEngine
+    from pica.rules import Requirement, Rule
+
+    class Weighted(Rule):
+        pass
+
+    for rules in (
+            # a requirement on what a custom rule produces
+            (
+                Weighted('a', 'b', Equals(1, 0, 'a'), 1),
+                Requirement('a', 'b', Equals(-1, 0, 'c')),
+            ),
+            # a zero weight next to a negative one
+            (
+                Rule('a', 'b', Equals(0, 0, 'a'), 0),
+                Rule('a', 'c', Equals(0, 0, 'a'), -1),
+            )):
+        changes = [
+            Automata(
+                3, 1, 'a', *rules, engine=SerialEngine(seed=0),
+                optimize=optimized
+            ).step()
+            for optimized in (True, False)
+        ]
+
+        assert_equals(set(changes[0]), set(changes[1]))
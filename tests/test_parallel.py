@@ -0,0 +1,98 @@
+"""
+Tests for the parallel module.
+"""
+from nose.tools import assert_equals, assert_raises, assert_true
+
+
+def test_tile_bounds():
+    """
+    Split a grid into tiles
+    """
+    from pica.parallel import tile_bounds
+
+    assert_equals(tile_bounds(10, 10, 1), [(0, 0, 10, 10)])
+    assert_equals(
+        tile_bounds(10, 4, 2), [(0, 0, 5, 4), (5, 0, 10, 4)]
+    )
+    assert_equals(
+        tile_bounds(4, 10, 2), [(0, 0, 4, 5), (0, 5, 4, 10)]
+    )
+    assert_equals(len(tile_bounds(30, 20, 6)), 6)
+    assert_equals(tile_bounds(1, 1, 4), [(0, 0, 1, 1)])
+
+    for count in (1, 3, 4, 7, 8):
+        covered = set()
+        for left, top, right, bottom in tile_bounds(13, 9, count):
+            for x in range(left, right):
+                for y in range(top, bottom):
+                    assert_true((x, y) not in covered)
+                    covered.add((x, y))
+
+        assert_equals(len(covered), 13 * 9)
+
+
+def test_parallel_engine():
+    """
+    Step tiles in parallel
+    """
+    from nose.plugins.skip import SkipTest
+
+    from pica.automata import Automata
+    from pica.cells import ArrayCells
+    from pica.cli import conway
+    from pica.conditions import Equals
+    from pica.engines import ArrayEngine
+    from pica.parallel import ParallelEngine, SharedCells, SharedMemory
+    from pica.rules import Rule
+
+    if SharedMemory is None:
+        raise SkipTest('shared memory needs python 3.8')
+
+    glider = ((1, 0), (2, 1), (0, 2), (1, 2), (2, 2))
+
+    expected = conway(12, 10, ArrayEngine())
+    engine = ParallelEngine(processes=2, tiles=6)
+    actual = conway(12, 10, engine)
+
+    assert_true(isinstance(actual.cells, SharedCells))
+
+    for automata in (expected, actual):
+        for x in range(12):
+            for y in range(10):
+                automata.cells.update(
+                    x, y, 'live' if (x, y) in glider else 'dead'
+                )
+
+    for _ in range(12):
+        assert_equals(actual.step(), expected.step())
+
+    assert_equals(actual.cells.codes.tolist(), expected.cells.codes.tolist())
+
+    # new states widen the shared grid
+    for state in range(300):
+        actual.cells.update(0, 0, state)
+
+    actual.cells.update(0, 0, 'dead')
+    actual.step()
+
+    engine.close()
+
+    with assert_raises(TypeError):
+        engine.step(ArrayCells(2, 2, 'dead'))
+
+    # draws don't depend on the tiles or the number of processes
+    results = []
+    for processes, tiles in ((1, 1), (3, 3), (2, 7)):
+        automata = Automata(
+            9, 9, 'a',
+            Rule('a', 'b', Equals(0, 0, 'a'), 1),
+            Rule('a', 'a', Equals(0, 0, 'a'), 1),
+            engine=ParallelEngine(processes=processes, tiles=tiles, seed=5)
+        )
+
+        results.append([automata.step() for _ in range(3)])
+        automata.engine.close()
+
+    assert_equals(results[0], results[1])
+    assert_equals(results[0], results[2])
+    assert_true(results[0][0])
@@ -0,0 +1,65 @@
+"""
+Tests for the randomness module.
+"""
+from nose.tools import assert_equals, assert_not_equals, assert_true
+
+
+def test_philox():
+    """
+    Philox4x32-10 matches its known answers
+    """
+    from pica.randomness import philox
+
+    assert_equals(
+        philox((0, 0, 0, 0), (0, 0)),
+        (0x6627e8d5, 0xe169c58d, 0xbc57ac4c, 0x9b00dbd8)
+    )
+    assert_equals(
+        philox((0xffffffff,) * 4, (0xffffffff,) * 2),
+        (0x408f276d, 0x41c83b0e, 0xa20bc7c6, 0x6d5451fd)
+    )
+    assert_equals(
+        philox(
+            (0x243f6a88, 0x85a308d3, 0x13198a2e, 0x03707344),
+            (0xa4093822, 0x299f31d0)
+        ),
+        (0xd16cfe09, 0x94fdcceb, 0x5001e420, 0x24126ea1)
+    )
+
+
+def test_stream():
+    """
+    Draws keyed by step and position
+    """
+    from pica.randomness import RANDOMIZE, Stream
+
+    stream = Stream(7)
+
+    assert_equals(stream.seed, 7)
+
+    draws = stream.draws(3, 5, 4, left=2, top=1)
+    assert_equals(draws.shape, (4, 5))
+
+    for x in range(5):
+        for y in range(4):
+            assert_equals(draws[y, x], stream.draw(3, x + 2, y + 1))
+
+    assert_equals(
+        stream.sample(3, [4, 2], [1, 3]).tolist(),
+        [stream.draw(3, 4, 1), stream.draw(3, 2, 3)]
+    )
+
+    assert_true(((draws >= 0) & (draws < 1)).all())
+    assert_equals(Stream(7).draws(3, 5, 4, 2, 1).tolist(), draws.tolist())
+
+    assert_not_equals(stream.draw(3, 0, 0), stream.draw(4, 0, 0))
+    assert_not_equals(stream.draw(3, 0, 0), stream.draw(3, 0, 0, RANDOMIZE))
+    assert_not_equals(stream.draw(3, 0, 0), Stream(8).draw(3, 0, 0))
+
+    unseeded = Stream()
+    assert_equals(
+        Stream(unseeded.seed).draw(0, 1, 2), unseeded.draw(0, 1, 2)
+    )
+
+    mean = Stream(1).draws(0, 100, 100).mean()
+    assert_true(0.49 < mean < 0.51)
@@ -119,3 +119,53 @@ def test_requirement():
                 assert_is_none(requirement(cells, x, y))
             else:
                 assert_equals(requirement(cells, x, y), Result('to', None))
+
+
+def test_rule_set():
+    """
+    A RuleSet
+    """
+    from pica.conditions import Equals
+    from pica.rules import Rule, Requirement, RuleSet
+
+    rules = (
+        Rule('a', 'b', Equals(0, 0, 'a'), 1),
+        Requirement('b', 'a', Equals(1, 0, 'a')),
+        Rule('a', 'c', Equals(0, 0, 'a'), 1),
+    )
+
+    rule_set = RuleSet(rules)
+
+    assert_equals(len(rule_set), 3)
+    assert_equals(tuple(rule_set), rules)
+    assert_equals(set(rule_set.states), {'a', 'b'})
+    assert_equals(rule_set.applicable('a'), (rules[0], rules[2]))
+    assert_equals(rule_set.applicable('b'), (rules[1],))
+    assert_equals(rule_set.applicable('c'), ())
+    assert_equals(rule_set.candidates('a'), ('b', 'c'))
+    assert_equals(rule_set.candidates('b'), ('a',))
+    assert_equals(rule_set.candidates('c'), ())
+
+
+def test_pickle():
+    """
+    Rules can be pickled once compiled
+    """
+    import pickle
+
+    from pica.cells import Cells
+    from pica.conditions import Equals
+    from pica.rules import Rule, Result
+
+    rule = Rule('from', 'to', Equals(1, 0, 'from'), 0.5)
+    cells = Cells(2, 1, 'from')
+
+    assert_equals(rule(cells, 0, 0), Result('to', 0.5))
+
+    rule = pickle.loads(pickle.dumps(rule))
+    rule.reset()
+
+    assert_equals(rule(cells, 0, 0), Result('to', 0.5))
+    rule.reset()
+
+    assert_is_none(rule(cells, 1, 0))
@@ -0,0 +1,87 @@
+"""
+Tests for the sweep module.
+"""
+from nose.tools import assert_equals, assert_raises
+
+
+def test_grid():
+    """
+    Every combination of parameters
+    """
+    from pica.sweep import grid
+
+    assert_equals(grid({}), [{}])
+    assert_equals(
+        grid({'a': (1, 2), 'b': (3,)}), [{'a': 1, 'b': 3}, {'a': 2, 'b': 3}]
+    )
+    assert_equals(len(grid({'a': (1, 2), 'b': (3, 4, 5)})), 6)
+    assert_equals(grid({'a': ()}), [])
+
+
+def test_parameter():
+    """
+    Parse parameters from the command line
+    """
+    from pica.sweep import parameter
+
+    assert_equals(parameter('rate=0.1,2'), ('rate', [0.1, 2]))
+
+    with assert_raises(ValueError):
+        parameter('rate')
+
+    with assert_raises(ValueError):
+        parameter('=1')
+
+
+def test_sweep():
+    """
+    Sweep the parameters of the city
+    """
+    import json
+    from io import StringIO
+
+    from pica.cli import city
+    from pica.sweep import record, sweep
+
+    parameters = {
+        'spontaneous_road': (0.001, 0.2),
+        'continued_road': (0.05, 0.5),
+    }
+
+    output = StringIO()
+    count = record(
+        sweep(city, parameters, 8, 6, 4, seed=10, workers=2, chunk_size=3),
+        output
+    )
+
+    assert_equals(count, 4)
+
+    summaries = sorted(
+        (json.loads(line) for line in output.getvalue().splitlines()),
+        key=lambda summary: summary['run']
+    )
+
+    assert_equals(
+        [summary['parameters'] for summary in summaries],
+        [
+            {'spontaneous_road': 0.001, 'continued_road': 0.05},
+            {'spontaneous_road': 0.001, 'continued_road': 0.5},
+            {'spontaneous_road': 0.2, 'continued_road': 0.05},
+            {'spontaneous_road': 0.2, 'continued_road': 0.5},
+        ]
+    )
+
+    for index, summary in enumerate(summaries):
+        assert_equals(summary['seed'], 10 + index)
+        assert_equals(summary['steps'], 4)
+        assert_equals(sum(summary['populations'].values()), 48)
+
+    again = sorted(
+        sweep(city, parameters, 8, 6, 4, seed=10, workers=1),
+        key=lambda summary: summary['run']
+    )
+
+    assert_equals(
+        [summary['populations'] for summary in again],
+        [summary['populations'] for summary in summaries]
+    )
@@ -0,0 +1,134 @@
+"""
+Tests for the tables module.
+"""
+from nose.tools import assert_equals, assert_false, assert_raises, assert_true
+
+
+def life():
+    """
+    The rules for a game of life
+    """
+    from pica.conditions import Equals, Not, InRange
+    from pica.rules import Rule, Requirement
+
+    neighbors = [
+        Equals(x, y, 'live')
+        for x in range(-1, 2) for y in range(-1, 2)
+        if x != 0 or y != 0
+    ]
+
+    return (
+        Requirement(
+            'live', 'dead', Not(InRange(*neighbors, lower=2, upper=3))
+        ),
+        Requirement('dead', 'live', InRange(*neighbors, lower=3, upper=3)),
+        Rule('live', 'dead', Equals(0, 0, 'live'), 1),
+        Rule('dead', 'live', Equals(0, 0, 'dead'), 1),
+    )
+
+
+def test_transition_table():
+    """
+    Tabulate a game of life
+    """
+    import numpy
+    from pica.cells import ArrayCells
+    from pica.rules import RuleSet
+    from pica.tables import TransitionTable
+
+    table = TransitionTable(RuleSet(life()), 1 << 20)
+
+    assert_equals(table.symbols, ('live', 'dead', None))
+    assert_equals(table.positions[0], (0, 0))
+    assert_equals(len(table.positions), 9)
+    assert_equals(len(table), 3 ** 9)
+    assert_true(table.deterministic)
+
+    with assert_raises(ValueError):
+        TransitionTable(RuleSet(life()), 3 ** 9 - 1)
+
+    cells = ArrayCells(3, 3, 'dead')
+    for x in range(3):
+        cells.update(x, 1, 'live')
+
+    symbols = table.symbolize(cells)
+    assert_equals(symbols.tolist(), [[1, 1, 1], [0, 0, 0], [1, 1, 1]])
+
+    chosen = table.next_symbols(table.encode(symbols), None)
+    assert_equals(
+        chosen.tolist(), [[-1, 0, -1], [1, -1, 1], [-1, 0, -1]]
+    )
+
+    cells.update(0, 0, 'unknown')
+    assert_equals(table.symbolize(cells), None)
+
+    # only the middle of the top row has exactly three live neighbors
+    index = table.encode(numpy.array([[0, 0, 0], [1, 1, 1], [1, 1, 1]]))
+    assert_equals(
+        table.next_symbols(index, None).tolist(),
+        [[1, -1, 1], [-1, 0, -1], [-1, -1, -1]]
+    )
+
+
+def test_random_table():
+    """
+    Tabulate random rules
+    """
+    import numpy
+    from pica.conditions import Condition, Equals
+    from pica.rules import Rule, Requirement, RuleSet
+    from pica.tables import TransitionTable
+
+    rules = RuleSet((
+        Rule('a', 'a', Equals(0, 0, 'a'), 3),
+        Rule('a', 'b', Equals(1, 0, 'b'), 1),
+        Requirement('a', 'a', Equals(-1, 0, 'a', 'b')),
+    ))
+
+    table = TransitionTable(rules, 100)
+
+    assert_equals(table.symbols, ('a', 'b', None))
+    assert_equals(table.positions, ((0, 0), (1, 0), (-1, 0)))
+    assert_false(table.deterministic)
+
+    # a | a | b: a with weight 3, b with weight 1
+    index = table.encode(numpy.array([[0, 0, 1]]))[0, 1]
+    draws = numpy.array([0, 0.74, 0.75, 0.99])
+
+    assert_equals(
+        table.next_symbols(numpy.full(4, index), draws).tolist(),
+        [0, 0, 1, 1]
+    )
+
+    # None | a | b: a is forbidden
+    index = table.encode(numpy.array([[0, 1]]))[0, 0]
+    assert_equals(
+        table.next_symbols(numpy.full(4, index), draws).tolist(),
+        [1, 1, 1, 1]
+    )
+
+    class Opaque(Condition):
+        """
+        A condition that can't be tabulated
+        """
+        def evaluate(self, cells, x, y):
+            return True
+
+    with assert_raises(ValueError):
+        TransitionTable(RuleSet((Rule('a', 'b', Opaque(), 1),)), 100)
+
+
+def test_table_engine():
+    """
+    Step with a TableEngine
+    """
+    from pica.automata import Automata
+    from pica.cli import city
+    from pica.tables import TableEngine
+
+    automata = Automata(4, 4, 'dead', *life(), engine=TableEngine())
+    assert_equals(len(automata.engine.table), 3 ** 9)
+
+    automata = city(4, 4, TableEngine(max_entries=100))
+    assert_equals(automata.engine.table, None)
+    automata.step()